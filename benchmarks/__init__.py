@@ -0,0 +1,47 @@
+"""benchmarks for the ex engine
+
+Benchmarks run under plain Python, outside Sublime Text, using the headless
+stand-in for the sublime module if needed. Run them from the package's root
+directory:
+
+    python -m benchmarks.bench_substitute
+    python -m benchmarks.bench_global
+    python -m benchmarks.bench_reverse_search
+    python -m benchmarks.bench_parse_command
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_shell
+    python -m benchmarks.bench_commands --help
+"""
+
+import os
+import sys
+import time
+
+try:
+    import sublime
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+                                    os.path.abspath(__file__))), 'headless'))
+
+
+def best_of(func, repeat=3):
+    """Returns the best wall time in seconds out of `repeat` runs of `func`.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report_scaling(name, results):
+    """Prints a table of (size, seconds) pairs along with the time per unit,
+    which should stay flat if `name` scales linearly.
+    """
+    print name
+    for size, seconds in results:
+        print "  %9d  %8.4fs  %8.3fus/line" % (size, seconds,
+                                               seconds / size * 1000000)
@@ -0,0 +1,266 @@
+"""ex commands end to end over synthetic buffers from 1k to 1M lines
+
+Every command line runs through the same path as when typed into the
+command line: ViColonInput, parse_command and the command class, over the
+headless stand-in for the sublime module. For every command, kind of buffer
+and size, records the best wall time, the view API calls made by the
+command (see vex.api_calls) and the peak memory of the process running it.
+A full run takes a while; pick sizes, kinds and commands to make it
+shorter:
+
+    python -m benchmarks.bench_commands --sizes 1000,10000 --output new.json
+    python -m benchmarks.bench_commands --baseline old.json --threshold 0.2
+
+With --baseline, exits with status 1 if any command made more view API
+calls than in the baseline by more than the threshold. API call counts
+compare across machines; timings and memory only compare against a
+baseline written on the same one, so they are only written and compared
+with --timings. benchmarks/baseline.json holds the counts up to 100k
+lines, written with:
+
+    python -m benchmarks.bench_commands --sizes 1000,10000,100000 \
+        --output benchmarks/baseline.json
+"""
+
+import json
+import optparse
+import os
+import sys
+import time
+
+from benchmarks.buffers import KINDS
+from benchmarks.buffers import make_buffer
+
+import sublime
+
+import ex_commands
+import vintage_ex
+from vex import api_calls
+
+
+SIZES = (1000, 10000, 100000, 1000000)
+COMMANDS = (
+    ('substitute', ':%s/foo/bar/g'),
+    ('global', ':g/foo/d'),
+    ('delete', ':10,$-10d'),
+    ('move', ':1,100m$'),
+    ('copy', ':1,100co$'),
+    ('print', ':%p #'),
+    ('search_forward', ':/needle/'),
+    ('search_backward', ':$;?needle?'),
+    ('range', ':/needle/+3;/needle/-1'),
+)
+# Buffers bigger than this are skipped.
+MAX_CHARS = 200 * 1024 * 1024
+# With --timings, differences in wall time under this many seconds and in
+# peak memory under this many kilobytes are noise.
+MIN_TIME_DELTA = 0.05
+MIN_RSS_DELTA = 16 * 1024
+# Fields that vary from machine to machine.
+TIMING_FIELDS = ('seconds', 'peak_rss_kb')
+
+
+def run_case(cmd_line, kind, lines, repeat):
+    """Returns the result of running `cmd_line` over a fresh buffer
+    `repeat` times, plus once more counting view API calls, which slows
+    commands down.
+    """
+    text = make_buffer(kind, lines)
+    window = sublime.active_window()
+    best = None
+    for i in range(repeat + 1):
+        view = window.new_file()
+        view.set_scratch(True)
+        edit = view.begin_edit()
+        view.insert(edit, 0, text)
+        view.end_edit(edit)
+        counting = (i == repeat)
+        if counting:
+            view.settings().set('vintageex_count_api_calls', True)
+            api_calls.reset()
+        start = time.time()
+        window.run_command('vi_colon_input', {'cmd_line': cmd_line})
+        elapsed = time.time() - start
+        if not counting and (best is None or elapsed < best):
+            best = elapsed
+        window.focus_view(view)
+        window.run_command('close')
+
+    by_method = {}
+    by_caller = {}
+    for counter in api_calls.LAST_CALLS.values():
+        for (method, caller), (calls, seconds) in counter.calls.iteritems():
+            by_method[method] = by_method.get(method, 0) + calls
+            key = '%s %s' % (method, caller)
+            by_caller[key] = by_caller.get(key, 0) + calls
+    return dict(seconds=best,
+                api_calls=sum(by_method.values()),
+                api_calls_by_method=by_method,
+                api_calls_by_caller=by_caller)
+
+
+def run_isolated(cmd_line, kind, lines, repeat):
+    """Runs a case in a child process, so that its peak memory can be
+    measured on its own.
+    """
+    if not hasattr(os, 'fork'):
+        result = run_case(cmd_line, kind, lines, repeat)
+        result['peak_rss_kb'] = None
+        return result
+
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        sys.stdout = open(os.devnull, 'w')
+        status = 0
+        try:
+            try:
+                out = json.dumps(run_case(cmd_line, kind, lines, repeat))
+            except Exception, e:
+                out = json.dumps(dict(error='%s: %s' % (type(e).__name__, e)))
+                status = 1
+            f = os.fdopen(w, 'w')
+            f.write(out)
+            f.close()
+        finally:
+            os._exit(status)
+
+    os.close(w)
+    f = os.fdopen(r)
+    out = f.read()
+    f.close()
+    pid, status, usage = os.wait4(pid, 0)
+    result = json.loads(out)
+    peak = usage.ru_maxrss
+    if sys.platform == 'darwin':
+        # Bytes rather than kilobytes.
+        peak /= 1024
+    result['peak_rss_kb'] = peak
+    return result
+
+
+def estimated_size(kind, lines):
+    sample = make_buffer(kind, 100)
+    return len(sample) * lines / 100
+
+
+def run_all(names, kinds, sizes, repeat):
+    results = []
+    for name, cmd_line in COMMANDS:
+        if name not in names:
+            continue
+        for kind in kinds:
+            for lines in sizes:
+                if estimated_size(kind, lines) > MAX_CHARS:
+                    continue
+                result = run_isolated(cmd_line, kind, lines, repeat)
+                result.update(command=name, cmd_line=cmd_line, kind=kind,
+                              lines=lines)
+                print_result(result)
+                results.append(result)
+    return results
+
+
+def print_result(result):
+    if 'error' in result:
+        print "%-16s %-13s %8d  %s" % (result['command'], result['kind'],
+                                       result['lines'], result['error'])
+        return
+    print "%-16s %-13s %8d  %9.4fs  %8d calls  %8s KB" % (
+                            result['command'], result['kind'],
+                            result['lines'], result['seconds'],
+                            result['api_calls'], result['peak_rss_kb'])
+
+
+def case_key(result):
+    return result['command'], result['kind'], result['lines']
+
+
+def compare(results, baseline, threshold, timings=False):
+    """Returns a list of messages for the results that regressed by more than
+    `threshold` (0.2 means 20%) against `baseline`: in API calls, and also in
+    wall time and peak memory if `timings` is true.
+    """
+    fields = [('api_calls', 0)]
+    if timings:
+        fields += [('seconds', MIN_TIME_DELTA), ('peak_rss_kb', MIN_RSS_DELTA)]
+    previous = dict((case_key(r), r) for r in baseline)
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None or 'error' in old:
+            continue
+        if 'error' in result:
+            regressions.append("%s/%s/%d: %s" % (case_key(result) +
+                                                  (result['error'],)))
+            continue
+        for field, floor in fields:
+            new_value, old_value = result.get(field), old.get(field)
+            if new_value is None or old_value is None:
+                continue
+            if (new_value > old_value * (1 + threshold) and
+                new_value - old_value > floor):
+                    regressions.append("%s/%s/%d: %s went from %s to %s" % (
+                                        case_key(result) +
+                                        (field, old_value, new_value)))
+    return regressions
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--sizes', default=','.join(str(s) for s in SIZES),
+                      help='comma-separated buffer sizes in lines')
+    parser.add_option('--kinds', default=','.join(sorted(KINDS)),
+                      help='comma-separated kinds of buffer')
+    parser.add_option('--commands',
+                      default=','.join(name for name, _ in COMMANDS),
+                      help='comma-separated commands to run')
+    parser.add_option('--repeat', type='int', default=3,
+                      help='runs per case; the best one counts')
+    parser.add_option('--output', help='write the results to this JSON file')
+    parser.add_option('--baseline', help='JSON results to compare against')
+    parser.add_option('--threshold', type='float', default=0.2,
+                      help='allowed regression against the baseline')
+    parser.add_option('--timings', action='store_true', default=False,
+                      help='also write and compare wall time and peak memory')
+    options, args = parser.parse_args(argv)
+
+    results = run_all(options.commands.split(','),
+                      options.kinds.split(','),
+                      [int(s) for s in options.sizes.split(',')],
+                      options.repeat)
+
+    if options.output:
+        if options.timings:
+            written = results
+        else:
+            written = [dict((k, v) for k, v in r.iteritems()
+                            if k not in TIMING_FIELDS) for r in results]
+        f = open(options.output, 'w')
+        try:
+            json.dump(dict(python=sys.version.split()[0],
+                           platform=sys.platform,
+                           repeat=options.repeat,
+                           results=written), f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+
+    if options.baseline:
+        f = open(options.baseline)
+        try:
+            baseline = json.load(f)['results']
+        finally:
+            f.close()
+        regressions = compare(results, baseline, options.threshold,
+                              options.timings)
+        for msg in regressions:
+            print "REGRESSION", msg
+        if regressions:
+            return 1
+        print "No regressions against %s." % options.baseline
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""scaling of the :global line matcher over buffers of growing size
+"""
+
+import re
+
+from benchmarks import best_of
+from benchmarks import report_scaling
+from benchmarks.bench_substitute import make_log
+from benchmarks.bench_substitute import SIZES
+from vex.ex_global import matching_lines
+
+
+def per_line(pattern, text):
+    """The strategy the matcher replaced: one search per line.
+    """
+    return [line for line in text.split('\n') if pattern.search(line)]
+
+
+def main():
+    sparse = re.compile('^done done done', re.MULTILINE)
+    buffers = [(n, make_log(n)) for n in SIZES]
+
+    report_scaling('matching_lines (sparse matches)',
+                   [(n, best_of(lambda: list(matching_lines(sparse, text))))
+                                                    for (n, text) in buffers])
+    report_scaling('per-line re.search (sparse matches)',
+                   [(n, best_of(lambda: per_line(sparse, text)))
+                                                    for (n, text) in buffers])
+
+
+if __name__ == '__main__':
+    main()
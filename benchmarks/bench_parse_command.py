@@ -0,0 +1,34 @@
+"""parse_command with and without its cache of parsed command lines
+"""
+
+from benchmarks import best_of
+from vex import ex_command_parser
+
+
+COMMAND_LINES = (':%s/foo/bar/g', ':10,20d', ":'<,'>!sort", ':g/x/m0',
+                 ':.,+5copy $', ':w', ':$')
+REPEAT = 1000
+
+
+def parse_all():
+    for i in xrange(REPEAT):
+        for cmd in COMMAND_LINES:
+            ex_command_parser.parse_command(cmd)
+
+
+def parse_all_uncached():
+    for i in xrange(REPEAT):
+        for cmd in COMMAND_LINES:
+            ex_command_parser._parse_command(cmd)
+
+
+def main():
+    calls = REPEAT * len(COMMAND_LINES)
+    for name, func in (('uncached', parse_all_uncached), ('cached', parse_all)):
+        seconds = best_of(func)
+        print "%-9s %8.4fs  %8.2fus/command" % (name, seconds,
+                                                seconds / calls * 1000000)
+
+
+if __name__ == '__main__':
+    main()
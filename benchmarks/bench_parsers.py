@@ -0,0 +1,54 @@
+"""the :s lexer on long patterns, scanning with regexes vs consuming one
+character at a time
+"""
+
+from benchmarks import best_of
+from vex.parsers.parsing import EOF
+from vex.parsers.s_cmd import SubstituteLexer
+
+
+class CharByCharLexer(SubstituteLexer):
+    """The pattern loop the :s lexer used before it had a scanner mode.
+    """
+    def _match_pattern(self):
+        buf = []
+        while self.c != EOF and self.c != self.delimiter:
+            if self.c == '\\':
+                buf.append(self.c)
+                self.consume()
+                if self.c == self.delimiter:
+                    buf[-1] = self.delimiter
+                    self.consume()
+                if self.c != EOF and self.c in '\\':
+                    buf.append(self.c)
+                    self.consume()
+                if self.c == EOF:
+                    break
+            else:
+                buf.append(self.c)
+                self.consume()
+        return ''.join(buf)
+
+
+SIZES = (10, 100, 1000)
+REPEAT = 200
+
+
+def command_line(size):
+    return '/' + r'foo\(bar\)\/baz ' * size + '/' + 'qux \\/' * size + '/g 3'
+
+
+def main():
+    for size in SIZES:
+        line = command_line(size)
+        assert CharByCharLexer().parse(line) == SubstituteLexer().parse(line)
+        for name, lexer in (('per char', CharByCharLexer()),
+                            ('scanner', SubstituteLexer())):
+            seconds = best_of(lambda: [lexer.parse(line)
+                                       for i in xrange(REPEAT)])
+            print "%-8s %7d chars  %8.2fus/parse" % (name, len(line),
+                                                   seconds / REPEAT * 1000000)
+
+
+if __name__ == '__main__':
+    main()
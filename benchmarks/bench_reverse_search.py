@@ -0,0 +1,122 @@
+"""backward search: chunked scan against the bisection it replaced
+
+Both strategies run over a string-backed stand-in for a view, which counts
+how many characters each one asks the buffer to scan.
+"""
+
+from bisect import bisect_right
+import re
+
+from benchmarks import best_of
+from benchmarks.bench_substitute import make_log
+from benchmarks.bench_substitute import SIZES
+from vex.ex_global import line_starts
+from vex.ex_search import last_match
+
+
+class StringView(object):
+    """The few view methods used by the bisection, over a plain string.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.starts = line_starts(text)
+        self.scanned = 0
+
+    def size(self):
+        return len(self.text)
+
+    def substr(self, a, b):
+        self.scanned += b - a
+        return self.text[a:b]
+
+    def find(self, pattern, start):
+        match = pattern.search(self.text, start)
+        self.scanned += (match.end() if match else len(self.text)) - start
+        if match:
+            return match.start(), match.end()
+
+    def line(self, point):
+        i = bisect_right(self.starts, point) - 1
+        if i + 1 < len(self.starts):
+            return self.starts[i], self.starts[i + 1] - 1
+        return self.starts[i], len(self.text)
+
+    def line_nr(self, point):
+        return bisect_right(self.starts, point)
+
+
+def _search_in_range(view, pattern, start, end):
+    match = view.find(pattern, start)
+    return match and match[0] >= start and match[1] <= end
+
+
+def _find_last_match(view, pattern, start, end):
+    found = match = view.find(pattern, start)
+    while match and match[1] <= end:
+        found = match
+        match = view.find(pattern, match[1] if match[1] > match[0]
+                                            else match[1] + 1)
+    return found
+
+
+def bisection(view, pattern, end):
+    """The old ex_location.reverse_search, minus the Sublime Text API.
+    """
+    end = view.line(end)[1]
+    last_line = None
+    lo, hi = 0, end
+    while True:
+        line = view.line((lo + hi) / 2)
+        middle = line[0]
+        if _search_in_range(view, pattern, middle, hi):
+            lo = middle
+        elif _search_in_range(view, pattern, lo, middle - 1):
+            hi = middle - 1
+        else:
+            return None
+        if last_line and line[0] <= last_line[0] and last_line[1] <= line[1]:
+            match = _find_last_match(view, pattern, lo, hi)
+            return view.line_nr(match[0])
+        last_line = line
+
+
+def chunked(view, pattern, end):
+    end = view.line(end)[1]
+    match = last_match(pattern, view.substr, 0, end)
+    if match:
+        return view.line_nr(match[0])
+
+
+def main():
+    patterns = [('rare', re.compile('^done done done', re.M)),
+                ('common', re.compile('WARN', re.M)),
+                ('absent', re.compile('no such text', re.M))]
+    print '%-20s %9s %12s %12s %14s %14s' % ('pattern', 'lines',
+                                            'bisection', 'chunked',
+                                            'chars (bis.)', 'chars (chk.)')
+    for n in SIZES:
+        text = make_log(n)
+        for name, pattern in patterns:
+            old_view, new_view = StringView(text), StringView(text)
+            end = len(text)
+            expected = None
+            for m in pattern.finditer(text):
+                expected = bisect_right(old_view.starts, m.start())
+            assert chunked(new_view, pattern, end) == expected, name
+            old_result = bisection(old_view, pattern, end)
+            if old_result != expected:
+                print '  bisection disagrees for %r: %r != %r' % (
+                                                name, old_result, expected)
+            old = best_of(lambda: bisection(old_view, pattern, end))
+            new = best_of(lambda: chunked(new_view, pattern, end))
+            # Count the characters scanned by a single run.
+            old_view.scanned = new_view.scanned = 0
+            bisection(old_view, pattern, end)
+            chunked(new_view, pattern, end)
+            print '%-20s %9d %11.4fs %11.4fs %14d %14d' % (
+                            name, n, old, new,
+                            old_view.scanned, new_view.scanned)
+
+
+if __name__ == '__main__':
+    main()
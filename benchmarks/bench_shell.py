@@ -0,0 +1,68 @@
+"""filtering 1, 10 and 100 regions through a command, one at a time vs
+several at once, starting a shell for each region vs reusing coprocesses
+
+Filters that mostly wait gain the most from running at once; filters that
+keep a CPU busy only gain as many times as there are CPUs.
+"""
+
+import os
+
+import sublime
+
+from benchmarks import best_of
+from vex import shell
+
+
+REGIONS = (1, 10, 100)
+# (regions filtered at once, coprocesses)
+SETTINGS = ((1, 0), (shell.DEFAULT_FILTER_CONCURRENCY, 0), (16, 0),
+            (1, 1), (shell.DEFAULT_FILTER_CONCURRENCY,
+                     shell.DEFAULT_FILTER_CONCURRENCY))
+COMMANDS = ('sort', 'sleep 0.01; sort')
+LINES_PER_REGION = 50
+
+
+def make_view(count):
+    view = sublime.Window().new_file()
+    block = '\n'.join('line %d' % (LINES_PER_REGION - i)
+                      for i in range(LINES_PER_REGION))
+    view._set_text('\n\n'.join([block] * count))
+    return view
+
+
+def regions_of(view):
+    """Returns the blocks of the view, which are separated by empty lines.
+    """
+    text = view.substr(sublime.Region(0, view.size()))
+    regions = []
+    start = 0
+    for block in text.split('\n\n'):
+        regions.append(sublime.Region(start, start + len(block)))
+        start += len(block) + 2
+    return regions
+
+
+def filter_all(command, count, concurrency, coprocesses):
+    view = make_view(count)
+    view.settings().set('vintageex_filter_concurrency', concurrency)
+    view.settings().set('vintageex_filter_coprocesses', coprocesses)
+    shell.filter_thru_shell(view, regions_of(view), command)
+
+
+def main():
+    for command in COMMANDS:
+        print command
+        for count in REGIONS:
+            for concurrency, coprocesses in SETTINGS:
+                seconds = best_of(lambda: filter_all(command, count,
+                                                     concurrency, coprocesses))
+                print ("  %4d regions  %2d at once  %d coprocesses  %8.4fs  "
+                       "%6.2fms/region" % (count, concurrency, coprocesses,
+                                           seconds, seconds / count * 1000))
+    if os.name == 'posix':
+        from plat import posix
+        posix.close_pools()
+
+
+if __name__ == '__main__':
+    main()
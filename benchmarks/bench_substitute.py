@@ -0,0 +1,52 @@
+"""scaling of the :substitute engine over buffers of growing size
+"""
+
+import random
+import re
+
+from benchmarks import best_of
+from benchmarks import report_scaling
+from vex.ex_substitute import substitute_block
+from vex.ex_substitute import substitute_lines
+
+
+SIZES = (1000, 10000, 100000, 200000)
+WORDS = ('foo', 'bar', 'baz', 'qux', 'INFO', 'WARN', 'request', 'done')
+
+
+def make_log(lines, seed=0):
+    rnd = random.Random(seed)
+    return '\n'.join(' '.join(rnd.choice(WORDS) for i in range(8))
+                     for j in range(lines))
+
+
+def per_line(pattern, replacement, text, count):
+    """The strategy the engine replaced: one substitution per line.
+    """
+    return [pattern.sub(replacement, line, count)
+                                        for line in text.split('\n')]
+
+
+def main():
+    dense = re.compile('foo', re.MULTILINE)
+    sparse = re.compile('^done done', re.MULTILINE)
+    buffers = [(n, make_log(n)) for n in SIZES]
+
+    for name, pattern in (('dense', dense), ('sparse', sparse)):
+        report_scaling('substitute_lines (%s matches)' % name,
+                       [(n, best_of(lambda: substitute_lines(pattern, 'X', text)))
+                                                    for (n, text) in buffers])
+        report_scaling('per-line re.sub (%s matches)' % name,
+                       [(n, best_of(lambda: per_line(pattern, 'X', text, 0)))
+                                                    for (n, text) in buffers])
+
+    # Joining every line after "done" with the next one, as in
+    # :%s/done\n/done /
+    joined = re.compile('done\n', re.MULTILINE)
+    report_scaling('substitute_block (joining lines)',
+                   [(n, best_of(lambda: substitute_block(joined, 'done ', text)))
+                                                    for (n, text) in buffers])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""reproducible synthetic buffers for the benchmarks
+
+Every kind of buffer has 'foo' on some of its lines, for :s and :g to work
+on, and 'needle' on every NEEDLE_EVERY-th line, for searches. The same kind,
+size and seed always make the same text.
+"""
+
+import random
+
+
+NEEDLE_EVERY = 997
+WORDS = ('bar', 'baz', 'qux', 'spam', 'eggs', 'request', 'done', 'value')
+LEVELS = ('DEBUG', 'INFO', 'INFO', 'INFO', 'WARN', 'ERROR')
+
+
+def code_line(rnd, i):
+    indent = '    ' * rnd.randint(0, 3)
+    name = rnd.choice(WORDS)
+    if rnd.random() < 0.2:
+        name = 'foo_' + name
+    form = rnd.randint(0, 3)
+    if form == 0:
+        return '%sdef %s(self, %s):' % (indent, name, rnd.choice(WORDS))
+    if form == 1:
+        return '%sreturn %s(%d)' % (indent, name, i)
+    if form == 2:
+        return '%s%s = %s.%s' % (indent, name, rnd.choice(WORDS),
+                                 rnd.choice(WORDS))
+    return '%s# %s %s' % (indent, rnd.choice(WORDS), rnd.choice(WORDS))
+
+
+def log_line(rnd, i):
+    words = [rnd.choice(WORDS) for j in range(6)]
+    if rnd.random() < 0.1:
+        words[rnd.randint(0, 5)] = 'foo'
+    return '2012-09-%02d %02d:%02d:%02d [%s] %s' % (
+                                        i % 28 + 1, i / 3600 % 24,
+                                        i / 60 % 60, i % 60,
+                                        rnd.choice(LEVELS), ' '.join(words))
+
+
+def long_line(rnd, i):
+    return ' '.join(rnd.choice(WORDS + ('foo',)) for j in range(100))
+
+
+def many_matches_line(rnd, i):
+    return ' '.join(rnd.choice(('foo', 'foo', rnd.choice(WORDS)))
+                                                        for j in range(8))
+
+
+def few_matches_line(rnd, i):
+    words = [rnd.choice(WORDS) for j in range(8)]
+    if i % 10000 == 5000:
+        words[0] = 'foo'
+    return ' '.join(words)
+
+
+KINDS = {
+    'code': code_line,
+    'log': log_line,
+    'long_lines': long_line,
+    'many_matches': many_matches_line,
+    'few_matches': few_matches_line,
+}
+
+
+def make_buffer(kind, lines, seed=0):
+    """Returns `lines` lines of text of the given `kind`, without a trailing
+    newline.
+    """
+    rnd = random.Random(seed)
+    make_line = KINDS[kind]
+    text = []
+    for i in xrange(lines):
+        line = make_line(rnd, i)
+        if i % NEEDLE_EVERY == NEEDLE_EVERY / 2:
+            line += ' needle'
+        text.append(line)
+    return u'\n'.join(text)
@@ -1,3 +1,6 @@
+from vex import startup
+_load_started = startup.start()
+
 import sublime
 import sublime_plugin
 
@@ -5,21 +8,24 @@ import sys
 import os
 
 # We use several commands implemented in Vintange, so make it available here.
+# Vintage itself is only imported once registers are needed.
 sys.path.append(os.path.join(sublime.packages_path(), 'Vintage'))
 
+import itertools
 import re
-import subprocess
-
-from vintage import g_registers
 
-from plat.windows import get_oem_cp
-from plat.windows import get_startup_info
+from vex import api_calls
+from vex import cache
+from vex import ex_command_parser
 from vex import ex_error
+from vex import ex_global
+from vex import ex_location
 from vex import ex_range
+from vex import ex_substitute
+from vex import file_reader
 from vex import shell
 from vex import parsers
-
-GLOBAL_RANGES = []
+from vex import profiling
 
 CURRENT_LINE_RANGE = {'left_ref': '.', 'left_offset': 0, 'left_search_offsets': [],
                       'right_ref': None, 'right_offset': 0, 'right_search_offsets': []}
@@ -32,15 +38,35 @@ class VintageExState(object):
     search_buffer_type = 'find_under'
 
 
+class ExTextCommand(sublime_plugin.TextCommand):
+    """Base class of ex commands. While view API calls are being counted,
+    self.view is a proxy counting the calls made through it.
+    """
+    def _get_view(self):
+        return api_calls.wrap(self._view)
+
+    def _set_view(self, view):
+        self._view = view
+
+    view = property(_get_view, _set_view)
+
+
 def is_any_buffer_dirty(window):
     for v in window.views():
         if v.is_dirty():
             return True
 
 
+def get_registers():
+    """Returns Vintage's registers.
+    """
+    from vintage import g_registers
+    return g_registers
+
+
 # TODO: this code must be shared with Vintage, not reimplemented here.
 def set_register(text, register):
-    global g_registers
+    g_registers = get_registers()
     if register == '*' or register == '+':
         sublime.set_clipboard(text)
     elif register == '%':
@@ -81,14 +107,6 @@ def gather_buffer_info(v):
 
 
 def get_region_by_range(view, line_range=None, as_lines=False):
-    # If GLOBAL_RANGES exists, the ExGlobal command has been run right before
-    # the current command, and we know we must process these lines.
-    global GLOBAL_RANGES
-    if GLOBAL_RANGES:
-        rv = GLOBAL_RANGES[:]
-        GLOBAL_RANGES = []
-        return rv
-
     if line_range:
         vim_range = ex_range.VimRange(view, line_range)
         if as_lines:
@@ -97,7 +115,53 @@ def get_region_by_range(view, line_range=None, as_lines=False):
             return vim_range.blocks()
 
 
-class ExGoto(sublime_plugin.TextCommand):
+def join_adjacent_lines(lines):
+    """Returns the blocks formed by runs of consecutive `lines`. As `lines`,
+    blocks don't end in a newline char.
+    """
+    blocks = []
+    for line in sorted(lines, key=lambda r: r.begin()):
+        if blocks and blocks[-1].end() + 1 >= line.begin():
+            blocks[-1] = sublime.Region(blocks[-1].begin(),
+                                        max(blocks[-1].end(), line.end()))
+        else:
+            blocks.append(sublime.Region(line.begin(), line.end()))
+    return blocks
+
+
+def substr_lines(view, lines):
+    """Returns the text of every region in `lines`, which must be sorted,
+    reading from the view only once.
+    """
+    if not lines:
+        return []
+    base = lines[0].begin()
+    text = view.substr(sublime.Region(base, lines[-1].end()))
+    return [text[r.begin() - base:r.end() - base] for r in lines]
+
+
+def is_absolute_address(address):
+    """Returns True if `address` names the same line whichever the current
+    one is: a line number or $.
+    """
+    return re.match(r'^\s*(\d+|\$)\s*$', address) is not None
+
+
+def calculate_target_line(view, address):
+    """Returns the number of the line below which :move and :copy should put
+    text for `address`, or None if `address` is invalid. 0 means above the
+    first line.
+    """
+    if address.strip() == '0':
+        return 0
+    parsed_address = parsers.cmd_line.AddressParser(address).parse()
+    row = ex_range.calculate_address(view, parsed_address)
+    if row is None:
+        return None
+    return row + 1
+
+
+class ExGoto(ExTextCommand):
     def run(self, edit, line_range=None):
         if not line_range['text_range']:
             # No-op: user issued ":".
@@ -108,7 +172,7 @@ class ExGoto(sublime_plugin.TextCommand):
         self.view.show(self.view.sel()[0])
 
 
-class ExShellOut(sublime_plugin.TextCommand):
+class ExShellOut(ExTextCommand):
     """Ex command(s): :!cmd, :'<,>'!cmd
 
     Run cmd in a system's shell or filter selected regions through external
@@ -127,7 +191,7 @@ class ExShellOut(sublime_plugin.TextCommand):
             ex_error.handle_not_implemented()
 
 
-class ExShell(sublime_plugin.TextCommand):
+class ExShell(ExTextCommand):
     """Ex command(s): :shell
 
     Opens a shell at the current view's directory. Sublime Text keeps a virtual
@@ -137,7 +201,8 @@ class ExShell(sublime_plugin.TextCommand):
     """
     def open_shell(self, command):
         view_dir = os.path.dirname(self.view.file_name())
-        return subprocess.Popen(command, cwd=view_dir)
+        # Interactive, so no timeout.
+        return shell.Runner(command, capture=False, cwd=view_dir).run()
 
     def run(self, edit):
         if sublime.platform() == 'linux':
@@ -147,7 +212,7 @@ class ExShell(sublime_plugin.TextCommand):
                 sublime.status_message("VintageEx: Not terminal name found.")
                 return
             try:
-                self.open_shell([term, '-e', 'bash']).wait()
+                self.open_shell([term, '-e', 'bash'])
             except Exception as e:
                 print e
                 sublime.status_message("VintageEx: Error while executing command through shell.")
@@ -159,66 +224,212 @@ class ExShell(sublime_plugin.TextCommand):
                 sublime.status_message("VintageEx: Not terminal name found.")
                 return
             try:
-                self.open_shell([term, '-e', 'bash']).wait()
+                self.open_shell([term, '-e', 'bash'])
             except Exception as e:
                 print e
                 sublime.status_message("VintageEx: Error while executing command through shell.")
                 return
         elif sublime.platform() == 'windows':
-            self.open_shell(['cmd.exe', '/k']).wait()
+            self.open_shell(['cmd.exe', '/k'])
         else:
             # XXX OSX (make check explicit)
             ex_error.handle_not_implemented()
 
 
-class ExReadShellOut(sublime_plugin.TextCommand):
-    def run(self, edit, line_range=None, name='', plusplus_args='', forced=False):
-        target_line = self.view.line(self.view.sel()[0].begin())
-        if line_range['text_range']:
-            range = max(ex_range.calculate_range(self.view, line_range=line_range)[0])
-            target_line = self.view.line(self.view.text_point(range, 0))
-        target_point = min(target_line.b + 1, self.view.size())
+# ShellReaders for :r !cmd running in the background, by view id.
+SHELL_READERS = {}
+# Spinner shown in the status bar while they run.
+SPINNER = '|/-\\'
+
+
+def read_shell_async(view, point, cmd):
+    """Inserts the output of `cmd` at `point` as it comes, without blocking
+    the editor. Esc cancels it.
+    """
+    from plat import posix
+    from vex.encoding import python_codec
+
+    if view.id() in SHELL_READERS:
+        sublime.status_message("VintageEx: Already reading from a command.")
+        return
+    the_shell = posix.get_shell(view, 'vintageex_%s_shell' % sublime.platform())
+    # The last newline is dropped, so it is held back until more comes.
+    state = {'held': u'', 'updates': 0}
+    # The user may edit the view while output comes in: a region keeps
+    # track of where the next batch goes.
+    view.add_regions('vintageex_read_shell', [sublime.Region(point)], '', '',
+                     sublime.HIDDEN)
+
+    def on_output(text):
+        text = state['held'] + text
+        state['held'] = u''
+        if text.endswith('\n'):
+            text, state['held'] = text[:-1], u'\n'
+        point = view.get_regions('vintageex_read_shell')[0].begin()
+        # Each batch is an undo step of its own. One step for all of them
+        # would also undo whatever the user typed in between.
+        edit = view.begin_edit('ex_read_shell_out')
+        try:
+            view.insert(edit, point, text)
+        finally:
+            view.end_edit(edit)
+        view.add_regions('vintageex_read_shell',
+                         [sublime.Region(point + len(text))], '', '',
+                         sublime.HIDDEN)
+        show_progress()
+
+    def show_progress():
+        state['updates'] += 1
+        view.set_status('vintageex_read_shell',
+                        "VintageEx: %s reading from %s, %d lines "
+                        "(Esc cancels)" % (SPINNER[state['updates'] % 4], cmd,
+                                            reader.lines))
+
+    def on_done(result):
+        del SHELL_READERS[view.id()]
+        view.erase_regions('vintageex_read_shell')
+        view.settings().erase('vintageex_reading_shell')
+        view.erase_status('vintageex_read_shell')
+        shell.report(view.window(), cmd, [result])
+
+    reader = shell.ShellReader([the_shell, '-c', cmd], on_output, on_done,
+                               sublime.set_timeout,
+                               encoding=python_codec(view.encoding()))
+    SHELL_READERS[view.id()] = reader
+    # For the Esc key binding.
+    view.settings().set('vintageex_reading_shell', True)
+    show_progress()
+    try:
+        reader.start()
+    except Exception as e:
+        print e
+        on_done(shell.Result())
+        sublime.status_message("VintageEx: Error while executing command through shell.")
+
+
+class ExReadShellOutCancel(sublime_plugin.TextCommand):
+    """Cancels the :r !cmd reading into the view in the background.
+    """
+    def run(self, edit):
+        reader = SHELL_READERS.get(self.view.id())
+        if reader:
+            reader.cancel()
+
+
+class ExReadShellOut(ExTextCommand):
+    def run(self, edit, line_range=None, name='', plusplus_args='', forced=False,
+            shell_cmd=''):
+        if shell_cmd:
+            name, forced = shell_cmd, True
 
         # cheat a little bit to get the parsing right:
         #   - forced == True means we need to execute a command
         if forced:
-            if sublime.platform() == 'linux':
-                for s in self.view.sel():
-                    # TODO: make shell command configurable.
-                    the_shell = self.view.settings().get('linux_shell')
-                    the_shell = the_shell or os.path.expandvars("$SHELL")
-                    if not the_shell:
-                        sublime.status_message("VintageEx: No shell name found.")
-                        return
-                    try:
-                        p = subprocess.Popen([the_shell, '-c', name],
-                                                            stdout=subprocess.PIPE)
-                    except Exception as e:
-                        print e
-                        sublime.status_message("VintageEx: Error while executing command through shell.")
-                        return
-                    self.view.insert(edit, s.begin(), p.communicate()[0][:-1])
-            elif sublime.platform() == 'windows':
-                for s in self.view.sel():
-                    p = subprocess.Popen(['cmd.exe', '/C', name],
-                                            stdout=subprocess.PIPE,
-                                            startupinfo=get_startup_info()
-                                            )
-                    cp = 'cp' + get_oem_cp()
-                    rv = p.communicate()[0].decode(cp)[:-2].strip()
-                    self.view.insert(edit, s.begin(), rv)
+            if (self.view.settings().get('vintageex_read_shell_async') and
+                sublime.platform() != 'windows'):
+                    read_shell_async(api_calls.unwrap(self.view),
+                                     self.view.sel()[0].begin(), name)
             else:
-                ex_error.handle_not_implemented()
+                self.read_shell(edit, name)
         # Read a file into the current view.
         else:
             # According to Vim's help, :r should read the current file's content
             # if no file name is given, but Vim doesn't do that.
-            # TODO: implement reading a file into the buffer.
-            ex_error.handle_not_implemented()
-            return
+            self.read_file(edit, line_range, name, plusplus_args)
 
+    def read_file(self, edit, line_range, name, plusplus_args):
+        """Inserts the file `name` below the addressed line, or above the
+        first one for line 0.
+        """
+        path = file_reader.resolve_path(name, self.view.file_name())
+        try:
+            chunks = file_reader.file_text(path, self.view.encoding(),
+                                           plusplus_args)
+        except LookupError:
+            ex_error.display_error(ex_error.ERR_INVALID_ARGUMENT, plusplus_args)
+            return
+        except (IOError, OSError):
+            ex_error.display_error(ex_error.ERR_CANT_OPEN_FILE, name)
+            return
 
-class ExPromptSelectOpenFile(sublime_plugin.TextCommand):
+        if line_range['text_range'].strip() == '0':
+            point = 0
+        else:
+            if line_range['text_range']:
+                ranges, _ = ex_range.new_calculate_range(self.view, line_range)
+                row = max(ranges[0])
+            else:
+                row = self.view.rowcol(self.view.sel()[0].begin())[0] + 1
+            line = self.view.line(self.view.text_point(row - 1, 0))
+            if line.b < self.view.size():
+                point = line.b + 1
+            elif line.empty():
+                # The empty line after the buffer's last newline.
+                point = line.b
+            else:
+                # The last line has no newline: start a line and leave the
+                # text's last newline out instead.
+                self.insert_chunks(edit, line.b,
+                                   itertools.chain([u'\n'], chunks))
+                return
+        # The text goes at the start of a line, so it needs a newline of its
+        # own.
+        text = u''
+        for text in chunks:
+            self.view.insert(edit, point, text)
+            point += len(text)
+        if text and not text.endswith(u'\n'):
+            self.view.insert(edit, point, u'\n')
+
+
+    def read_shell(self, edit, cmd):
+        """Inserts the output of `cmd` at every cursor.
+        """
+        from vex.encoding import python_codec
+        popen_args = {}
+        if sublime.platform() == 'windows':
+            from plat.windows import get_oem_cp
+            from plat.windows import get_startup_info
+            args = ['cmd.exe', '/C', cmd]
+            encoding = 'cp' + get_oem_cp()
+            popen_args['startupinfo'] = get_startup_info()
+        else:
+            from plat import posix
+            the_shell = posix.get_shell(self.view,
+                                        'vintageex_%s_shell' % sublime.platform())
+            args = [the_shell, '-c', cmd]
+            encoding = python_codec(self.view.encoding())
+        try:
+            result = shell.Runner(args, encoding=encoding,
+                                  timeout=shell.get_timeout(self.view),
+                                  max_memory=shell.get_max_memory(self.view),
+                                  **popen_args).run()
+        except Exception as e:
+            print e
+            sublime.status_message("VintageEx: Error while executing command through shell.")
+            return
+        try:
+            if not (result.timed_out or result.cancelled):
+                for s in reversed(list(self.view.sel())):
+                    if sublime.platform() == 'windows':
+                        rv = result.text().replace('\r\n', '\n').strip()
+                        self.view.insert(edit, s.begin(), rv)
+                    else:
+                        self.insert_chunks(edit, s.begin(), result.chunks())
+        finally:
+            result.close()
+        shell.report(self.view.window(), cmd, [result])
+
+    def insert_chunks(self, edit, point, chunks):
+        """Inserts `chunks` of text at `point`, one after another, leaving
+        out the last newline.
+        """
+        for text in shell.trim_last_newline(chunks):
+            self.view.insert(edit, point, text)
+            point += len(text)
+
+
+class ExPromptSelectOpenFile(ExTextCommand):
     """Ex command(s): :ls, :files
 
     Shows a quick panel listing the open files only. Provides concise
@@ -241,7 +452,7 @@ class ExPromptSelectOpenFile(sublime_plugin.TextCommand):
                 self.view.window().focus_view(v)
 
 
-class ExMap(sublime_plugin.TextCommand):
+class ExMap(ExTextCommand):
     # do at least something moderately useful: open the user's .sublime-keymap
     # file
     def run(self, edit):
@@ -255,7 +466,7 @@ class ExMap(sublime_plugin.TextCommand):
                                         '${packages}/User/Default (%s).sublime-keymap' % platf})
 
 
-class ExAbbreviate(sublime_plugin.TextCommand):
+class ExAbbreviate(ExTextCommand):
     # for them moment, just open a completions file.
     def run(self, edit):
         abbs_file_name = 'VintageEx Abbreviations.sublime-completions'
@@ -269,12 +480,12 @@ class ExAbbreviate(sublime_plugin.TextCommand):
                                     {'file': "${packages}/User/%s" % abbs_file_name})
 
 
-class ExPrintWorkingDir(sublime_plugin.TextCommand):
+class ExPrintWorkingDir(ExTextCommand):
     def run(self, edit):
         sublime.status_message(os.getcwd())
 
 
-class ExWriteFile(sublime_plugin.TextCommand):
+class ExWriteFile(ExTextCommand):
     def run(self, edit,
                 line_range=None,
                 forced=False,
@@ -319,19 +530,19 @@ class ExWriteFile(sublime_plugin.TextCommand):
                 self.view.run_command('save')
 
 
-class ExWriteAll(sublime_plugin.TextCommand):
+class ExWriteAll(ExTextCommand):
     def run(self, edit, forced=False):
         for v in self.view.window().views():
             if v.is_dirty():
                 v.run_command('save')
 
 
-class ExNewFile(sublime_plugin.TextCommand):
+class ExNewFile(ExTextCommand):
     def run(self, edit, forced=False):
         self.view.window().run_command('new_file')
 
 
-class ExFile(sublime_plugin.TextCommand):
+class ExFile(ExTextCommand):
     def run(self, edit, forced=False):
         # XXX figure out what the right params are. vim's help seems to be
         # wrong
@@ -370,15 +581,10 @@ class ExFile(sublime_plugin.TextCommand):
         sublime.status_message('VintageEx: %s' % msg)
 
 
-class ExMove(sublime_plugin.TextCommand):
+class ExMove(ExTextCommand):
     def run(self, edit, line_range=None, forced=False, address=''):
-        # make sure we have a default range
-        if not line_range['text_range']:
-            line_range['text_range'] = '.'
-        address_parser = parsers.cmd_line.AddressParser(address)
-        parsed_address = address_parser.parse()
-        address = ex_range.calculate_address(self.view, parsed_address)
-        if address is None:
+        target = calculate_target_line(self.view, address)
+        if target is None:
             ex_error.display_error(ex_error.ERR_INVALID_ADDRESS)
             return
 
@@ -386,8 +592,8 @@ class ExMove(sublime_plugin.TextCommand):
         line_block = [self.view.substr(r) for r in line_block]
 
         text = '\n'.join(line_block) + '\n'
-        if address != 0:
-            dest = self.view.line(self.view.text_point(address, 0)).end() + 1
+        if target != 0:
+            dest = self.view.line(self.view.text_point(target - 1, 0)).end() + 1
         else:
             dest = 0
 
@@ -405,14 +611,42 @@ class ExMove(sublime_plugin.TextCommand):
         for r in reversed(get_region_by_range(self.view, line_range)):
             self.view.erase(edit, self.view.full_line(r))
 
+    def run_batch(self, edit, lines, address=''):
+        """Moves every line in `lines` below `address`, as if :move were run
+        for each line in turn, with a single replace.
+        """
+        target = calculate_target_line(self.view, address)
+        if target is None:
+            ex_error.display_error(ex_error.ERR_INVALID_ADDRESS)
+            return
 
-class ExCopy(sublime_plugin.TextCommand):
+        index = ex_location.get_line_index(self.view)
+        first_row = index.row(lines[0].begin()) + 1
+        last_row = index.row(lines[-1].begin()) + 1
+        lo = min(first_row, target + 1)
+        hi = max(last_row, target)
+        span = sublime.Region(index.point(lo - 1), index.line(hi - 1)[1])
+        text = self.view.substr(span)
+
+        marked = set(index.row(r.begin()) - (lo - 1) for r in lines)
+        span_lines = text.split('\n')
+        split_at = target - lo + 1
+        above = [i for i in range(split_at) if i not in marked]
+        below = [i for i in range(split_at, len(span_lines)) if i not in marked]
+        moved_up = [i for i in sorted(marked) if i < split_at]
+        # Lines moved from below the target each land right under it, so
+        # they end up in reverse order.
+        moved_down = [i for i in sorted(marked, reverse=True) if i >= split_at]
+
+        order = above + moved_up + moved_down + below
+        self.view.replace(edit, span, '\n'.join(span_lines[i] for i in order))
+
+
+class ExCopy(ExTextCommand):
     # todo: do null ranges always default to '.'?
     def run(self, edit, line_range=CURRENT_LINE_RANGE, forced=False, address=''):
-        address_parser = parsers.cmd_line.AddressParser(address)
-        parsed_address = address_parser.parse()
-        address = ex_range.calculate_address(self.view, parsed_address)
-        if address is None:
+        target = calculate_target_line(self.view, address)
+        if target is None:
             ex_error.display_error(ex_error.ERR_INVALID_ADDRESS)
             return
 
@@ -420,10 +654,10 @@ class ExCopy(sublime_plugin.TextCommand):
         line_block = [self.view.substr(r) for r in line_block]
 
         text = '\n'.join(line_block) + '\n'
-        if address != 0:
-            dest = self.view.line(self.view.text_point(address, 0)).end() + 1
+        if target != 0:
+            dest = self.view.line(self.view.text_point(target - 1, 0)).end() + 1
         else:
-            dest = address
+            dest = 0
         if dest > self.view.size():
             dest = self.view.size()
             text = '\n' + text[:-1]
@@ -433,8 +667,33 @@ class ExCopy(sublime_plugin.TextCommand):
         cursor_dest = self.view.line(dest + len(text) - 1).begin()
         self.view.sel().add(sublime.Region(cursor_dest, cursor_dest))
 
+    def run_batch(self, edit, lines, address=''):
+        """Copies every line in `lines` below `address`, as if :copy were run
+        for each line in turn, with a single insert.
+        """
+        target = calculate_target_line(self.view, address)
+        if target is None:
+            ex_error.display_error(ex_error.ERR_INVALID_ADDRESS)
+            return
+
+        copies = substr_lines(self.view, lines)
+        # $ moves along with each copy; any other address stays put, so each
+        # copy lands above the previous one.
+        if address.strip() != '$':
+            copies.reverse()
+        text = '\n'.join(copies)
+
+        if target == 0:
+            self.view.insert(edit, 0, text + '\n')
+            return
+        eol = ex_location.get_line_index(self.view).line(target - 1)[1]
+        if eol == self.view.size():
+            self.view.insert(edit, eol, '\n' + text)
+        else:
+            self.view.insert(edit, eol + 1, text + '\n')
+
 
-class ExOnly(sublime_plugin.TextCommand):
+class ExOnly(ExTextCommand):
     """ Command: :only
     """
     def run(self, edit, forced=False):
@@ -453,7 +712,7 @@ class ExOnly(sublime_plugin.TextCommand):
                 w.run_command('close')
 
 
-class ExDoubleAmpersand(sublime_plugin.TextCommand):
+class ExDoubleAmpersand(ExTextCommand):
     """ Command :&&
     """
     def run(self, edit, line_range=None, flags='', count=''):
@@ -461,13 +720,27 @@ class ExDoubleAmpersand(sublime_plugin.TextCommand):
                                                 'pattern': flags + count})
 
 
-class ExSubstitute(sublime_plugin.TextCommand):
+class ExSubstitute(ExTextCommand):
     most_recent_pat = None
     most_recent_flags = ''
     most_recent_replacement = ''
 
     def run(self, edit, line_range=None, pattern=''):
-
+        substitution = self.parse_substitution(pattern)
+        if substitution:
+            regions = get_region_by_range(self.view, line_range=line_range)
+            self.substitute(edit, regions, *substitution)
+
+    def run_batch(self, edit, lines, pattern=''):
+        substitution = self.parse_substitution(pattern)
+        if substitution:
+            self.substitute(edit, join_adjacent_lines(lines), *substitution)
+
+    def parse_substitution(self, pattern):
+        """Returns a tuple (compiled_pattern, replacement, count,
+        across_lines) for the :substitute argument `pattern`, or None if it's
+        invalid.
+        """
         # :s
         if not pattern:
             pattern = ExSubstitute.most_recent_pat
@@ -501,49 +774,87 @@ class ExSubstitute(sublime_plugin.TextCommand):
             ExSubstitute.most_recent_replacement = replacement
             ExSubstitute.most_recent_flags = flags
 
-        computed_flags = 0
+        # Patterns with \n or \_. run over whole blocks instead of lines.
+        across_lines = ex_substitute.spans_lines(pattern)
+        computed_flags = re.MULTILINE
         computed_flags |= re.IGNORECASE if (flags and 'i' in flags) else 0
         try:
-            pattern = re.compile(pattern, flags=computed_flags)
+            pattern = cache.compile_pattern(ex_substitute.translate(pattern),
+                                            flags=computed_flags)
         except Exception, e:
             sublime.status_message("VintageEx [regex error]: %s ... in pattern '%s'" % (e.message, pattern))
             print "VintageEx [regex error]: %s ... in pattern '%s'" % (e.message, pattern)
             return
 
         replace_count = 0 if (flags and 'g' in flags) else 1
-
-        target_region = get_region_by_range(self.view, line_range=line_range, as_lines=True)
-        for r in reversed(target_region):
-            line_text = self.view.substr(self.view.line(r))
-            rv = re.sub(pattern, replacement, line_text, count=replace_count)
-            self.view.replace(edit, self.view.line(r), rv)
+        return pattern, replacement, replace_count, across_lines
+
+    def substitute(self, edit, regions, pattern, replacement, replace_count,
+                   across_lines=False):
+        # Read each block once and only write back the lines that changed.
+        if across_lines:
+            # Matches starting on a block's last line may go on into the
+            # next line, as they can in Vim.
+            index = ex_location.get_line_index(self.view)
+            ends = [index.line(index.row(r.end()) + 1)[1] for r in regions]
+        total_matches = total_lines = 0
+        for i, r in reversed(list(enumerate(regions))):
+            if across_lines:
+                text = self.view.substr(sublime.Region(r.begin(), ends[i]))
+                changes, matches, lines = ex_substitute.substitute_block(
+                                                    pattern,
+                                                    replacement,
+                                                    text,
+                                                    count=replace_count,
+                                                    last=r.size())
+            else:
+                changes, matches, lines = ex_substitute.substitute_lines(
+                                                    pattern,
+                                                    replacement,
+                                                    self.view.substr(r),
+                                                    count=replace_count)
+            for begin, end, text in reversed(changes):
+                self.view.replace(edit, sublime.Region(r.begin() + begin,
+                                                       r.begin() + end), text)
+            total_matches += matches
+            total_lines += lines
+
+        if total_matches:
+            sublime.status_message("VintageEx: %d substitutions on %d lines" %
+                                   (total_matches, total_lines))
+        else:
+            sublime.status_message("VintageEx: Pattern not found: %s" %
+                                   pattern.pattern)
 
 
-class ExDelete(sublime_plugin.TextCommand):
+class ExDelete(ExTextCommand):
     def run(self, edit, line_range=None, register='', count=''):
-        # XXX somewhat different to vim's behavior
         rs = get_region_by_range(self.view, line_range=line_range)
-        self.view.sel().clear()
+        self.delete(edit, rs, register)
 
-        to_store = []
-        for r in rs:
-            self.view.sel().add(r)
-            if register:
-                to_store.append(self.view.substr(self.view.full_line(r)))
+    def run_batch(self, edit, lines, register='', count=''):
+        self.delete(edit, lines, register)
 
+    def delete(self, edit, regions, register):
+        """Deletes the lines spanned by `regions` with one .erase() per run of
+        consecutive lines. Selections are left alone.
+        """
+        runs = join_adjacent_lines(regions)
         if register:
-            text = ''.join(to_store)
-            # needed for lines without a newline character
-            if not text.endswith('\n'):
-                text = text + '\n'
+            text = '\n'.join(self.view.substr(r) for r in runs) + '\n'
             set_register(text, register)
 
-        self.view.run_command('split_selection_into_lines')
-        self.view.run_command('run_macro_file',
-                        {'file': 'Packages/Default/Delete Line.sublime-macro'})
+        size = self.view.size()
+        for r in reversed(runs):
+            if r.end() < size:
+                self.view.erase(edit, sublime.Region(r.begin(), r.end() + 1))
+            else:
+                # The last line has no newline char; take the previous one.
+                self.view.erase(edit, sublime.Region(max(r.begin() - 1, 0),
+                                                     r.end()))
 
 
-class ExGlobal(sublime_plugin.TextCommand):
+class ExGlobal(ExTextCommand):
     """Ex command(s): :global
 
     :global filters lines where a pattern matches and then applies the supplied
@@ -571,11 +882,10 @@ class ExGlobal(sublime_plugin.TextCommand):
     def run(self, edit, line_range=None, forced=False, pattern=''):
 
         if not line_range['text_range']:
-            line_range['text_range'] = '%'
-            line_range['left_ref'] = '%'
+            line_range = dict(line_range, text_range='%', left_ref='%')
         try:
             global_pattern, subcmd = parsers.g_cmd.split(pattern)
-        except ValueError:
+        except (ValueError, SyntaxError):
             msg = "VintageEx: Bad :global pattern. (%s)" % pattern
             sublime.status_message(msg)
             print msg
@@ -590,49 +900,94 @@ class ExGlobal(sublime_plugin.TextCommand):
         # Vim does too.
         subcmd = subcmd or 'print'
 
-        rs = get_region_by_range(self.view, line_range=line_range, as_lines=True)
-
-        for r in rs:
-            try:
-                match = re.search(global_pattern, self.view.substr(r))
-            except Exception, e:
-                msg = "VintageEx (global): %s ... in pattern '%s'" % (str(e), global_pattern)
-                sublime.status_message(msg)
-                print msg
+        # Parse the subcommands only once, however many lines they run on.
+        ex_cmds = ex_command_parser.parse_command_line(':' + subcmd)
+        for ex_cmd in ex_cmds:
+            if not (ex_cmd and ex_cmd.name):
+                ex_error.display_error(ex_error.ERR_UNKNOWN_COMMAND, subcmd)
+                return
+            if ex_cmd.parse_errors:
+                ex_error.display_error(ex_cmd.parse_errors[0])
                 return
-            if (match and not forced) or (not match and forced):
-                GLOBAL_RANGES.append(r)
 
-        # don't do anything if we didn't found any target ranges
-        if not GLOBAL_RANGES:
+        try:
+            global_pattern = cache.compile_pattern(global_pattern,
+                                                   flags=re.MULTILINE)
+        except Exception, e:
+            msg = "VintageEx (global): %s ... in pattern '%s'" % (str(e), global_pattern)
+            sublime.status_message(msg)
+            print msg
             return
-        self.view.window().run_command('vi_colon_input',
-                              {'cmd_line': ':' +
-                                    str(self.view.rowcol(r.a)[0] + 1) +
-                                    subcmd})
 
+        index = ex_location.get_line_index(self.view)
+        lines = []
+        for block in get_region_by_range(self.view, line_range=line_range):
+            text = self.view.substr(block)
+            first, last = index.row(block.begin()), index.row(block.end())
+            starts = [p - block.begin() for p in index.starts[first:last + 1]]
+            for a, b in ex_global.matching_lines(global_pattern, text,
+                                                 invert=forced, starts=starts):
+                lines.append(sublime.Region(block.begin() + a,
+                                            block.begin() + b))
 
-class ExPrint(sublime_plugin.TextCommand):
+        # don't do anything if we didn't found any target ranges
+        if not lines:
+            return
+        batch_command = get_batch_command(ex_cmds)
+        if batch_command:
+            batch_command(self.view).run_batch(edit, lines, **ex_cmds[0].args)
+        else:
+            self.run_per_line(lines, ex_cmds)
+
+    def run_per_line(self, lines, ex_cmds):
+        """Runs `ex_cmds` with the cursor on each of `lines` in turn, as Vim
+        does. Lines deleted by the commands run before are skipped.
+        """
+        keys = ['vintageex_global_%d' % i for i in range(len(lines))]
+        # Regions follow the lines as the commands change the text.
+        for key, line in zip(keys, lines):
+            self.view.add_regions(key, [line], '', '', sublime.HIDDEN)
+        window = self.view.window()
+        try:
+            for key, line in zip(keys, lines):
+                regions = self.view.get_regions(key)
+                if not regions or (regions[0].empty() and not line.empty()):
+                    continue
+                self.view.sel().clear()
+                self.view.sel().add(sublime.Region(regions[0].begin()))
+                for ex_cmd in ex_cmds:
+                    window.run_command(ex_cmd.command,
+                                       ex_command_parser.command_args(ex_cmd))
+        finally:
+            for key in keys:
+                self.view.erase_regions(key)
+
+
+class ExPrint(ExTextCommand):
     def run(self, edit, line_range=None, count='1', flags=''):
+        lines = []
+        for r in get_region_by_range(self.view, line_range=line_range):
+            lines.extend(self.view.lines(r))
+        self.run_batch(edit, lines, count=count, flags=flags)
+
+    def run_batch(self, edit, lines, count='1', flags=''):
         if not count.isdigit():
             flags, count = count, ''
-        rs = get_region_by_range(self.view, line_range=line_range)
+        index = ex_location.get_line_index(self.view)
         to_display = []
-        for r in rs:
-            for line in self.view.lines(r):
-                text = self.view.substr(line)
-                if '#' in flags:
-                    row = self.view.rowcol(line.begin())[0] + 1
-                else:
-                    row = ''
-                to_display.append((text, row))
+        for line, text in zip(lines, substr_lines(self.view, lines)):
+            if '#' in flags:
+                row = index.row(line.begin()) + 1
+            else:
+                row = ''
+            to_display.append((text, row))
 
         v = self.view.window().new_file()
         v.set_scratch(True)
         if 'l' in flags:
             v.settings().set('draw_white_space', 'all')
-        for t, r in to_display:
-            v.insert(edit, v.size(), (str(r) + ' ' + t + '\n').lstrip())
+        v.insert(edit, 0, ''.join((str(r) + ' ' + t + '\n').lstrip()
+                                                    for (t, r) in to_display))
 
 
 # TODO: General note for all :q variants:
@@ -683,7 +1038,7 @@ class ExQuitAllCommand(sublime_plugin.WindowCommand):
         self.window.run_command('exit')
 
 
-class ExWriteAndQuitCommand(sublime_plugin.TextCommand):
+class ExWriteAndQuitCommand(ExTextCommand):
     """Ex command(s): :wq
 
     Write and then close the active buffer.
@@ -704,12 +1059,12 @@ class ExWriteAndQuitCommand(sublime_plugin.TextCommand):
         self.view.window().run_command('ex_quit')
 
 
-class ExBrowse(sublime_plugin.TextCommand):
+class ExBrowse(ExTextCommand):
     def run(self, edit):
         self.view.window().run_command('prompt_open_file')
 
 
-class ExEdit(sublime_plugin.TextCommand):
+class ExEdit(ExTextCommand):
     def run_(self, args):
         self.run(args)
 
@@ -725,12 +1080,12 @@ class ExEdit(sublime_plugin.TextCommand):
         ex_error.handle_not_implemented()
 
 
-class ExCquit(sublime_plugin.TextCommand):
+class ExCquit(ExTextCommand):
     def run(self, edit):
         self.view.window().run_command('exit')
 
 
-class ExExit(sublime_plugin.TextCommand):
+class ExExit(ExTextCommand):
     """Ex command(s): :x[it], :exi[t]
 
     Like :wq, but write only when changes have been made.
@@ -749,10 +1104,11 @@ class ExExit(sublime_plugin.TextCommand):
             w.run_command('close')
 
 
-class ExListRegisters(sublime_plugin.TextCommand):
+class ExListRegisters(ExTextCommand):
     """Lists registers in quick panel and saves selected to `"` register."""
 
     def run(self, edit):
+        g_registers = get_registers()
         if not g_registers:
             sublime.status_message('VintageEx: no registers.')
         self.view.window().show_quick_panel(
@@ -763,10 +1119,60 @@ class ExListRegisters(sublime_plugin.TextCommand):
         """Save selected value to `"` register."""
         if idx == -1:
             return
+        g_registers = get_registers()
         g_registers['"'] = g_registers.values()[idx]
 
 
-class ExNew(sublime_plugin.TextCommand):
+class ExProfile(ExTextCommand):
+    """Ex command(s): :exprofile
+
+    Shows how long ex commands have taken to parse, to calculate their
+    ranges and to run the rest of the way (p50, p95 and max). With the
+    vintageex_count_api_calls setting on, also shows the view API calls
+    made by the last run of each command.
+
+        :exprofile!
+
+        Forgets all timings and API call counts.
+
+        :exprofile 10 ~/vintageex.prof
+
+        Profiles the next 10 commands with cProfile and writes the stats to
+        ~/vintageex.prof, or to vintageex.prof in the temp dir if no file
+        name is given.
+    """
+    def run(self, edit, forced=False, count='', file_name=''):
+        if forced:
+            profiling.reset()
+            api_calls.reset()
+            sublime.status_message("VintageEx: timings cleared")
+            return
+
+        if count:
+            import tempfile
+            if file_name:
+                file_name = os.path.expanduser(file_name)
+            else:
+                file_name = os.path.join(tempfile.gettempdir(),
+                                         'vintageex.prof')
+            profiling.start_capture(int(count), file_name)
+            sublime.status_message("VintageEx: profiling the next %s "
+                                   "commands" % count)
+            return
+
+        window = self.view.window()
+        panel = window.get_output_panel('vintageex_profile')
+        panel_edit = panel.begin_edit()
+        try:
+            panel.erase(panel_edit, sublime.Region(0, panel.size()))
+            panel.insert(panel_edit, 0, '\n'.join(profiling.report() +
+                                                  api_calls.report()))
+        finally:
+            panel.end_edit(panel_edit)
+        window.run_command('show_panel', {'panel': 'output.vintageex_profile'})
+
+
+class ExNew(ExTextCommand):
     """Ex command(s): :new
 
     Create a new buffer.
@@ -777,7 +1183,7 @@ class ExNew(sublime_plugin.TextCommand):
         self.view.window().run_command('new_file')
 
 
-class ExYank(sublime_plugin.TextCommand):
+class ExYank(ExTextCommand):
     """Ex command(s): :y[ank]
     """
 
@@ -785,7 +1191,14 @@ class ExYank(sublime_plugin.TextCommand):
         if not register:
             register = '"'
         regs = get_region_by_range(self.view, line_range)
-        text = '\n'.join([self.view.substr(line) for line in regs])
+        self.yank(regs, register)
+
+    def run_batch(self, edit, lines, register=None, count=None):
+        self.yank(lines, register or '"')
+
+    def yank(self, regions, register):
+        text = '\n'.join(substr_lines(self.view, regions))
+        g_registers = get_registers()
         g_registers[register] = text
         if register == '"':
             g_registers['0'] = text
@@ -849,3 +1262,33 @@ class ExTabFirstCommand(sublime_plugin.WindowCommand):
 class ExTabOnlyCommand(sublime_plugin.WindowCommand):
     def run(self, forced=False):
         self.window.run_command("tab_control", {"command": "only", "forced": forced, }, )
+
+
+# Commands that :global can run on all target lines in one go through their
+# .run_batch() method.
+BATCH_COMMANDS = {
+    'ex_copy': ExCopy,
+    'ex_delete': ExDelete,
+    'ex_move': ExMove,
+    'ex_print': ExPrint,
+    'ex_substitute': ExSubstitute,
+    'ex_yank': ExYank,
+}
+
+
+def get_batch_command(ex_cmds):
+    """Returns the command class that can run `ex_cmds` on all of :global's
+    lines in one go, or None if they must run line by line.
+    """
+    ex_cmd = ex_cmds[0]
+    if len(ex_cmds) != 1 or (ex_cmd.line_range and
+                             ex_cmd.line_range['text_range']):
+        return None
+    # A relative address must be resolved again from each line.
+    if (ex_cmd.command in ('ex_copy', 'ex_move') and
+        not is_absolute_address(ex_cmd.args.get('address', ''))):
+            return None
+    return BATCH_COMMANDS.get(ex_cmd.command)
+
+
+startup.record('ex_commands', _load_started)
@@ -2,9 +2,15 @@
 # belongs in Vintage, but we need to extract the necessary functions out of
 # VintageEx first. This is a temporary solution.
 
+from vex import startup
+_load_started = startup.start()
+
 import sublime
 import sublime_plugin
 
+from collections import namedtuple
+import re
+
 from vex import ex_location
 import ex_commands
 
@@ -20,6 +26,16 @@ def compute_flags(view, term):
     return flags
 
 
+# Outcome of a search: the term and flags searched for, the direction, the
+# match found (None if there wasn't any) and whether the search wrapped around.
+SEARCH_RESULT = namedtuple('search_result', 'term flags reversed match wrapped')
+
+REGEX_SPECIAL_CHARS = re.compile(r'[\\.^$*+?{}\[\]|()]')
+
+# Milliseconds to wait before searching while the user types a pattern.
+INCREMENTAL_SEARCH_DELAY = 10
+
+
 class SearchImpl(object):
     last_term = ""
     def __init__(self, view, cmd, remember=True, start_sel=None):
@@ -38,58 +54,40 @@ class SearchImpl(object):
         self.cmd = cmd[1:]
         self.flags = compute_flags(self.view, self.cmd)
 
-    def search(self):
+    def can_resume(self, previous):
+        """Returns True if this search can pick up where the search that
+        produced `previous` left off.
+
+        That's the case when extending a literal term: any match for the
+        longer term is also a match for the shorter one, so it can't come
+        before the previous match (or after it, when searching backwards).
+        """
+        return (previous is not None and
+                getattr(self, "cmd", None) and
+                previous.reversed == self.reversed and
+                previous.flags == self.flags and
+                self.cmd.startswith(previous.term) and
+                not REGEX_SPECIAL_CHARS.search(self.cmd))
+
+    def search(self, previous=None):
+        """Searches for the term and shows the result. If `previous` is
+        given, it must be a result this search can resume from.
+
+        Returns a SEARCH_RESULT.
+        """
         if not getattr(self, "cmd", None):
             return
         if self.remember:
             SearchImpl.last_term = self.cmd
-        sel = self.start_sel[0]
 
-        next_match = None
-        if self.reversed:
-            current_line = self.view.line(self.view.sel()[0])
-            left_side = sublime.Region(current_line.begin(),
-                                       self.view.sel()[0].begin())
-            if ex_location.search_in_range(self.view, self.cmd,
-                                           left_side.begin(),
-                                           left_side.end(),
-                                           self.flags):
-                next_match = ex_location.find_last_match(self.view,
-                                                         self.cmd,
-                                                         left_side.begin(),
-                                                         left_side.end(),
-                                                         self.flags)
-            else:
-                line_nr = ex_location.reverse_search(self.view, self.cmd,
-                                                end=current_line.begin() - 1,
-                                                flags=self.flags)
-                if line_nr:
-                    pt = self.view.text_point(line_nr - 1, 0)
-                    line = self.view.full_line(pt)
-                    if line.begin() != current_line.begin():
-                        next_match = ex_location.find_last_match(self.view,
-                                                             self.cmd,
-                                                             line.begin(),
-                                                             line.end(),
-                                                             self.flags)
+        if previous and not previous.match:
+            # The shorter term wasn't found, so the longer one won't be either.
+            next_match, wrapped = None, previous.wrapped
+        elif self.reversed:
+            next_match, wrapped = self.find_previous(previous)
         else:
-            next_match = self.view.find(self.cmd, sel.end(), self.flags)
-        # handle search restart
-        if not next_match:
-            if self.reversed:
-                sublime.status_message("VintageEx: search hit TOP, continuing at BOTTOM")
-                line_nr = ex_location.reverse_search(self.view, self.cmd, flags=self.flags)
-                if line_nr:
-                    pt = self.view.text_point(line_nr - 1, 0)
-                    line = self.view.full_line(pt)
-                    next_match = ex_location.find_last_match(self.view,
-                                                             self.cmd,
-                                                             line.begin(),
-                                                             line.end(),
-                                                             self.flags)
-            else:
-                sublime.status_message("VintageEx: search hit BOTTOM, continuing at TOP")
-                next_match = self.view.find(self.cmd, 0, sel.end())
+            next_match, wrapped = self.find_next(previous)
+
         # handle result
         if next_match:
             self.view.sel().clear()
@@ -98,10 +96,79 @@ class SearchImpl(object):
                                       sublime.DRAW_OUTLINED)
             else:
                 self.view.sel().add(next_match)
+                self.show_match_count(wrapped)
             self.view.show(next_match)
         else:
             sublime.status_message("VintageEx: Pattern not found:" + self.cmd)
 
+        return SEARCH_RESULT(self.cmd, self.flags, self.reversed, next_match,
+                             wrapped)
+
+    def show_match_count(self, wrapped):
+        """Shows which match the cursor is on out of how many, as in
+        "/foo [3/1274]". The first time, matches are counted in the
+        background and the message shows up once they are.
+        """
+        view, term, flags = self.view, self.cmd, self.flags
+        prefix = "?" if self.reversed else "/"
+
+        def show():
+            if SearchImpl.last_term != term or not view.sel():
+                return
+            index = ex_location.get_match_index(view, term, flags)
+            if index is None:
+                return
+            msg = "VintageEx: %s%s %s[%d/%d]" % (prefix, term,
+                                                wrapped and "W " or "",
+                                                index.ordinal(view.sel()[0].begin()),
+                                                len(index))
+            sublime.status_message(msg)
+
+        try:
+            index = ex_location.get_match_index(view, term, flags,
+                                                on_ready=show)
+            if index is not None:
+                show()
+        except re.error:
+            # Sublime Text's regex flavor accepts some patterns Python's
+            # doesn't; just don't count those.
+            pass
+
+    def find_next(self, previous=None):
+        start = self.start_sel[0].end()
+        wrap_start = 0
+        next_match = None
+        if previous and previous.wrapped:
+            # Nothing left to find below the cursor.
+            wrap_start = previous.match.begin()
+        else:
+            if previous:
+                start = previous.match.begin()
+            next_match = self.view.find(self.cmd, start, self.flags)
+        # handle search restart
+        if next_match:
+            return next_match, False
+        sublime.status_message("VintageEx: search hit BOTTOM, continuing at TOP")
+        return self.view.find(self.cmd, wrap_start, self.flags), True
+
+    def find_previous(self, previous=None):
+        cursor = self.view.sel()[0].begin()
+        bound = self.view.size()
+        next_match = None
+        if previous:
+            bound = previous.match.begin() + len(self.cmd)
+        if not (previous and previous.wrapped):
+            next_match = self.find_last_match_before(min(cursor, bound))
+        # handle search restart
+        if next_match:
+            return next_match, False
+        sublime.status_message("VintageEx: search hit TOP, continuing at BOTTOM")
+        return self.find_last_match_before(bound), True
+
+    def find_last_match_before(self, point):
+        return ex_location.search_backwards(self.view, self.cmd, 0, point,
+                                            self.flags)
+
 
 class ViRepeatSearchBackward(sublime_plugin.TextCommand):
    def run(self, edit):
@@ -133,12 +200,15 @@ class ViFindUnder(sublime_plugin.TextCommand):
 class ViSearch(sublime_plugin.TextCommand):
     def run(self, edit, initial_text=""):
         self.original_sel = list(self.view.sel())
+        self.last_result = None
+        self.pending_change = 0
         self.view.window().show_input_panel("", initial_text,
                                             self.on_done,
                                             self.on_change,
                                             self.on_cancel)
 
     def on_done(self, s):
+        self.pending_change += 1
         self._restore_sel()
         try:
             SearchImpl(self.view, s, start_sel=self.original_sel).search()
@@ -148,23 +218,44 @@ class ViSearch(sublime_plugin.TextCommand):
                 print "VintageEx: Regex parsing error. Incomplete pattern: %s" % s
             else:
                 raise e
+        except re.error:
+            print "VintageEx: Regex parsing error. Incomplete pattern: %s" % s
         self.original_sel = None
         self._restore_sel()
 
     def on_change(self, s):
         if s in ("/", "?"):
             return
+        # Only search for the latest pattern if the user types faster than
+        # we can show results.
+        self.pending_change += 1
+        change = self.pending_change
+        sublime.set_timeout(lambda: self.search_incrementally(s, change),
+                            INCREMENTAL_SEARCH_DELAY)
+
+    def search_incrementally(self, s, change):
+        if change != self.pending_change or self.original_sel is None:
+            return
         self._restore_sel()
         try:
-            SearchImpl(self.view, s, remember=False,
-                       start_sel=self.original_sel).search()
+            search = SearchImpl(self.view, s, remember=False,
+                                start_sel=self.original_sel)
+            previous = self.last_result
+            if not search.can_resume(previous):
+                previous = None
+            self.last_result = search.search(previous)
         except RuntimeError, e:
+            self.last_result = None
             if 'parsing' in str(e):
                 print "VintageEx: Regex parsing error. Expected error." 
             else:
                 raise e
+        except re.error:
+            self.last_result = None
+            print "VintageEx: Regex parsing error. Expected error."
 
     def on_cancel(self):
+        self.pending_change += 1
         self._restore_sel()
         self.original_sel = None
 
@@ -176,3 +267,6 @@ class ViSearch(sublime_plugin.TextCommand):
         for s in self.original_sel:
             self.view.sel().add(s)
         self.view.show(self.view.sel()[0])
+
+
+startup.record('ex_search_cmd', _load_started)
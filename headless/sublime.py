@@ -0,0 +1,691 @@
+"""in-memory stand-in for Sublime Text 2's sublime module
+
+Implements the part of the API that VintageEx uses, over plain strings, so
+that the ex engine, its tests and its benchmarks can run under a plain
+Python interpreter. Put this directory on sys.path only when the real
+module can't be imported.
+
+Views don't have syntaxes or scopes, set_timeout runs callbacks right away
+(after sleeping for their delay, and after the callback that set them, if
+any), and commands other than undo/redo have to be plugin commands.
+"""
+
+import os
+import re
+import sys
+import time
+
+
+LITERAL = 1
+IGNORECASE = 2
+
+DRAW_EMPTY = 1
+HIDE_ON_MINIMAP = 2
+DRAW_EMPTY_AS_OVERWRITE = 4
+DRAW_OUTLINED = 16
+PERSISTENT = 32
+HIDDEN = 128
+
+ENCODED_POSITION = 1
+TRANSIENT = 4
+FORCE_GROUP = 8
+
+# Status messages shown so far, newest last.
+status_messages = []
+_clipboard = ''
+_windows = []
+
+
+def status_message(msg):
+    status_messages.append(msg)
+
+
+def error_message(msg):
+    print msg
+
+
+def message_dialog(msg):
+    print msg
+
+
+def ok_cancel_dialog(msg, ok_title=''):
+    return False
+
+
+_timeouts = []
+
+
+def set_timeout(callback, delay):
+    _timeouts.append((callback, delay))
+    if len(_timeouts) > 1:
+        # Runs once the callback running returns.
+        return
+    while _timeouts:
+        callback, delay = _timeouts[0]
+        if delay:
+            time.sleep(delay / 1000.0)
+        try:
+            callback()
+        finally:
+            _timeouts.pop(0)
+
+
+def packages_path():
+    # The directory this package is in, as when it's installed.
+    return os.path.dirname(os.path.dirname(os.path.dirname(
+                                                os.path.abspath(__file__))))
+
+
+def installed_packages_path():
+    return packages_path()
+
+
+def platform():
+    if sys.platform.startswith('win'):
+        return 'windows'
+    if sys.platform == 'darwin':
+        return 'osx'
+    return 'linux'
+
+
+def arch():
+    return 'x64' if sys.maxsize > 2 ** 32 else 'x32'
+
+
+def version():
+    return '2221'
+
+
+def get_clipboard():
+    return _clipboard
+
+
+def set_clipboard(text):
+    global _clipboard
+    _clipboard = text
+
+
+class Region(object):
+    def __init__(self, a, b=None):
+        if b is None:
+            b = a
+        self.a = a
+        self.b = b
+
+    def __repr__(self):
+        return '(%d, %d)' % (self.a, self.b)
+
+    def __len__(self):
+        return self.size()
+
+    def __eq__(self, other):
+        return (isinstance(other, Region) and
+                (self.a, self.b) == (other.a, other.b))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return self.end() - self.begin()
+
+    def empty(self):
+        return self.a == self.b
+
+    def cover(self, region):
+        return Region(min(self.begin(), region.begin()),
+                      max(self.end(), region.end()))
+
+    def intersection(self, region):
+        if not self.intersects(region):
+            return Region(0, 0)
+        return Region(max(self.begin(), region.begin()),
+                      min(self.end(), region.end()))
+
+    def intersects(self, region):
+        return (self.begin() < region.end() and
+                region.begin() < self.end())
+
+    def contains(self, x):
+        if isinstance(x, Region):
+            return self.begin() <= x.begin() and x.end() <= self.end()
+        return self.begin() <= x <= self.end()
+
+
+class RegionSet(object):
+    """A view's selection. Regions are kept sorted and overlapping regions
+    are merged.
+    """
+    def __init__(self):
+        self.regions = []
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __getitem__(self, i):
+        return self.regions[i]
+
+    def __iter__(self):
+        return iter(list(self.regions))
+
+    def __repr__(self):
+        return repr(self.regions)
+
+    def clear(self):
+        self.regions = []
+
+    def add(self, region):
+        merged = []
+        for r in self.regions:
+            if (r.intersects(region) or r == region or
+                (region.empty() and r.contains(region.a)) or
+                (r.empty() and region.contains(r.a))):
+                    region = Region(min(r.begin(), region.begin()),
+                                    max(r.end(), region.end()))
+            else:
+                merged.append(r)
+        merged.append(region)
+        self.regions = sorted(merged, key=Region.begin)
+
+    def add_all(self, regions):
+        for r in regions:
+            self.add(r)
+
+    def subtract(self, region):
+        self.regions = [r for r in self.regions if r != region]
+
+    def contains(self, region):
+        return any(r.contains(region) for r in self.regions)
+
+
+class Settings(object):
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.on_change = {}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def has(self, key):
+        return key in self.values
+
+    def set(self, key, value):
+        self.values[key] = value
+        for callback in self.on_change.values():
+            callback()
+
+    def erase(self, key):
+        self.values.pop(key, None)
+
+    def add_on_change(self, key, callback):
+        self.on_change[key] = callback
+
+    def clear_on_change(self, key):
+        self.on_change.pop(key, None)
+
+
+_settings = {}
+
+
+def load_settings(base_name):
+    return _settings.setdefault(base_name, Settings())
+
+
+def save_settings(base_name):
+    pass
+
+
+class Edit(object):
+    def __init__(self, view, command=None):
+        self.view = view
+        self.command = command
+
+
+class Buffer(object):
+    """Text of a view, kept as a gap buffer. Commands edit from the end of
+    the buffer to its start, so a run of edits only shuffles the chunks
+    between them instead of copying the whole text for each edit. The text
+    is joined back together the next time it's read.
+    """
+    CHUNK_SIZE = 4096
+
+    def __init__(self, text=u''):
+        self.set(text)
+
+    def set(self, text):
+        self.size = len(text)
+        self._text = text
+        # Chunks before the gap, in order, and after it, in reverse order.
+        self.before = [text[i:i + self.CHUNK_SIZE]
+                            for i in xrange(0, len(text), self.CHUNK_SIZE)]
+        self.after = []
+        self.gap = len(text)
+
+    def text(self):
+        if self._text is None:
+            self.set(u''.join(self.before) + u''.join(reversed(self.after)))
+        return self._text
+
+    def _move_gap(self, point):
+        while point < self.gap:
+            chunk = self.before.pop()
+            start = self.gap - len(chunk)
+            if start < point:
+                self.before.append(chunk[:point - start])
+                chunk = chunk[point - start:]
+                start = point
+            self.after.append(chunk)
+            self.gap = start
+        while point > self.gap:
+            chunk = self.after.pop()
+            end = self.gap + len(chunk)
+            if end > point:
+                self.after.append(chunk[point - self.gap:])
+                chunk = chunk[:point - self.gap]
+                end = point
+            self.before.append(chunk)
+            self.gap = end
+
+    def replace(self, begin, end, text):
+        self._move_gap(end)
+        remaining = end - begin
+        while remaining:
+            chunk = self.before.pop()
+            if len(chunk) > remaining:
+                self.before.append(chunk[:-remaining])
+                break
+            remaining -= len(chunk)
+        if text:
+            self.before.append(text)
+        self.gap = begin + len(text)
+        self.size += len(text) - (end - begin)
+        self._text = None
+
+
+class View(object):
+    _next_id = 1
+
+    def __init__(self, window=None, text=u'', file_name=None):
+        self._id = View._next_id
+        View._next_id += 1
+        self._window = window
+        self._buffer = Buffer(text)
+        self._file_name = file_name
+        self._name = ''
+        self._encoding = 'UTF-8'
+        self._sel = RegionSet()
+        self._sel.add(Region(0))
+        self._settings = Settings()
+        self._regions = {}
+        self._status = {}
+        self._change_count = 0
+        self._saved_change_count = 0
+        self._scratch = False
+        self._read_only = False
+        self._edit_depth = 0
+        self._text_before_edit = None
+        self._change_count_before_edit = 0
+        self._undo = []
+        self._redo = []
+
+    def __repr__(self):
+        return '<View %d %s>' % (self._id, self._file_name or self._name)
+
+    def id(self):
+        return self._id
+
+    def buffer_id(self):
+        return self._id
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return self._file_name
+
+    def name(self):
+        return self._name
+
+    def set_name(self, name):
+        self._name = name
+
+    def encoding(self):
+        return self._encoding
+
+    def set_encoding(self, encoding):
+        self._encoding = encoding
+
+    def is_loading(self):
+        return False
+
+    def is_dirty(self):
+        return self._change_count != self._saved_change_count
+
+    def is_read_only(self):
+        return self._read_only
+
+    def set_read_only(self, value):
+        self._read_only = value
+
+    def is_scratch(self):
+        return self._scratch
+
+    def set_scratch(self, value):
+        self._scratch = value
+
+    def settings(self):
+        return self._settings
+
+    def set_syntax_file(self, syntax_file):
+        self._settings.set('syntax', syntax_file)
+
+    def score_selector(self, point, selector):
+        return 0
+
+    def scope_name(self, point):
+        return ''
+
+    def change_count(self):
+        return self._change_count
+
+    @property
+    def text(self):
+        return self._buffer.text()
+
+    def size(self):
+        return self._buffer.size
+
+    def substr(self, x):
+        if isinstance(x, Region):
+            return self.text[x.begin():x.end()]
+        if 0 <= x < len(self.text):
+            return self.text[x]
+        return u'\x00'
+
+    # Rows and columns.
+
+    def rowcol(self, point):
+        point = min(max(point, 0), len(self.text))
+        bol = self.text.rfind('\n', 0, point) + 1
+        return self.text.count('\n', 0, point), point - bol
+
+    def text_point(self, row, col):
+        bol = 0
+        for i in xrange(row):
+            eol = self.text.find('\n', bol)
+            if eol == -1:
+                return len(self.text)
+            bol = eol + 1
+        return min(bol + col, len(self.text))
+
+    def line(self, x):
+        if isinstance(x, Region):
+            begin = self.line(x.begin()).begin()
+            return Region(begin, self.line(x.end()).end())
+        x = min(max(x, 0), len(self.text))
+        eol = self.text.find('\n', x)
+        if eol == -1:
+            eol = len(self.text)
+        return Region(self.text.rfind('\n', 0, x) + 1, eol)
+
+    def full_line(self, x):
+        r = self.line(x)
+        return Region(r.begin(), min(r.end() + 1, len(self.text)))
+
+    def lines(self, region):
+        lines = []
+        point = region.begin()
+        while True:
+            line = self.line(point)
+            lines.append(line)
+            if line.end() >= region.end() or line.end() >= len(self.text):
+                return lines
+            point = line.end() + 1
+
+    def split_by_newlines(self, region):
+        lines = []
+        begin = region.begin()
+        while True:
+            eol = self.text.find('\n', begin, region.end())
+            if eol == -1:
+                lines.append(Region(begin, region.end()))
+                return lines
+            lines.append(Region(begin, eol))
+            begin = eol + 1
+
+    # Searching.
+
+    def _compile(self, pattern, flags):
+        if flags & LITERAL:
+            pattern = re.escape(pattern)
+        return re.compile(pattern, re.MULTILINE |
+                                   (re.IGNORECASE if flags & IGNORECASE else 0))
+
+    def find(self, pattern, start_point, flags=0):
+        match = self._compile(pattern, flags).search(self.text, start_point)
+        if match:
+            return Region(match.start(), match.end())
+
+    def find_all(self, pattern, flags=0, fmt=None, extractions=None):
+        regions = []
+        for match in self._compile(pattern, flags).finditer(self.text):
+            regions.append(Region(match.start(), match.end()))
+            if fmt is not None and extractions is not None:
+                extractions.append(match.expand(fmt))
+        return regions
+
+    # Selection and display.
+
+    def sel(self):
+        return self._sel
+
+    def show(self, x, show_surrounds=True):
+        pass
+
+    def show_at_center(self, x):
+        pass
+
+    def visible_region(self):
+        return Region(0, len(self.text))
+
+    def add_regions(self, key, regions, scope='', icon='', flags=0):
+        self._regions[key] = list(regions)
+
+    def get_regions(self, key):
+        return list(self._regions.get(key, []))
+
+    def erase_regions(self, key):
+        self._regions.pop(key, None)
+
+    def set_status(self, key, value):
+        self._status[key] = value
+
+    def get_status(self, key):
+        return self._status.get(key, '')
+
+    def erase_status(self, key):
+        self._status.pop(key, None)
+
+    # Editing. Changes made while the outermost edit is open are undone in
+    # one step.
+
+    def begin_edit(self, command=None, args=None):
+        if self._edit_depth == 0:
+            self._text_before_edit = self.text
+            self._change_count_before_edit = self._change_count
+        self._edit_depth += 1
+        return Edit(self, command)
+
+    def end_edit(self, edit):
+        self._edit_depth -= 1
+        if (self._edit_depth == 0 and
+            self._change_count != self._change_count_before_edit):
+                self._undo.append(self._text_before_edit)
+                self._redo = []
+        if self._edit_depth == 0:
+            self._text_before_edit = None
+
+    def _check_edit(self, edit):
+        # Like in Sublime Text 2, an edit open on any view will do.
+        if not isinstance(edit, Edit) or edit.view._edit_depth == 0:
+            raise ValueError("Edit objects may not be used after the "
+                             "TextCommand's run method has returned")
+
+    def _splice(self, begin, end, text):
+        self._buffer.replace(begin, end, text)
+        self._change_count += 1
+        delta = len(text) - (end - begin)
+
+        def adjust(point):
+            if point < begin:
+                return point
+            if point >= end:
+                return point + delta
+            return begin
+
+        regions = [Region(adjust(r.a), adjust(r.b)) for r in self._sel]
+        self._sel.clear()
+        self._sel.add_all(regions)
+        # Like the selection, added regions follow the text they mark.
+        for key, regions in self._regions.items():
+            self._regions[key] = [Region(adjust(r.a), adjust(r.b))
+                                  for r in regions]
+
+    def insert(self, edit, point, text):
+        self._check_edit(edit)
+        self._splice(point, point, text)
+        return len(text)
+
+    def erase(self, edit, region):
+        self._check_edit(edit)
+        self._splice(region.begin(), region.end(), u'')
+
+    def replace(self, edit, region, text):
+        self._check_edit(edit)
+        self._splice(region.begin(), region.end(), text)
+
+    def _set_text(self, text):
+        self._buffer.set(text)
+        self._change_count += 1
+        self._sel.clear()
+        self._sel.add(Region(0))
+
+    def run_command(self, cmd, args=None):
+        if cmd in ('undo', 'soft_undo') and self._undo:
+            self._redo.append(self.text)
+            self._set_text(self._undo.pop())
+        elif cmd in ('redo', 'soft_redo') and self._redo:
+            self._undo.append(self.text)
+            self._set_text(self._redo.pop())
+        else:
+            import sublime_plugin
+            sublime_plugin.run_text_command(self, cmd, args)
+
+
+class Window(object):
+    _next_id = 1
+
+    def __init__(self):
+        self._id = Window._next_id
+        Window._next_id += 1
+        self._views = []
+        self._active_view = None
+        self._panels = {}
+        # Class of the views created by new_file.
+        self.view_class = View
+        # Callbacks of the most recent input and quick panels.
+        self.input_panel = None
+        self.quick_panel = None
+        _windows.append(self)
+
+    def id(self):
+        return self._id
+
+    def views(self):
+        return list(self._views)
+
+    def views_in_group(self, group):
+        return self.views() if group == 0 else []
+
+    def get_view_index(self, view):
+        if view in self._views:
+            return 0, self._views.index(view)
+        return -1, -1
+
+    def active_view(self):
+        return self._active_view
+
+    def focus_view(self, view):
+        if view in self._views:
+            self._active_view = view
+
+    def new_file(self):
+        view = self.view_class(self)
+        self._views.append(view)
+        self._active_view = view
+        return view
+
+    def open_file(self, file_name, flags=0):
+        if flags & ENCODED_POSITION:
+            file_name = re.sub(r'(:\d+)+$', '', file_name)
+        for view in self._views:
+            if view.file_name() == file_name:
+                self._active_view = view
+                return view
+        text = u''
+        if os.path.exists(file_name):
+            f = open(file_name, 'rb')
+            try:
+                text = f.read().decode('utf-8').replace('\r\n', '\n')
+            finally:
+                f.close()
+        view = View(self, text, file_name)
+        self._views.append(view)
+        self._active_view = view
+        return view
+
+    def close_view(self, view):
+        self._views.remove(view)
+        if self._active_view is view:
+            self._active_view = self._views[-1] if self._views else None
+
+    def folders(self):
+        return []
+
+    def get_output_panel(self, name):
+        if name not in self._panels:
+            self._panels[name] = View(self)
+        return self._panels[name]
+
+    def show_input_panel(self, caption, initial_text, on_done, on_change,
+                         on_cancel):
+        self.input_panel = (on_done, on_change, on_cancel)
+        return View(self, initial_text)
+
+    def show_quick_panel(self, items, on_done, flags=0):
+        self.quick_panel = (items, on_done)
+
+    def run_command(self, cmd, args=None):
+        if cmd == 'close':
+            if self._active_view is not None:
+                self.close_view(self._active_view)
+            return
+        import sublime_plugin
+        if not sublime_plugin.run_window_command(self, cmd, args):
+            if self._active_view is not None:
+                self._active_view.run_command(cmd, args)
+
+
+def windows():
+    return list(_windows)
+
+
+def active_window():
+    if not _windows:
+        Window()
+    return _windows[-1]
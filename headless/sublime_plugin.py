@@ -0,0 +1,107 @@
+"""in-memory stand-in for Sublime Text 2's sublime_plugin module
+
+Commands are looked up by name among the subclasses of TextCommand and
+WindowCommand, so plugin modules only need to be imported to be runnable.
+"""
+
+
+def command_name(clsname):
+    """Returns the command name of a command class, with the same rules as
+    Sublime Text: ExDeleteCommand -> ex_delete.
+    """
+    name = clsname[0].lower()
+    last_upper = False
+    for c in clsname[1:]:
+        if c.isupper() and not last_upper:
+            name += '_'
+            name += c.lower()
+        else:
+            name += c
+        last_upper = c.isupper()
+    if name.endswith('_command'):
+        name = name[:-8]
+    return name
+
+
+class Command(object):
+    def name(self):
+        return command_name(self.__class__.__name__)
+
+    def is_enabled(self, **args):
+        return True
+
+    def is_visible(self, **args):
+        return True
+
+    def description(self, **args):
+        return ''
+
+
+class ApplicationCommand(Command):
+    pass
+
+
+class WindowCommand(Command):
+    def __init__(self, window):
+        self.window = window
+
+    def run_(self, args):
+        return self.run(**(args or {}))
+
+
+class TextCommand(Command):
+    def __init__(self, view):
+        self.view = view
+
+    def run_(self, args):
+        edit = self.view.begin_edit(self.name(), args)
+        try:
+            return self.run(edit, **(args or {}))
+        finally:
+            self.view.end_edit(edit)
+
+
+class EventListener(object):
+    pass
+
+
+def find_command_class(base, cmd):
+    """Returns the subclass of `base` for the command named `cmd`, or None.
+    """
+    pending = list(base.__subclasses__())
+    while pending:
+        cls = pending.pop()
+        if command_name(cls.__name__) == cmd:
+            return cls
+        pending.extend(cls.__subclasses__())
+
+
+def run_command(cls, target, args):
+    command = cls(target)
+    try:
+        enabled = command.is_enabled(**(args or {}))
+    except TypeError:
+        # Like Sublime Text, allow is_enabled to take no arguments.
+        enabled = command.is_enabled()
+    if enabled:
+        command.run_(args)
+    return True
+
+
+def run_window_command(window, cmd, args=None):
+    """Runs the WindowCommand named `cmd`. Returns False if there's none.
+    """
+    cls = find_command_class(WindowCommand, cmd)
+    if cls is None:
+        return False
+    return run_command(cls, window, args)
+
+
+def run_text_command(view, cmd, args=None):
+    """Runs the TextCommand named `cmd` on `view`. Returns False if there's
+    none.
+    """
+    cls = find_command_class(TextCommand, cmd)
+    if cls is None:
+        return False
+    return run_command(cls, view, args)
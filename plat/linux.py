@@ -1,18 +1,17 @@
 import os
-import subprocess
+
+from plat import posix
+from vex import shell
 
 
 def run_and_wait(view, cmd):
     term = view.settings().get('vintageex_linux_terminal')
     term = term or os.path.expandvars("$COLORTERM") or os.path.expandvars("$TERM")
-    subprocess.Popen([
-            term, '-e',
-            "bash -c \"%s; read -p 'Press RETURN to exit.'\"" % cmd]).wait()
+    # Interactive, so no timeout.
+    shell.Runner([term, '-e',
+                  "bash -c \"%s; read -p 'Press RETURN to exit.'\"" % cmd],
+                 capture=False).run()
 
 
-def filter_region(view, text, command):
-    shell = view.settings().get('vintageex_linux_shell')
-    shell = shell or os.path.expandvars("$SHELL")
-    p = subprocess.Popen([shell, '-c', 'echo "%s" | %s' % (text, command)],
-                         stdout=subprocess.PIPE)
-    return p.communicate()[0][:-1]
+def get_filter(view):
+    return posix.get_filter(view, 'vintageex_linux_shell')
@@ -0,0 +1,287 @@
+"""Code shared by the Linux and OS X platforms."""
+
+import binascii
+import os
+import pipes
+import select
+import subprocess
+import tempfile
+import threading
+import time
+
+from vex import shell as runner
+from vex.encoding import python_codec
+
+
+# Shells coprocesses can be run with: they must take POSIX sh syntax.
+COPROCESS_SHELLS = ('sh', 'bash', 'dash', 'ksh', 'zsh')
+# Seconds a coprocess is kept running without filtering anything.
+COPROCESS_IDLE_TIMEOUT = 60
+
+
+def get_shell(view, setting):
+    """Returns the shell named by `setting`, or the user's shell.
+    """
+    return (view.settings().get(setting) or os.environ.get('SHELL') or
+            '/bin/sh')
+
+
+def run_filter(shell, text, command, encoding='utf-8', timeout=None,
+               max_memory=runner.DEFAULT_MAX_MEMORY):
+    """Runs `command` with `shell`, with `text` as its input. Returns its
+    output, as an iterator over chunks of text, and its Result, which must
+    be closed once the output has been read. The text is written while the
+    output is read, so neither side blocks the other, and it's never held
+    in memory encoded as a whole. Nor is the output decoded as a whole.
+
+    Like the lines of a range, `text` needn't end in a newline. If it
+    doesn't, a newline the command adds at the end of its output is
+    dropped.
+    """
+    result = runner.Runner([shell, '-c', command], encoding=encoding,
+                           timeout=timeout, max_memory=max_memory).run(text)
+    return _drop_added_newline(text, result.chunks()), result
+
+
+def filter_text(shell, text, command, encoding='utf-8', timeout=None):
+    """Returns the output of `command` run by `shell` with `text` as its
+    input. See run_filter.
+    """
+    output, result = run_filter(shell, text, command, encoding, timeout)
+    try:
+        return u''.join(output)
+    finally:
+        result.close()
+
+
+def _drop_added_newline(text, chunks):
+    if text.endswith('\n'):
+        return chunks
+    return runner.trim_last_newline(chunks)
+
+
+def get_filter(view, shell_setting):
+    """Returns a function filtering text through a command for `view`,
+    through the coprocesses of its window if the
+    vintageex_filter_coprocesses setting asks for them. The function
+    returns the output and the Result of the command, as run_filter does.
+    It doesn't use the view, so it can run on any thread.
+    """
+    shell = get_shell(view, shell_setting)
+    encoding = python_codec(view.encoding())
+    timeout = runner.get_timeout(view)
+    max_memory = runner.get_max_memory(view)
+    coprocesses = view.settings().get('vintageex_filter_coprocesses')
+    window = view.window()
+    if (coprocesses and window is not None and
+        os.path.basename(shell) in COPROCESS_SHELLS):
+            pool = get_pool(window.id(), shell, coprocesses)
+            return lambda text, command: pool.filter(text, command, encoding,
+                                                     timeout, max_memory)
+    return lambda text, command: run_filter(shell, text, command, encoding,
+                                            timeout, max_memory)
+
+
+class Coprocess(object):
+    """A shell reading commands from its stdin, kept running to filter
+    text through one command after another without starting a shell for
+    each.
+
+    Each command runs in a subshell with its input redirected from a temp
+    file and its stderr to another. Its output is followed by a line
+    holding a sentinel, random for each coprocess, and the command's exit
+    status.
+    """
+    def __init__(self, shell):
+        self.sentinel = '__vintageex_%s__' % binascii.hexlify(os.urandom(8))
+        self.process = runner.start_process([shell, '-s'],
+                                            stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE,
+                                            close_fds=True)
+        self.last_used = time.time()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        self.process.wait()
+
+    def filter(self, text, command, encoding='utf-8', timeout=None,
+               max_memory=runner.DEFAULT_MAX_MEMORY):
+        """Returns the output of `command` with `text` as its input, and
+        its Result, as run_filter does. If it times out, kills the
+        coprocess along with it. Raises IOError or OSError if the shell
+        died.
+        """
+        fd, input_path = tempfile.mkstemp(prefix='vintageex')
+        runner.write_encoded(os.fdopen(fd, 'wb'), text, encoding)
+        fd, stderr_path = tempfile.mkstemp(prefix='vintageex')
+        os.close(fd)
+        result = runner.Result(encoding=encoding)
+        try:
+            # eval keeps commands with unbalanced quotes from eating the
+            # lines that follow them.
+            self.process.stdin.write(
+                    "( eval %s ) < %s 2> %s\nprintf '\\n%s %%d\\n' $?\n" % (
+                    pipes.quote(command), pipes.quote(input_path),
+                    pipes.quote(stderr_path), self.sentinel))
+            self.process.stdin.flush()
+            self._read_result(result, timeout, max_memory)
+            f = open(stderr_path, 'rb')
+            try:
+                result.stderr = f.read(runner.MAX_STDERR)
+            finally:
+                f.close()
+        except:
+            result.close()
+            raise
+        finally:
+            os.remove(input_path)
+            os.remove(stderr_path)
+        self.last_used = time.time()
+        return _drop_added_newline(text, result.chunks()), result
+
+    def _read_result(self, result, timeout, max_memory):
+        marker = '\n%s ' % self.sentinel
+        # Room for the marker and the status line after it.
+        keep = len(marker) + 8
+        window = ''
+        fd = self.process.stdout.fileno()
+        deadline = timeout and time.time() + timeout
+        try:
+            while True:
+                if deadline:
+                    left = deadline - time.time()
+                    if left <= 0 or not select.select([fd], [], [], left)[0]:
+                        runner.kill_process(self.process)
+                        result.timed_out = True
+                        return
+                chunk = os.read(fd, runner.CHUNK_SIZE)
+                if not chunk:
+                    raise IOError("coprocess exited")
+                window += chunk
+                found = window.find(marker)
+                if found != -1 and window.endswith('\n'):
+                    result.returncode = int(window[found + len(marker):-1])
+                    result.add_output(window[:found], max_memory)
+                    return
+                if len(window) > keep:
+                    result.add_output(window[:-keep], max_memory)
+                    window = window[-keep:]
+        finally:
+            result.end_output()
+
+
+class CoprocessPool(object):
+    """Up to `size` coprocesses running `shell`, started as needed and
+    closed after `idle_timeout` seconds without use.
+    """
+    def __init__(self, shell, size, idle_timeout=COPROCESS_IDLE_TIMEOUT):
+        self.shell = shell
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.idle = []
+        self.busy = 0
+        self.condition = threading.Condition()
+        self.reaper = None
+
+    def filter(self, text, command, encoding='utf-8', timeout=None,
+               max_memory=runner.DEFAULT_MAX_MEMORY):
+        """Returns the output of `command` with `text` as its input, and
+        its Result, as run_filter does.
+        """
+        coprocess = self._acquire()
+        try:
+            try:
+                return coprocess.filter(text, command, encoding, timeout,
+                                        max_memory)
+            except (IOError, OSError):
+                # The command took the shell down with it (exec, kill...).
+                coprocess.close()
+                coprocess = None
+                return run_filter(self.shell, text, command, encoding,
+                                  timeout, max_memory)
+        finally:
+            self._release(coprocess)
+
+    def _acquire(self):
+        self.condition.acquire()
+        try:
+            while not self.idle and self.busy >= self.size:
+                self.condition.wait()
+            self.busy += 1
+            if self.idle:
+                return self.idle.pop()
+        finally:
+            self.condition.release()
+        try:
+            return Coprocess(self.shell)
+        except:
+            self._release(None)
+            raise
+
+    def _release(self, coprocess):
+        self.condition.acquire()
+        try:
+            self.busy -= 1
+            if coprocess is not None and coprocess.is_alive():
+                self.idle.append(coprocess)
+                self._schedule_reaper()
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def _schedule_reaper(self):
+        if self.reaper is None:
+            self.reaper = threading.Timer(self.idle_timeout, self.reap)
+            self.reaper.daemon = True
+            self.reaper.start()
+
+    def reap(self, now=None):
+        """Closes the coprocesses that have been idle for too long.
+        """
+        now = now or time.time()
+        self.condition.acquire()
+        try:
+            reaper, self.reaper = self.reaper, None
+            if reaper is not None:
+                reaper.cancel()
+            expired = [c for c in self.idle
+                            if now - c.last_used >= self.idle_timeout]
+            self.idle = [c for c in self.idle if c not in expired]
+            if self.idle:
+                self._schedule_reaper()
+        finally:
+            self.condition.release()
+        for coprocess in expired:
+            coprocess.close()
+        if reaper is not None and reaper is not threading.currentThread():
+            reaper.join()
+
+
+# {(window id, shell): CoprocessPool}
+POOLS = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(window_id, shell, size):
+    _pools_lock.acquire()
+    try:
+        pool = POOLS.get((window_id, shell))
+        if pool is None:
+            pool = POOLS[window_id, shell] = CoprocessPool(shell, size)
+        pool.size = size
+        return pool
+    finally:
+        _pools_lock.release()
+
+
+def close_pools():
+    """Closes the coprocesses of every pool.
+    """
+    for pool in POOLS.values():
+        pool.reap(now=time.time() + pool.idle_timeout)
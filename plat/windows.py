@@ -2,6 +2,8 @@ import subprocess
 import os
 import tempfile
 
+from vex import shell
+
 
 try:
     import ctypes
@@ -20,10 +22,26 @@ def get_startup_info():
 
 
 def run_and_wait(view, cmd):
-    subprocess.Popen(['cmd.exe', '/c', cmd + '&& pause']).wait()
+    # Interactive, so no timeout.
+    shell.Runner(['cmd.exe', '/c', cmd + '&& pause'], capture=False).run()
+
+
+def get_filter(view):
+    """Returns a function filtering text through a command for `view`,
+    which returns the output, as chunks of text, and the Result of the
+    command. It doesn't use the view, so it can run on any thread.
+    """
+    timeout = shell.get_timeout(view)
+    max_memory = shell.get_max_memory(view)
+    return lambda txt, command: run_filter(txt, command, timeout, max_memory)
 
 
 def filter_region(view, txt, command):
+    return u''.join(get_filter(view)(txt, command)[0])
+
+
+def run_filter(txt, command, timeout=None,
+               max_memory=shell.DEFAULT_MAX_MEMORY):
     try:
         contents = tempfile.NamedTemporaryFile(suffix='.txt', delete=False)
         contents.write(txt.encode('utf-8'))
@@ -33,12 +51,14 @@ def filter_region(view, txt, command):
         script.write('@echo off\ntype %s | %s' % (contents.name, command))
         script.close()
 
-        p = subprocess.Popen([script.name],
-                             stdout=subprocess.PIPE,
-                             startupinfo=get_startup_info())
-
-        rv = p.communicate()
-        return rv[0].decode(get_oem_cp()).replace('\r\n', '\n')[:-1].strip()
+        result = shell.Runner([script.name], encoding='cp' + get_oem_cp(),
+                              timeout=timeout, max_memory=max_memory,
+                              startupinfo=get_startup_info()).run()
+        try:
+            rv = result.text()
+        finally:
+            result.close()
+        return [rv.replace('\r\n', '\n')[:-1].strip()], result
     finally:
         os.remove(script.name)
         os.remove(contents.name)
@@ -20,6 +20,15 @@ test_suites = {
         'location': ['vintage_ex_run_data_file_based_tests', 'tests.test_location'],
         'substitute': ['vintage_ex_run_simple_tests', 'tests.test_substitute'],
         'global': ['vintage_ex_run_simple_tests', 'tests.test_global'],
+        'cache': ['vintage_ex_run_simple_tests', 'tests.test_cache'],
+        'search': ['vintage_ex_run_simple_tests', 'tests.test_search'],
+        'line_index': ['vintage_ex_run_simple_tests', 'tests.test_line_index'],
+        'command_parser': ['vintage_ex_run_simple_tests', 'tests.test_command_parser'],
+        'commands': ['vintage_ex_run_simple_tests', 'tests.test_commands'],
+        'profiling': ['vintage_ex_run_simple_tests', 'tests.test_profiling'],
+        'api_calls': ['vintage_ex_run_simple_tests', 'tests.test_api_calls'],
+        'shell': ['vintage_ex_run_simple_tests', 'tests.test_shell'],
+        'file_reader': ['vintage_ex_run_simple_tests', 'tests.test_file_reader'],
 }
 
 
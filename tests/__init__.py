@@ -1,4 +1,18 @@
-import sublime
+import os
+import sys
+
+try:
+    import sublime
+except ImportError:
+    # Outside Sublime Text: run against the in-memory stand-in.
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+                                    os.path.abspath(__file__))), 'headless'))
+    import sublime
+
+    import test_runner
+    test_runner.g_test_view = sublime.active_window().open_file(
+                                os.path.join(os.path.dirname(__file__), 'data',
+                                             test_runner.TEST_DATA_FILE_BASENAME))
 
 
 def select_point(view, left_end, right_end=None):
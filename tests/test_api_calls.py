@@ -0,0 +1,83 @@
+import unittest
+
+from vex import api_calls
+from vex.api_calls import ViewProxy
+
+
+class FakeView(object):
+    def __init__(self):
+        self.name = 'fake'
+
+    def size(self):
+        return 10
+
+    def substr(self, region):
+        return 'x'
+
+
+def read_twice(view):
+    view.substr(None)
+    view.substr(None)
+
+
+class TestViewProxy(unittest.TestCase):
+    def setUp(self):
+        self.view = FakeView()
+        self.counter = api_calls.CallCounter('ex_foo')
+        self.proxy = ViewProxy(self.view, self.counter)
+
+    def testForwardsCalls(self):
+        self.assertEqual(self.proxy.size(), 10)
+        self.assertEqual(self.proxy.name, 'fake')
+
+    def testCountsCallsByMethodAndCaller(self):
+        read_twice(self.proxy)
+        self.proxy.size()
+
+        self.assertEqual(self.counter.calls[('substr', 'tests.test_api_calls.read_twice')][0], 2)
+        self.assertEqual(self.counter.by_method(), {'substr': 2, 'size': 1})
+        self.assertEqual(self.counter.total(), 3)
+
+    def testDoesNotCountAttributes(self):
+        self.proxy.name
+
+        self.assertEqual(self.counter.total(), 0)
+
+    def testComparesEqualToView(self):
+        self.assertTrue(self.proxy == self.view)
+        self.assertTrue(self.view == self.proxy)
+        self.assertFalse(self.proxy != self.view)
+        self.assertEqual(hash(self.proxy), hash(self.view))
+
+
+class TestCounting(unittest.TestCase):
+    def tearDown(self):
+        if api_calls._current is not None:
+            api_calls.finish()
+        api_calls.reset()
+
+    def testWrapsOnlyWhileCounting(self):
+        view = FakeView()
+        self.assertTrue(api_calls.wrap(view) is view)
+
+        api_calls.start('ex_foo')
+        proxy = api_calls.wrap(view)
+        self.assertTrue(isinstance(proxy, ViewProxy))
+        self.assertTrue(api_calls.wrap(view) is proxy)
+        self.assertTrue(api_calls.wrap(proxy) is proxy)
+        api_calls.finish()
+
+        self.assertTrue(api_calls.wrap(view) is view)
+
+    def testKeepsLastRunOfEveryCommand(self):
+        view = FakeView()
+        api_calls.start('ex_foo')
+        read_twice(api_calls.wrap(view))
+        api_calls.finish()
+        api_calls.start('ex_foo')
+        api_calls.wrap(view).size()
+        api_calls.finish()
+
+        self.assertEqual(api_calls.LAST_CALLS['ex_foo'].by_method(), {'size': 1})
+        report = api_calls.report()
+        self.assertTrue(report[0].startswith('ex_foo: 1 API calls'))
@@ -0,0 +1,82 @@
+import unittest
+import re
+
+from vex.cache import FrozenDict
+from vex.cache import LRUCache
+from vex.cache import PATTERN_CACHE
+from vex.cache import compile_pattern
+from vex.cache import freeze
+from vex.cache import PYTHON
+from vex.cache import SUBLIME
+from vex.cache import SUBLIME_IGNORECASE
+from vex.cache import SUBLIME_LITERAL
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache(max_size=2)
+
+    def testCountsHitsAndMisses(self):
+        self.cache.set('a', 1)
+        self.cache.get('a')
+        self.cache.get('b')
+
+        self.assertEqual(self.cache.stats(), dict(hits=1, misses=1, size=1))
+
+    def testEvictsLeastRecentlyUsedKey(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertTrue('a' in self.cache)
+        self.assertFalse('b' in self.cache)
+        self.assertTrue('c' in self.cache)
+
+
+class TestCompilePattern(unittest.TestCase):
+    def setUp(self):
+        PATTERN_CACHE.clear()
+
+    def testReusesCompiledPattern(self):
+        first = compile_pattern('foo')
+        second = compile_pattern('foo')
+
+        self.assertTrue(first is second)
+        self.assertEqual(PATTERN_CACHE.stats(), dict(hits=1, misses=1, size=1))
+
+    def testKeysIncludeFlagsAndDialect(self):
+        compile_pattern('foo')
+        compile_pattern('foo', re.IGNORECASE)
+        compile_pattern('foo', dialect=SUBLIME)
+
+        self.assertEqual(len(PATTERN_CACHE), 3)
+
+    def testTranslatesSublimeFlags(self):
+        pattern = compile_pattern('a.b', SUBLIME_IGNORECASE | SUBLIME_LITERAL,
+                                  dialect=SUBLIME)
+
+        self.assertTrue(pattern.search('xA.B'))
+        self.assertFalse(pattern.search('axb'))
+
+    def testRaisesOnInvalidPattern(self):
+        self.assertRaises(re.error, compile_pattern, '(foo', 0, PYTHON)
+
+
+class TestFreeze(unittest.TestCase):
+    def setUp(self):
+        self.frozen = freeze({'a': [['/', 'foo', 0]], 'b': {'c': 1}})
+
+    def testFreezesNestedValues(self):
+        self.assertEqual(self.frozen['a'], (('/', 'foo', 0),))
+        self.assertTrue(isinstance(self.frozen['b'], FrozenDict))
+
+    def testCantBeChanged(self):
+        self.assertRaises(TypeError, self.frozen.__setitem__, 'a', 1)
+        self.assertRaises(TypeError, self.frozen.update, {'a': 1})
+        self.assertRaises(TypeError, self.frozen['b'].pop, 'c')
+
+    def testCopiesAreMutable(self):
+        copy = dict(self.frozen, a=1)
+        self.assertEqual(copy['a'], 1)
+        self.assertEqual(self.frozen['a'], (('/', 'foo', 0),))
@@ -0,0 +1,84 @@
+import unittest
+
+from vex.ex_command_parser import CommandTrie
+from vex.ex_command_parser import complete_command
+from vex.ex_command_parser import find_command
+from vex.ex_command_parser import parse_command_line
+
+
+class TestFindCommand(unittest.TestCase):
+    def testFindsCommandByAnyValidSpelling(self):
+        values = (
+            ('w', ('write', 'w')),
+            ('wri', ('write', 'w')),
+            ('write', ('write', 'w')),
+            ('m', ('move', 'm')),
+            ('co', ('copy', 'co')),
+            ('tabfir', ('tabfirst', 'tabfir')),
+        )
+
+        for name, expected in values:
+            self.assertEqual(find_command(name), expected)
+
+    def testRejectsSpellingsShorterThanAbbreviation(self):
+        for name in ('c', 'ex', 'tabf', 'ma'):
+            self.assertEqual(find_command(name), None)
+
+    def testRejectsUnknownCommands(self):
+        for name in ('writes', 'foo', ''):
+            self.assertEqual(find_command(name), None)
+
+    def testFullNameBeatsAbbreviation(self):
+        self.assertEqual(find_command('file'), ('file', 'f'))
+        self.assertEqual(find_command('files'), ('files', 'files'))
+
+
+class TestCommandTrie(unittest.TestCase):
+    def testRejectsAmbiguousAbbreviations(self):
+        self.assertRaises(ValueError, CommandTrie, [('copy', 'c'),
+                                                    ('change', 'c')])
+
+    def testRejectsAbbreviationsNotInName(self):
+        self.assertRaises(ValueError, CommandTrie, [('copy', 'x')])
+
+
+class TestCompleteCommand(unittest.TestCase):
+    def testCompletesCommandsStartingWithPrefix(self):
+        self.assertEqual(complete_command('tabl'), ['tablast'])
+        self.assertEqual(complete_command('e'), ['edit', 'enew', 'exit', 'exprofile'])
+
+    def testCompletesNothingForUnknownPrefix(self):
+        self.assertEqual(complete_command('zz'), [])
+
+
+class TestParseCommandLine(unittest.TestCase):
+    def testSplitsCommandsAtBar(self):
+        ex_cmds = parse_command_line(':s/a/b/g | 1,3d')
+
+        self.assertEqual([c.name for c in ex_cmds], ['s', 'd'])
+        self.assertEqual(ex_cmds[0].args['pattern'], '/a/b/g')
+        self.assertEqual(ex_cmds[1].line_range['text_range'], '1,3')
+
+    def testKeepsBarInGlobalCommand(self):
+        ex_cmds = parse_command_line(':g/x/s/a/b/ | g/y/d')
+
+        self.assertEqual(len(ex_cmds), 1)
+        self.assertEqual(ex_cmds[0].args['pattern'], '/x/s/a/b/ | g/y/d')
+
+    def testStopsAtUnknownCommand(self):
+        ex_cmds = parse_command_line(':d | foo | d')
+
+        self.assertEqual(len(ex_cmds), 2)
+        self.assertEqual(ex_cmds[1], None)
+
+    def testTellsShellCommandFromFileInRead(self):
+        ex_cmd = parse_command_line(':r !ls -l')[0]
+        self.assertEqual(ex_cmd.args, {'shell_cmd': 'ls -l'})
+
+        ex_cmd = parse_command_line(':r foo!')[0]
+        self.assertEqual(ex_cmd.args, {'name': 'foo!'})
+
+    def testParsesPlusplusArgsInRead(self):
+        ex_cmd = parse_command_line(':r ++enc=latin1 foo.txt')[0]
+        self.assertEqual(ex_cmd.args, {'plusplus_args': '++enc=latin1',
+                                       'name': 'foo.txt'})
@@ -0,0 +1,288 @@
+import sublime
+
+import os
+import time
+import unittest
+
+import ex_commands
+import vintage_ex
+from vex import api_calls
+from vex import shell
+
+
+class CommandTestCase(unittest.TestCase):
+    def setUp(self):
+        self.window = sublime.active_window()
+        self.view = self.window.new_file()
+        self.view.set_scratch(True)
+
+    def tearDown(self):
+        self.window.focus_view(self.view)
+        self.window.run_command('close')
+
+    def set_text(self, text):
+        edit = self.view.begin_edit()
+        self.view.insert(edit, 0, text)
+        self.view.end_edit(edit)
+
+    def text(self):
+        return self.view.substr(sublime.Region(0, self.view.size()))
+
+    def ex(self, cmd_line):
+        self.window.run_command('vi_colon_input', {'cmd_line': cmd_line})
+
+
+class TestChainedCommands(CommandTestCase):
+    def testRunsAllCommands(self):
+        self.set_text('a1\nb2\na3\nb4\n')
+        self.ex(':%s/a/X/ | g/b/d')
+
+        self.assertEqual(self.text(), 'X1\nX3\n')
+
+    def testUndoesChainInOneStep(self):
+        self.set_text('a1\nb2\na3\nb4\n')
+        self.ex(':%s/a/X/ | g/b/d')
+        self.view.run_command('undo')
+
+        self.assertEqual(self.text(), 'a1\nb2\na3\nb4\n')
+
+    def testRunsNothingIfAnyCommandIsUnknown(self):
+        self.set_text('a1\nb2\n')
+        self.ex(':%s/a/X/ | foo')
+
+        self.assertEqual(self.text(), 'a1\nb2\n')
+
+
+class TestExGlobal(CommandTestCase):
+    def testCopiesBelowEachLine(self):
+        self.set_text('a\nx1\nb\nx2\nc\n')
+        self.ex(':g/x/t.')
+
+        self.assertEqual(self.text(), 'a\nx1\nx1\nb\nx2\nx2\nc\n')
+
+    def testMovesRelativeToEachLine(self):
+        self.set_text('a\nb\nx1\nc\nx2\n')
+        self.ex(':g/x/m-2')
+
+        self.assertEqual(self.text(), 'a\nx1\nb\nx2\nc\n')
+
+    def testCopiesToAbsoluteAddressInOneGo(self):
+        self.set_text('x1\na\nx2')
+        self.ex(':g/x/t$')
+
+        self.assertEqual(self.text(), 'x1\na\nx2\nx1\nx2')
+
+    def testRunsSubcommandWithItsOwnRange(self):
+        self.set_text('x1\na\nb\nx2\nc\n')
+        self.ex(':g/x/.,+1d')
+
+        self.assertEqual(self.text(), 'b\n')
+        self.view.run_command('undo')
+        self.assertEqual(self.text(), 'x1\na\nb\nx2\nc\n')
+
+    def testRunsChainedSubcommandsOnEachLine(self):
+        self.set_text('x1\na\nx2\n')
+        self.ex(':g/x/s/x/y/ | s/$/!/')
+
+        self.assertEqual(self.text(), 'y1!\na\ny2!\n')
+
+
+class TestExProfile(CommandTestCase):
+    def testShowsTimingsOfCommandsRun(self):
+        self.set_text('a\nb\n')
+        self.ex(':1d')
+        self.ex(':exprofile')
+
+        panel = self.window.get_output_panel('vintageex_profile')
+        report = panel.substr(sublime.Region(0, panel.size()))
+        self.assertTrue('ex_delete' in report)
+
+    def testShowsApiCallsWhenCounting(self):
+        self.set_text('a\nb\n')
+        self.view.settings().set('vintageex_count_api_calls', True)
+        self.ex(':%s/a/X/')
+        self.ex(':exprofile')
+
+        panel = self.window.get_output_panel('vintageex_profile')
+        report = panel.substr(sublime.Region(0, panel.size()))
+        self.assertTrue('ex_substitute: ' in report)
+        self.assertEqual(self.text(), 'X\nb\n')
+
+    def testCountsCallsOfGlobalSubcommandsOnce(self):
+        self.set_text('x\na\nx\n')
+        self.view.settings().set('vintageex_count_api_calls', True)
+        self.ex(':g/x/d')
+
+        counter = api_calls.LAST_CALLS['ex_global']
+        callers = [caller for (method, caller) in counter.calls]
+        self.assertFalse('vex.api_calls.counted' in callers)
+        self.assertEqual(counter.by_method().get('erase'), 2)
+        self.assertEqual(self.text(), 'a\n')
+
+
+class TestExShellOut(CommandTestCase):
+    def testFiltersRangeThroughCommand(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('c\n"b" $x\na\n')
+        self.ex(':1,2!sort')
+
+        self.assertEqual(self.text(), '"b" $x\nc\na\n')
+
+    def testFiltersThroughCoprocesses(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('c\nb\na\n')
+        self.view.settings().set('vintageex_filter_coprocesses', 1)
+        self.ex(':1,2!sort')
+        self.ex(':2,3!sort')
+
+        self.assertEqual(self.text(), 'b\na\nc\n')
+        from plat import posix
+        posix.close_pools()
+
+    def testFiltersRegionsInOneEdit(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('ab\ncd\nef\n')
+        regions = [self.view.line(self.view.text_point(row, 0))
+                   for row in range(3)]
+        self.view.settings().set('vintageex_filter_concurrency', 2)
+        shell.filter_thru_shell(self.view, regions, 'tr a-z A-Z | rev')
+
+        self.assertEqual(self.text(), 'BA\nDC\nFE\n')
+        self.view.run_command('undo')
+        self.assertEqual(self.text(), 'ab\ncd\nef\n')
+
+
+class TestExReadShellOut(CommandTestCase):
+    def testReadsInBackground(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('x\n')
+        self.view.sel().clear()
+        self.view.sel().add(sublime.Region(0))
+        self.view.settings().set('vintageex_read_shell_async', True)
+        self.ex(':r !printf "a\\nb\\n"')
+
+        self.assertEqual(self.text(), 'a\nbx\n')
+        self.assertEqual(ex_commands.SHELL_READERS, {})
+        self.assertFalse(self.view.settings().has('vintageex_reading_shell'))
+
+    def testKeepsInsertingAtTextAfterEditsAbove(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('x\n')
+        self.view.sel().clear()
+        self.view.sel().add(sublime.Region(0))
+        self.view.settings().set('vintageex_read_shell_async', True)
+        statuses = []
+        set_status = self.view.set_status
+
+        def type_above(key, value):
+            # Type above the output once the first batch is in.
+            statuses.append(value)
+            if len(statuses) == 2:
+                edit = self.view.begin_edit()
+                self.view.insert(edit, 0, 'zz\n')
+                self.view.end_edit(edit)
+            set_status(key, value)
+        self.view.set_status = type_above
+        self.ex(':r !printf "a\\n"; sleep 0.3; printf "b\\n"')
+
+        self.assertEqual(self.text(), 'zz\na\nbx\n')
+        self.assertEqual(self.view.get_regions('vintageex_read_shell'), [])
+
+    def testCancelsReadWhenShellHasExited(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('')
+        self.view.settings().set('vintageex_read_shell_async', True)
+        statuses = []
+        set_status = self.view.set_status
+
+        def press_escape(key, value):
+            # The shell is gone once x is in; the sleep isn't.
+            statuses.append(value)
+            if len(statuses) == 2:
+                self.view.run_command('ex_read_shell_out_cancel')
+            set_status(key, value)
+        self.view.set_status = press_escape
+        started = time.time()
+        self.ex(':r !sleep 30 & echo x')
+
+        self.assertTrue(time.time() - started < 5)
+        self.assertEqual(ex_commands.SHELL_READERS, {})
+        self.assertFalse(self.view.settings().has('vintageex_reading_shell'))
+        self.assertEqual(self.view.get_status('vintageex_read_shell'), '')
+        self.assertEqual(self.view.get_regions('vintageex_read_shell'), [])
+
+    def testReportsErrorsInPanel(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('x\n')
+        self.ex(':r !echo oops >&2; exit 2')
+
+        panel = self.window.get_output_panel('vintageex_shell')
+        report = panel.substr(sublime.Region(0, panel.size()))
+        self.assertTrue('oops' in report)
+        self.assertTrue('exited with status 2' in report)
+
+    def testKeepsTextOfFiltersTimedOut(self):
+        if sublime.platform() == 'windows':
+            return
+        self.set_text('a\nb\n')
+        self.view.settings().set('vintageex_shell_timeout', 0.2)
+        self.ex(':1!sleep 5')
+
+        self.assertEqual(self.text(), 'a\nb\n')
+        self.assertTrue(sublime.status_messages[-1].endswith('timed out'))
+
+
+class TestExReadFile(CommandTestCase):
+    def setUp(self):
+        super(TestExReadFile, self).setUp()
+        import tempfile
+        fd, self.path = tempfile.mkstemp(prefix='vintageex')
+        os.write(fd, 'f1\nf2\n')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+        super(TestExReadFile, self).tearDown()
+
+    def testReadsBelowAddressedLine(self):
+        self.set_text('a\nb\n')
+        self.ex(':1r %s' % self.path)
+
+        self.assertEqual(self.text(), 'a\nf1\nf2\nb\n')
+        self.view.run_command('undo')
+        self.assertEqual(self.text(), 'a\nb\n')
+
+    def testReadsAboveFirstLine(self):
+        self.set_text('a\nb\n')
+        self.ex(':0r %s' % self.path)
+
+        self.assertEqual(self.text(), 'f1\nf2\na\nb\n')
+
+    def testReadsBelowLastLineWithoutNewline(self):
+        self.set_text('a\nb')
+        self.ex(':$r %s' % self.path)
+
+        self.assertEqual(self.text(), 'a\nb\nf1\nf2')
+
+    def testDecodesAsEncodingAsked(self):
+        f = open(self.path, 'wb')
+        f.write(u'\xe9'.encode('latin-1'))
+        f.close()
+        self.set_text('a\n')
+        self.ex(':r ++enc=latin1 %s' % self.path)
+
+        self.assertEqual(self.text(), u'a\n\xe9\n')
+
+    def testReportsMissingFile(self):
+        self.set_text('a\n')
+        self.ex(':r %s.missing' % self.path)
+
+        self.assertEqual(self.text(), 'a\n')
+        self.assertTrue('E484' in sublime.status_messages[-1])
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from vex import file_reader
+from vex.file_reader import decode_chunks
+from vex.file_reader import parse_plusplus_args
+from vex.file_reader import read_chunks
+
+
+class TestParsePlusplusArgs(unittest.TestCase):
+    def testParsesOptions(self):
+        self.assertEqual(parse_plusplus_args(' ++enc=latin1 ++bin'),
+                         {'encoding': 'latin1', 'bin': True})
+        self.assertEqual(parse_plusplus_args('++encoding=utf-8'),
+                         {'encoding': 'utf-8'})
+        self.assertEqual(parse_plusplus_args(''), {})
+
+
+class TestDecodeChunks(unittest.TestCase):
+    def testDecodesCharactersSplitAcrossChunks(self):
+        data = u'caf\xe9 \u20ac\n'.encode('utf-8')
+        chunks = [data[i:i + 1] for i in range(len(data))]
+        self.assertEqual(u''.join(decode_chunks(chunks, 'utf-8')),
+                         u'caf\xe9 \u20ac\n')
+
+    def testJoinsWindowsLineEndingsSplitAcrossChunks(self):
+        chunks = ['a\r', '\nb\r', '\r\n']
+        self.assertEqual(u''.join(decode_chunks(chunks, 'utf-8')),
+                         u'a\nb\r\n')
+
+    def testLeavesOutUtf8ByteOrderMark(self):
+        self.assertEqual(list(decode_chunks(['\xef\xbb\xbfa'], 'utf-8')),
+                         [u'a'])
+
+
+class TestReadChunks(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(prefix='vintageex')
+        os.write(fd, 'abcdefghij')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def read(self, **kwargs):
+        f = open(self.path, 'rb')
+        try:
+            return list(read_chunks(f, **kwargs))
+        finally:
+            f.close()
+
+    def testReadsInChunks(self):
+        self.assertEqual(self.read(size=4), ['abcd', 'efgh', 'ij'])
+
+    def testMapsLargeFiles(self):
+        self.assertEqual(self.read(size=4, mmap_threshold=5),
+                         ['abcd', 'efgh', 'ij'])
+
+    def testDecodesAsEncodingAsked(self):
+        f = open(self.path, 'wb')
+        f.write(u'\xe9\n'.encode('latin-1'))
+        f.close()
+        text = file_reader.file_text(self.path, 'UTF-8', '++enc=latin1')
+        self.assertEqual(u''.join(text), u'\xe9\n')
+        text = file_reader.file_text(self.path, 'Western (Windows 1252)')
+        self.assertEqual(u''.join(text), u'\xe9\n')
@@ -1,6 +1,9 @@
 import unittest
+import re
 
 from vex.parsers.g_cmd import GlobalLexer
+from vex.ex_global import line_starts
+from vex.ex_global import matching_lines
 
 
 class TestGlobalLexer(unittest.TestCase):
@@ -23,6 +26,40 @@ class TestGlobalLexer(unittest.TestCase):
         actual = self.lexer.parse(r'/\\/p#')
         self.assertEqual(actual, ['\\', 'p#'])
 
+    def testRejectsEmptyInput(self):
+        self.assertRaises(SyntaxError, self.lexer.parse, '')
+
+
+class TestMatchingLines(unittest.TestCase):
+    def setUp(self):
+        self.text = 'foo\nbar\n\nfoo bar\nbaz'
+
+    def lines(self, pattern, invert=False):
+        pattern = re.compile(pattern, re.MULTILINE)
+        return [self.text[a:b] for (a, b) in
+                                matching_lines(pattern, self.text, invert)]
+
+    def testCanFindLineStarts(self):
+        self.assertEqual(line_starts(self.text), [0, 4, 8, 9, 17])
+
+    def testCanFindMatchingLines(self):
+        self.assertEqual(self.lines('foo'), ['foo', 'foo bar'])
+        self.assertEqual(self.lines('^bar'), ['bar'])
+        self.assertEqual(self.lines('^$'), [''])
+
+    def testCanFindNonMatchingLines(self):
+        self.assertEqual(self.lines('bar', invert=True), ['foo', '', 'baz'])
+
+    def testMatchesDoNotSpanLines(self):
+        self.assertEqual(self.lines(r'foo\s+bar'), ['foo bar'])
+        self.assertEqual(self.lines(r'o\s'), ['foo bar'])
+
+    def testIsLazy(self):
+        pattern = re.compile('ba', re.MULTILINE)
+        lines = matching_lines(pattern, self.text)
+
+        self.assertEqual(lines.next(), (4, 7))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from vex.line_index import INDEXES
+from vex.line_index import LineIndex
+from vex.line_index import get_index
+
+
+class TestLineIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LineIndex('abc\n\nde\n')
+
+    def testCountsLines(self):
+        self.assertEqual(len(self.index), 4)
+
+    def testFindsRowOfPoint(self):
+        values = ((0, 0), (3, 0), (4, 1), (5, 2), (7, 2), (8, 3), (100, 3))
+        for point, row in values:
+            self.assertEqual(self.index.row(point), row)
+
+    def testFindsPointOfRow(self):
+        values = ((0, 0), (1, 4), (2, 5), (3, 8), (10, 8))
+        for row, point in values:
+            self.assertEqual(self.index.point(row), point)
+
+    def testLineExcludesNewline(self):
+        self.assertEqual(self.index.line(0), (0, 3))
+        self.assertEqual(self.index.line(1), (4, 4))
+        self.assertEqual(self.index.line(3), (8, 8))
+
+    def testFullLineIncludesNewline(self):
+        self.assertEqual(self.index.full_line(0), (0, 4))
+        self.assertEqual(self.index.full_line(3), (8, 8))
+
+
+class TestGetIndex(unittest.TestCase):
+    def setUp(self):
+        INDEXES.clear()
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return 'a\nb'
+
+    def testReusesIndexForSameVersion(self):
+        first = get_index(1, 10, self.read)
+        self.assertTrue(get_index(1, 10, self.read) is first)
+        self.assertEqual(self.reads, 1)
+
+    def testRebuildsIndexWhenBufferChanges(self):
+        get_index(1, 10, self.read)
+        get_index(1, 11, self.read)
+        self.assertEqual(self.reads, 2)
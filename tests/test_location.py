@@ -1,18 +1,20 @@
 import sublime
 
+import re
 import unittest
 
 from test_runner import g_test_view
 from tests import select_line
 
-from ex_location import get_line_nr
-from ex_location import find_eol
-from ex_location import find_bol
-from ex_location import find_line
-from ex_location import search_in_range
-from ex_location import find_last_match
-from ex_location import reverse_search
-from ex_range import calculate_relative_ref
+from vex.ex_location import get_line_nr
+from vex.ex_location import find_eol
+from vex.ex_location import find_bol
+from vex.ex_location import find_line
+from vex.ex_location import search_in_range
+from vex.ex_location import find_last_match
+from vex.ex_location import reverse_search
+from vex.ex_location import search_backwards
+from vex.ex_range import calculate_relative_ref
 
 
 class TestHelpers(unittest.TestCase):
@@ -101,3 +103,35 @@ class TestSearchHelpers(unittest.TestCase):
     
     def tearDown(self):
         select_line(g_test_view, 1)
+
+
+class TestSearchBackwardsWithSublimeOnlyPatterns(unittest.TestCase):
+    def setUp(self):
+        self.view = sublime.active_window().new_file()
+        edit = self.view.begin_edit()
+        self.view.insert(edit, 0, 'aa b aaa b a')
+        self.view.end_edit(edit)
+        # Sublime Text's engine has possessive quantifiers; Python's doesn't.
+        self.view._compile = lambda pattern, flags: re.compile(
+                                        pattern.replace('++', '+'), re.M)
+
+    def tearDown(self):
+        sublime.active_window().focus_view(self.view)
+        sublime.active_window().run_command('close')
+
+    def testFallsBackToViewFind(self):
+        self.assertEquals(search_backwards(self.view, 'a++', 0, 10),
+                          sublime.Region(5, 8))
+        self.assertEquals(search_backwards(self.view, 'a++', 0, 4),
+                          sublime.Region(0, 2))
+        self.assertEquals(search_backwards(self.view, 'a++', 3, 4), None)
+        self.assertEquals(find_last_match(self.view, 'a++', 0, 10),
+                          sublime.Region(5, 8))
+
+    def testDoesNotMatchEndOfLineAtEndOfRange(self):
+        edit = self.view.begin_edit()
+        self.view.replace(edit, sublime.Region(0, self.view.size()),
+                          'foo\nfoox')
+        self.view.end_edit(edit)
+        self.assertEquals(find_last_match(self.view, 'foo$', 0, 7),
+                          sublime.Region(0, 3))
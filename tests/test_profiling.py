@@ -0,0 +1,79 @@
+import os
+import tempfile
+import time
+import unittest
+
+from vex import profiling
+from vex.profiling import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def testKeepsOnlyLastValues(self):
+        ring = RingBuffer(size=3)
+        for i in range(5):
+            ring.append(i)
+
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(sorted(ring.values), [2, 3, 4])
+
+    def testCalculatesPercentilesByNearestRank(self):
+        ring = RingBuffer(size=100)
+        for i in range(1, 101):
+            ring.append(i)
+
+        self.assertEqual(ring.percentile(50), 50)
+        self.assertEqual(ring.percentile(95), 95)
+        self.assertEqual(ring.percentile(100), 100)
+
+
+class TestInvocations(unittest.TestCase):
+    def setUp(self):
+        profiling.reset()
+
+    def tearDown(self):
+        profiling.reset()
+
+    def testRecordsEveryPhase(self):
+        invocation = profiling.start('ex_foo', parse_time=0.5)
+        profiling.finish(invocation)
+
+        timings = profiling.TIMINGS['ex_foo']
+        self.assertEqual(sorted(timings), sorted(profiling.PHASES))
+        self.assertEqual(timings['parse'].values, [0.5])
+
+    def testTimedFunctionsAddToTheirPhase(self):
+        @profiling.timed('range')
+        def calculate(x):
+            time.sleep(0.001)
+            return x * 2
+
+        self.assertEqual(calculate(2), 4)
+        invocation = profiling.start('ex_foo')
+        calculate(2)
+        self.assertTrue(invocation.times['range'] > 0)
+        profiling.finish(invocation)
+        self.assertEqual(profiling._current, None)
+
+    def testReportsEveryCommandAndPhase(self):
+        profiling.finish(profiling.start('ex_foo'))
+        profiling.finish(profiling.start('ex_bar'))
+
+        lines = profiling.report()
+        self.assertEqual(len(lines), 1 + 2 * len(profiling.PHASES))
+        self.assertTrue(lines[1].startswith('ex_bar'))
+
+    def testDumpsCaptureAfterCount(self):
+        fd, file_name = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            profiling.start_capture(2, file_name)
+            results = []
+            for i in range(2):
+                invocation = profiling.start('ex_foo')
+                profiling.call(invocation, sum, [1, 2])
+                results.append(profiling.finish(invocation))
+
+            self.assertEqual(results, [None, file_name])
+            self.assertTrue(os.path.getsize(file_name) > 0)
+        finally:
+            os.remove(file_name)
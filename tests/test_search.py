@@ -0,0 +1,84 @@
+import unittest
+import re
+
+from vex.ex_search import MatchIndex
+from vex.ex_search import build_match_index
+from vex.ex_search import last_match
+
+
+def brute_force(pattern, text, start, end):
+    found = None
+    for m in pattern.finditer(text, start):
+        if m.end() <= end:
+            found = (m.start(), m.end())
+    return found
+
+
+class TestLastMatch(unittest.TestCase):
+    def setUp(self):
+        self.text = '\n'.join('line %d foo' % i for i in range(200))
+        self.read = lambda a, b: self.text[a:b]
+
+    def search(self, pattern, start=0, end=None, chunk_size=16, overlap=8):
+        if end is None:
+            end = len(self.text)
+        return last_match(re.compile(pattern, re.M), self.read, start, end,
+                          chunk_size=chunk_size, overlap=overlap)
+
+    def testFindsLastMatchInBuffer(self):
+        expected = (len(self.text) - 3, len(self.text))
+        self.assertEqual(self.search('foo'), expected)
+
+    def testIgnoresMatchesEndingAfterEnd(self):
+        end = self.text.index('line 100') + 2
+        expected = self.text.rindex('foo', 0, end)
+        self.assertEqual(self.search('foo', end=end), (expected, expected + 3))
+
+    def testIgnoresMatchesBeforeStart(self):
+        self.assertEqual(self.search('line 1\\b', start=20), None)
+
+    def testReturnsNoneIfNotFound(self):
+        self.assertEqual(self.search('bar'), None)
+
+    def testAnchorsSeeTextBeforeChunk(self):
+        pattern = re.compile('^line 1\\d', re.M)
+        self.assertEqual(self.search(pattern.pattern),
+                         brute_force(pattern, self.text, 0, len(self.text)))
+
+    def testDollarDoesNotMatchAtEndOfWindow(self):
+        end = self.text.index('line 50') + 3
+        pattern = re.compile('in$', re.M)
+        self.assertEqual(self.search(pattern.pattern, end=end), None)
+
+    def testFindsMatchesSpanningChunks(self):
+        pattern = re.compile('foo\nline 19\\d', re.M)
+        self.assertEqual(self.search(pattern.pattern, overlap=16),
+                         brute_force(pattern, self.text, 0, len(self.text)))
+
+    def testAgreesWithForwardSearch(self):
+        for pattern in ('foo', '\\d+ foo$', '^line 7', 'o\nl'):
+            compiled = re.compile(pattern, re.M)
+            for end in (0, 5, 77, 500, 1234, len(self.text)):
+                self.assertEqual(self.search(pattern, end=end),
+                                 brute_force(compiled, self.text, 0, end))
+
+
+class TestMatchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = MatchIndex(re.compile('foo'), 'foo bar foo\nfoo')
+
+    def testCountsMatches(self):
+        self.assertEqual(len(self.index), 3)
+
+    def testNumbersMatchAtPoint(self):
+        values = ((0, 1), (8, 2), (12, 3))
+        for point, ordinal in values:
+            self.assertEqual(self.index.ordinal(point), ordinal)
+
+    def testNumbersLastMatchBeforePoint(self):
+        self.assertEqual(self.index.ordinal(5), 1)
+
+    def testBuildsInBackground(self):
+        built = []
+        build_match_index(re.compile('o'), 'foo', built.append).join()
+        self.assertEqual(built[0].starts, [1, 2])
@@ -0,0 +1,302 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+from vex.encoding import python_codec
+from vex import shell
+from vex.shell import map_bounded
+from vex.shell import Runner
+from vex.shell import ShellReader
+
+
+class TestPythonCodec(unittest.TestCase):
+    def testMapsSublimeNames(self):
+        self.assertEqual(python_codec('UTF-8'), 'utf-8')
+        self.assertEqual(python_codec('UTF-8 with BOM'), 'utf-8')
+        self.assertEqual(python_codec('UTF-16 LE'), 'utf-16-le')
+        self.assertEqual(python_codec('Western (Windows 1252)'), 'cp1252')
+        self.assertEqual(python_codec('Western (ISO 8859-1)'), 'iso8859-1')
+        self.assertEqual(python_codec('DOS (CP 437)'), 'cp437')
+
+    def testFallsBackToDefault(self):
+        self.assertEqual(python_codec('Undefined'), 'utf-8')
+        self.assertEqual(python_codec('Hexadecimal', 'latin-1'), 'latin-1')
+        self.assertEqual(python_codec(None), 'utf-8')
+
+
+class TestMapBounded(unittest.TestCase):
+    def testKeepsOrder(self):
+        def slow_double(x):
+            time.sleep(0.001 * (5 - x))
+            return x * 2
+
+        self.assertEqual(map_bounded(slow_double, range(5), 3),
+                         [0, 2, 4, 6, 8])
+
+    def testRunsAtMostLimitAtOnce(self):
+        lock = threading.Lock()
+        running = [0]
+        most = [0]
+
+        def track(x):
+            lock.acquire()
+            running[0] += 1
+            most[0] = max(most[0], running[0])
+            lock.release()
+            time.sleep(0.005)
+            lock.acquire()
+            running[0] -= 1
+            lock.release()
+            return x
+
+        self.assertEqual(map_bounded(track, range(10), 3), range(10))
+        self.assertTrue(1 < most[0] <= 3)
+
+    def testRaisesErrors(self):
+        def fail(x):
+            if x == 3:
+                raise ValueError(x)
+            return x
+
+        self.assertRaises(ValueError, map_bounded, fail, range(6), 2)
+        self.assertRaises(ValueError, map_bounded, fail, range(6), 1)
+
+
+if os.name == 'posix':
+    class TestShellReader(unittest.TestCase):
+        def read(self, cmd, cancel_after=None, **kwargs):
+            """Runs a ShellReader for `cmd`, polling it until it's done.
+            Returns the batches of output and what on_done got.
+            """
+            batches = []
+            done = []
+            timeouts = []
+            reader = ShellReader(['/bin/sh', '-c', cmd], batches.append,
+                                 done.append,
+                                 lambda callback, delay: timeouts.append(callback),
+                                 interval=1, **kwargs)
+            reader.start()
+            polls = 0
+            while not done:
+                time.sleep(0.001)
+                polls += 1
+                if polls == cancel_after:
+                    reader.cancel()
+                timeouts.pop(0)()
+            return batches, done[0]
+
+        def testHandsOverAllOutput(self):
+            batches, done = self.read('printf "a\\nb\\nc"')
+            self.assertEqual(u''.join(batches), u'a\nb\nc')
+            self.assertEqual((done.returncode, done.cancelled), (0, False))
+
+        def testReportsStatusAndStderr(self):
+            batches, done = self.read('echo oops >&2; exit 3')
+            self.assertEqual(batches, [])
+            self.assertEqual((done.returncode, done.cancelled), (3, False))
+            self.assertEqual(done.stderr, 'oops\n')
+
+        def testBoundsBatchesAndPendingOutput(self):
+            batches, done = self.read('seq 1 20000', max_batch=1000,
+                                      max_pending=5000)
+            self.assertEqual(u''.join(batches),
+                             u''.join(u'%d\n' % i for i in range(1, 20001)))
+            self.assertTrue(max(len(b) for b in batches) <= 1000)
+
+        def testCancels(self):
+            batches, done = self.read('yes', cancel_after=5)
+            self.assertTrue(done.cancelled)
+
+        def testCancelsAfterShellExits(self):
+            # The shell is gone, but the sleep holds its output open.
+            started = time.time()
+            batches, done = self.read('sleep 30 & echo x', cancel_after=50)
+            self.assertTrue(done.cancelled)
+            self.assertTrue(time.time() - started < 5)
+
+        def testCancelsWhileProcessOutsideGroupHoldsOutput(self):
+            # Out of the process group, killing the group can't reach it.
+            escape = 'import os, time; os.setsid(); time.sleep(10)'
+            started = time.time()
+            batches, done = self.read('%s -c "%s" & echo x' % (
+                                      sys.executable, escape),
+                                      cancel_after=50)
+            self.assertTrue(done.cancelled)
+            self.assertTrue(time.time() - started < 5)
+
+
+    class TestRunner(unittest.TestCase):
+        def run_sh(self, cmd, input_text=None, **kwargs):
+            return Runner(['/bin/sh', '-c', cmd], **kwargs).run(input_text)
+
+        def testCollectsOutputStatusAndStderr(self):
+            result = self.run_sh('cat; echo oops >&2; exit 4', u'abc')
+            self.assertEqual(result.text(), u'abc')
+            self.assertEqual(result.returncode, 4)
+            self.assertEqual(result.stderr, 'oops\n')
+            self.assertTrue(result.failed())
+
+        def testSpillsOutputPastMaxMemory(self):
+            result = self.run_sh('seq 1 100000', max_memory=1000)
+            try:
+                self.assertTrue(sum(len(c) for c in result.output) <= 1000)
+                self.assertTrue(os.path.exists(result.spill_file))
+                self.assertEqual(result.text(),
+                                 u''.join(u'%d\n' % i for i in range(1, 100001)))
+            finally:
+                result.close()
+
+        def testKillsProcessGroupOnTimeout(self):
+            started = time.time()
+            result = self.run_sh('sleep 10 & sleep 10', timeout=0.2)
+            self.assertTrue(result.timed_out)
+            self.assertTrue(time.time() - started < 5)
+
+        def testTimesOutWhenBackgroundChildHoldsOutput(self):
+            started = time.time()
+            result = self.run_sh('sleep 8 & echo hi', timeout=0.5)
+            self.assertTrue(result.timed_out)
+            self.assertEqual(result.text(), u'hi\n')
+            self.assertTrue(time.time() - started < 3)
+
+        def testCancelsFromOtherThread(self):
+            runner = Runner(['/bin/sh', '-c', 'sleep 10'])
+            threading.Timer(0.1, runner.cancel).start()
+            result = runner.run()
+            self.assertTrue(result.cancelled)
+            self.assertFalse(result.timed_out)
+
+        def testKeepsOnlyStartOfStderr(self):
+            result = self.run_sh('seq 1 100000 >&2')
+            self.assertEqual(len(result.stderr), shell.MAX_STDERR)
+
+
+    from plat import posix
+
+    class TestFilterText(unittest.TestCase):
+        def filter(self, text, command, encoding='utf-8'):
+            return posix.filter_text('/bin/sh', text, command, encoding)
+
+        def testPassesTextVerbatim(self):
+            text = u'"quoted" \'single\' $HOME `ls` \\n'
+            self.assertEqual(self.filter(text, 'cat'), text)
+
+        def testKeepsLastCharacter(self):
+            self.assertEqual(self.filter(u'b\na', 'sort'), u'a\nb')
+            self.assertEqual(self.filter(u'b\na\n', 'sort'), u'a\nb\n')
+
+        def testFiltersTextBiggerThanPipeBuffers(self):
+            text = u''.join(u'%07d\n' % i for i in reversed(range(100000)))
+            output = self.filter(text, 'sort')
+            self.assertEqual(len(output), len(text))
+            self.assertTrue(output.startswith(u'0000000\n0000001\n'))
+
+        def testHonorsEncoding(self):
+            text = u'caf\xe9'
+            self.assertEqual(self.filter(text, 'cat', 'cp1252'), text)
+            self.assertEqual(self.filter(text, 'wc -c | tr -d " "', 'cp1252'),
+                             u'4')
+            self.assertEqual(self.filter(text, 'wc -c | tr -d " "', 'utf-8'),
+                             u'5')
+
+        def testSurvivesFiltersNotReadingAllInput(self):
+            text = u'x\n' * 200000
+            self.assertEqual(self.filter(text, 'head -n 1'), u'x\n')
+
+        def testReplacesUndecodableOutput(self):
+            output = self.filter(u'', "printf 'a\\377b'")
+            self.assertEqual(output, u'a\ufffdb')
+
+        def testStreamsOutputSpilledToFile(self):
+            text = u'%07d\n' * 100000 % tuple(range(100000))
+            output, result = posix.run_filter('/bin/sh', text[:-1], 'cat',
+                                              max_memory=1000)
+            try:
+                self.assertTrue(result.spill_file is not None)
+                chunks = list(output)
+                self.assertTrue(len(chunks) > 1)
+                self.assertEqual(u''.join(chunks), text[:-1])
+            finally:
+                result.close()
+
+    class TestCoprocess(unittest.TestCase):
+        def setUp(self):
+            self.coprocess = posix.Coprocess('/bin/sh')
+
+        def tearDown(self):
+            self.coprocess.close()
+
+        def filter(self, text, command):
+            output, result = self.coprocess.filter(text, command)
+            try:
+                return u''.join(output), result.returncode
+            finally:
+                result.close()
+
+        def testFiltersOneCommandAfterAnother(self):
+            self.assertEqual(self.filter(u'b\na', 'sort'), (u'a\nb', 0))
+            self.assertEqual(self.filter(u'x $y\n', 'cat'), (u'x $y\n', 0))
+            self.assertEqual(self.filter(u'', 'printf abc; exit 2'),
+                             (u'abc', 2))
+
+        def testSurvivesBadCommands(self):
+            self.coprocess.filter(u'', 'echo "unbalanced')
+            self.coprocess.filter(u'', 'exit 1')
+            self.coprocess.filter(u'', 'cd /')
+            self.assertEqual(self.filter(u'a', 'cat'), (u'a', 0))
+            self.assertTrue(self.coprocess.is_alive())
+
+        def testReadsOutputBiggerThanChunks(self):
+            text = u'%07d\n' * 50000 % tuple(range(50000))
+            self.assertEqual(self.filter(text, 'cat'), (text, 0))
+
+        def testSpillsOutputToFile(self):
+            text = u'%07d\n' * 1000 % tuple(range(1000))
+            output, result = self.coprocess.filter(text, 'cat',
+                                                   max_memory=1000)
+            try:
+                self.assertTrue(result.spill_file is not None)
+                self.assertEqual(u''.join(output), text)
+            finally:
+                result.close()
+
+        def testCollectsStderr(self):
+            output, result = self.coprocess.filter(u'', 'echo oops >&2')
+            self.assertEqual(result.stderr, 'oops\n')
+
+        def testTimesOut(self):
+            output, result = self.coprocess.filter(u'', 'sleep 10',
+                                                   timeout=0.2)
+            self.assertTrue(result.timed_out)
+            self.assertFalse(self.coprocess.is_alive())
+
+
+    class TestCoprocessPool(unittest.TestCase):
+        def setUp(self):
+            self.pool = posix.CoprocessPool('/bin/sh', 2, idle_timeout=60)
+
+        def tearDown(self):
+            self.pool.reap(now=time.time() + 60)
+
+        def filter(self, text, command):
+            return u''.join(self.pool.filter(text, command)[0])
+
+        def testReusesCoprocesses(self):
+            first = self.filter(u'', 'echo $$')
+            self.assertEqual(self.filter(u'', 'echo $$'), first)
+
+        def testFallsBackWhenShellDies(self):
+            self.assertEqual(self.filter(u'a', 'kill -9 $$'), u'')
+            self.assertEqual(self.filter(u'a', 'cat'), u'a')
+
+        def testClosesIdleCoprocesses(self):
+            map_bounded(lambda i: self.pool.filter(u'', 'sleep 0.05'),
+                        range(4), 4)
+            self.assertEqual(len(self.pool.idle), 2)
+
+            self.pool.reap()
+            self.assertEqual(len(self.pool.idle), 2)
+            self.pool.reap(now=time.time() + 60)
+            self.assertEqual(self.pool.idle, [])
@@ -1,9 +1,14 @@
 import unittest
+import re
 
 from vex.parsers.s_cmd import SubstituteLexer
 from vex.parsers.parsing import RegexToken
 from vex.parsers.parsing import Lexer
 from vex.parsers.parsing import EOF
+from vex.ex_substitute import spans_lines
+from vex.ex_substitute import substitute_block
+from vex.ex_substitute import substitute_lines
+from vex.ex_substitute import translate
 
 
 class TestRegexToken(unittest.TestCase):
@@ -143,3 +148,122 @@ class TestSubstituteLexer(unittest.TestCase):
         actual = self.lexer.parse(r"/foo\//hello")
 
         self.assertEqual(actual, ['foo/', 'hello', '', ''])
+
+    def testCanParseTrailingBackslash(self):
+        actual = self.lexer.parse('/foo\\')
+
+        self.assertEqual(actual, ['foo\\', '', '', ''])
+
+    def testCanParseLongPatterns(self):
+        pattern = r'(\w+)\/\s*' * 1000
+        actual = self.lexer.parse('/' + pattern + '/x/g')
+
+        self.assertEqual(actual, [pattern.replace('\\/', '/'), 'x', 'g', ''])
+
+
+class TestSubstituteLines(unittest.TestCase):
+    def apply(self, text, changes):
+        for begin, end, new_text in reversed(changes):
+            text = text[:begin] + new_text + text[end:]
+        return text
+
+    def testReplacesFirstMatchInEachLine(self):
+        text = 'foo foo\nbar\nfoo'
+        changes, matches, lines = substitute_lines(re.compile('foo', re.M),
+                                                   'X', text, count=1)
+
+        self.assertEqual(self.apply(text, changes), 'X foo\nbar\nX')
+        self.assertEqual((matches, lines), (2, 2))
+
+    def testReplacesAllMatchesInEachLine(self):
+        text = 'foo foo\nbar\nfoo'
+        changes, matches, lines = substitute_lines(re.compile('foo', re.M),
+                                                   'X', text)
+
+        self.assertEqual(self.apply(text, changes), 'X X\nbar\nX')
+        self.assertEqual((matches, lines), (3, 2))
+
+    def testAnchorsApplyToEachLine(self):
+        text = 'foo\n foo\nfoo'
+        changes, _, _ = substitute_lines(re.compile('^foo$', re.M), 'X', text)
+
+        self.assertEqual(self.apply(text, changes), 'X\n foo\nX')
+
+    def testMatchesDoNotSpanLines(self):
+        text = 'a  \n  b'
+        changes, _, _ = substitute_lines(re.compile(r'\s+', re.M), '_', text)
+
+        self.assertEqual(self.apply(text, changes), 'a_\n_b')
+
+    def testMergesConsecutiveChangedLines(self):
+        text = 'foo\nfoo\nbar\nfoo'
+        changes, _, _ = substitute_lines(re.compile('foo', re.M), 'X', text)
+
+        self.assertEqual(changes, [(0, 7, 'X\nX'), (12, 15, 'X')])
+
+    def testSkipsLinesThatDoNotChange(self):
+        changes, matches, lines = substitute_lines(re.compile('foo', re.M),
+                                                   'foo', 'foo\nfoo')
+
+        self.assertEqual(changes, [])
+        self.assertEqual((matches, lines), (2, 0))
+
+
+class TestSubstituteBlock(unittest.TestCase):
+    def apply(self, text, changes):
+        for begin, end, new_text in reversed(changes):
+            text = text[:begin] + new_text + text[end:]
+        return text
+
+    def testJoinsLines(self):
+        text = 'a,\n  b,\n  c'
+        changes, matches, lines = substitute_block(re.compile(r',\n\s*', re.M),
+                                                   ', ', text)
+
+        self.assertEqual(self.apply(text, changes), 'a, b, c')
+        self.assertEqual((matches, lines), (2, 2))
+
+    def testSplitsLines(self):
+        text = 'a;b;c'
+        changes, _, _ = substitute_block(re.compile(';', re.M), '\n', text)
+
+        self.assertEqual(self.apply(text, changes), 'a\nb\nc')
+
+    def testCountAppliesToEachLine(self):
+        text = 'x x\nx x'
+        changes, matches, _ = substitute_block(re.compile('x', re.M), 'y',
+                                               text, count=1)
+
+        self.assertEqual(self.apply(text, changes), 'y x\ny x')
+        self.assertEqual(matches, 2)
+
+    def testIgnoresMatchesBeginningAfterLast(self):
+        text = 'a,\nb,\nc'
+        changes, _, _ = substitute_block(re.compile(',\n', re.M), '', text,
+                                         last=2)
+
+        self.assertEqual(self.apply(text, changes), 'ab,\nc')
+
+    def testMergesNearbyChanges(self):
+        text = 'a\nb\n\n\nc'
+        changes, _, _ = substitute_block(re.compile('[abc]', re.M), 'X', text)
+
+        self.assertEqual(changes, [(0, 3, 'X\nX'), (6, 7, 'X')])
+
+
+class TestSpansLines(unittest.TestCase):
+    def testDetectsNewlines(self):
+        values = (
+            (r'a\nb', True),
+            (r'a\_.*b', True),
+            ('a\nb', True),
+            (r'a\\nb', False),
+            (r'a.*b', False),
+        )
+
+        for pattern, expected in values:
+            self.assertEqual(spans_lines(pattern), expected)
+
+    def testTranslatesAnyCharacter(self):
+        self.assertEqual(translate(r'a\_.b'), r'a[\s\S]b')
+        self.assertEqual(translate(r'a\\_.b'), r'a\\_.b')
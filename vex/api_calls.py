@@ -0,0 +1,136 @@
+"""view API call accounting
+
+With the vintageex_count_api_calls setting on, ex commands see their view
+through a ViewProxy while they run. The proxy counts calls and time spent
+per API method and per calling function, so that commands making many
+small calls (substr, line, rowcol, find...) inside loops stand out.
+"""
+
+import sys
+import time
+
+
+class CallCounter(object):
+    """Calls made through the proxies of one command run.
+    """
+    def __init__(self, name):
+        self.name = name
+        # {(method, caller): [calls, seconds]}
+        self.calls = {}
+        self.proxies = {}
+
+    def add(self, method, caller, seconds):
+        entry = self.calls.setdefault((method, caller), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def total(self):
+        return sum(calls for (calls, seconds) in self.calls.itervalues())
+
+    def by_method(self):
+        totals = {}
+        for (method, caller), (calls, seconds) in self.calls.iteritems():
+            totals[method] = totals.get(method, 0) + calls
+        return totals
+
+    def report(self):
+        """Returns the calls made as lines of text, most frequent first.
+        """
+        seconds = sum(s for (calls, s) in self.calls.itervalues())
+        lines = ["%s: %d API calls, %.2fms" % (self.name, self.total(),
+                                               seconds * 1000)]
+        entries = sorted(self.calls.iteritems(), key=lambda e: -e[1][0])
+        for (method, caller), (calls, seconds) in entries:
+            lines.append("  %-18s %7d %8.2fms  %s" % (method, calls,
+                                                      seconds * 1000, caller))
+        return lines
+
+
+class ViewProxy(object):
+    """Forwards everything to `view`, counting calls to its methods.
+    """
+    def __init__(self, view, counter):
+        self._view = view
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._view, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        counter = self._counter
+
+        def counted(*args, **kwargs):
+            frame = sys._getframe(1)
+            caller = "%s.%s" % (frame.f_globals.get('__name__'),
+                                frame.f_code.co_name)
+            started = time.time()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                counter.add(name, caller, time.time() - started)
+        return counted
+
+    def __eq__(self, other):
+        return unwrap(other) == self._view
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._view)
+
+
+def unwrap(view):
+    if isinstance(view, ViewProxy):
+        return view._view
+    return view
+
+
+# Counter of the command running, if calls are being counted.
+_current = None
+# Counters of the last run of every command, by command name.
+LAST_CALLS = {}
+
+
+def start(name):
+    global _current
+    _current = CallCounter(name)
+    return _current
+
+
+def finish():
+    """Stops counting and returns the counter of the command that was
+    running.
+    """
+    global _current
+    counter, _current = _current, None
+    LAST_CALLS[counter.name] = counter
+    return counter
+
+
+def wrap(view):
+    """Returns `view` as seen by a command: through a proxy if calls are
+    being counted.
+    """
+    if _current is None or view is None:
+        return view
+    # Commands hand their view to others (:global to its subcommands), which
+    # must count calls once only.
+    view = unwrap(view)
+    proxy = _current.proxies.get(id(view))
+    if proxy is None:
+        proxy = _current.proxies[id(view)] = ViewProxy(view, _current)
+    return proxy
+
+
+def report():
+    """Returns the reports of the last run of every command.
+    """
+    lines = []
+    for name in sorted(LAST_CALLS):
+        lines.extend(LAST_CALLS[name].report())
+    return lines
+
+
+def reset():
+    LAST_CALLS.clear()
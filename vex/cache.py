@@ -0,0 +1,119 @@
+"""caches shared by ex commands
+
+Patterns used by :substitute, :global and searches are compiled through
+`compile_pattern`, so that repeating a command never compiles the same
+pattern twice. Values shared through a cache can be made read-only with
+`freeze`.
+"""
+
+import re
+
+
+# Pattern dialects. Patterns typed in :s and :g are passed to Python's re
+# module as they are; patterns used with view.find take Sublime Text flags.
+PYTHON = 'python'
+SUBLIME = 'sublime'
+
+# Sublime Text's values for the view.find flags. Duplicated here so that
+# this module can be used outside the editor.
+SUBLIME_LITERAL = 1
+SUBLIME_IGNORECASE = 2
+
+
+class LRUCache(object):
+    """Maps keys to values, evicting the least recently used key once more
+    than `max_size` keys are stored.
+    """
+    def __init__(self, max_size=100):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._order = []
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self._order[-1] != key:
+            self._order.remove(key)
+            self._order.append(key)
+        return value
+
+    def set(self, key, value):
+        if key in self._data:
+            self._order.remove(key)
+        elif len(self._order) >= self.max_size:
+            del self._data[self._order.pop(0)]
+        self._data[key] = value
+        self._order.append(key)
+
+    def clear(self):
+        self._data.clear()
+        self._order = []
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, size=len(self))
+
+
+class FrozenDict(dict):
+    """A dict that can't be changed after it's created. Copy it with dict()
+    to get a mutable version.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("FrozenDict can't be changed")
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+
+def freeze(value):
+    """Returns a read-only copy of `value`, turning dicts into FrozenDicts
+    and lists into tuples, recursively.
+    """
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for (k, v) in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+PATTERN_CACHE = LRUCache(max_size=64)
+
+
+def _to_python(pattern, flags, dialect):
+    if dialect == SUBLIME:
+        re_flags = re.MULTILINE
+        if flags & SUBLIME_IGNORECASE:
+            re_flags |= re.IGNORECASE
+        if flags & SUBLIME_LITERAL:
+            pattern = re.escape(pattern)
+        return pattern, re_flags
+    return pattern, flags
+
+
+def compile_pattern(pattern, flags=0, dialect=PYTHON):
+    """Returns `pattern` compiled with `flags`, reusing earlier compilations.
+
+    For the SUBLIME dialect, `flags` are view.find flags and the pattern is
+    compiled in MULTILINE mode, as Sublime Text does.
+
+    Raises re.error if `pattern` is invalid.
+    """
+    key = (pattern, flags, dialect)
+    compiled = PATTERN_CACHE.get(key)
+    if compiled is None:
+        compiled = re.compile(*_to_python(pattern, flags, dialect))
+        PATTERN_CACHE.set(key, compiled)
+    return compiled
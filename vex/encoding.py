@@ -0,0 +1,22 @@
+"""Sublime Text encoding names to Python codecs"""
+
+import codecs
+
+
+def python_codec(name, default='utf-8'):
+    """Returns the Python codec for a Sublime Text encoding name such as
+    'UTF-8 with BOM', 'Western (Windows 1252)' or 'UTF-16 LE'; `default` for
+    names with no codec, like 'Undefined' or 'Hexadecimal'.
+    """
+    # Python's 'undefined' codec raises on any use.
+    if not name or name == 'Undefined':
+        return default
+    name = name.replace(' with BOM', '')
+    if '(' in name:
+        name = name[name.index('(') + 1:name.rindex(')')]
+    for candidate in (name, name.replace(' ', '')):
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            pass
+    return default
@@ -5,6 +5,7 @@ from collections import namedtuple
 import re
 from itertools import takewhile
 
+from vex import cache
 from vex import ex_error
 from vex import parsers
 
@@ -15,7 +16,8 @@ from vex import parsers
 #   command
 #       The Sublime Text command to be executed.
 #   invocations
-#       Tuple of regexes representing valid calls for this command.
+#       Tuple of regexes representing valid calls for this command. They are
+#       compiled the first time the command is parsed (see get_invocations).
 #   error_on
 #       Tuple of error codes. The parsed command is checked for errors based
 #       on this information.
@@ -25,7 +27,9 @@ ex_cmd_data = namedtuple('ex_cmd_data', 'command invocations error_on')
 
 # Holds a parsed ex command data.
 # TODO: elaborate on params info.
-EX_CMD = namedtuple('ex_command', 'name command forced args parse_errors line_range can_have_range')
+#   next_cmd
+#       Source of the command chained after a '|', or None.
+EX_CMD = namedtuple('ex_command', 'name command forced args parse_errors line_range can_have_range next_cmd')
 
 # Address that can only appear after a command.
 POSTFIX_ADDRESS = r'[.$]|(?:/.*?(?<!\\)/|\?.*?(?<!\\)\?){1,2}|[+-]?\d+|[\'][a-zA-Z0-9<>]'
@@ -37,7 +41,7 @@ OPENENDED_SEARCH_ADDRESS = r'^[/?].*'
 # Vim's documentation on valid addresses is wrong. For postfixed addresses,
 # as in :copy10,20, only the left end is parsed and used; the rest is discarded
 # and not even errors are thrown if the right end is bogus, like in :copy10XXX.
-EX_POSTFIX_ADDRESS = re.compile(
+EX_POSTFIX_ADDRESS = (
                         r'''(?x)
                             ^(?P<address>
                                 (?:
@@ -59,11 +63,11 @@ EX_COMMANDS = {
     ('write', 'w'): ex_cmd_data(
                                 command='ex_write_file',
                                 invocations=(
-                                    re.compile(r'^\s*$'),
-                                    re.compile(r'(?P<plusplus_args> *\+\+[a-zA-Z0-9_]+)* *(?P<operator>>>) *(?P<target_redirect>.+)?'),
+                                    r'^\s*$',
+                                    r'(?P<plusplus_args> *\+\+[a-zA-Z0-9_]+)* *(?P<operator>>>) *(?P<target_redirect>.+)?',
                                     # fixme: raises an error when it shouldn't
-                                    re.compile(r'(?P<plusplus_args> *\+\+[a-zA-Z0-9_]+)* *!(?P<subcmd>.+)'),
-                                    re.compile(r'(?P<plusplus_args> *\+\+[a-zA-Z0-9_]+)* *(?P<file_name>.+)?'),
+                                    r'(?P<plusplus_args> *\+\+[a-zA-Z0-9_]+)* *!(?P<subcmd>.+)',
+                                    r'(?P<plusplus_args> *\+\+[a-zA-Z0-9_]+)* *(?P<file_name>.+)?',
                                 ),
                                 error_on=()
                                 ),
@@ -134,9 +138,10 @@ EX_COMMANDS = {
     ('read', 'r'): ex_cmd_data(
                                 command='ex_read_shell_out',
                                 invocations=(
-                                    # xxx: works more or less by chance. fix the command code
-                                    re.compile(r'(?P<plusplus> *\+\+[a-zA-Z0-9_]+)* *(?P<name>.+)'),
-                                    re.compile(r' *!(?P<name>.+)'),
+                                    # :r !cmd, as opposed to :r!cmd, which sets forced.
+                                    r'^ *!(?P<shell_cmd>.+)',
+                                    # :r ++enc=latin1 file
+                                    r'^(?P<plusplus_args>(?: *\+\+[a-zA-Z0-9_]+(?:=[^ ]+)?)+)? *(?P<name>.+)',
                                 ),
                                 # fixme: add error category for ARGS_REQUIRED
                                 error_on=()
@@ -161,7 +166,7 @@ EX_COMMANDS = {
                                 invocations=(),
                                 error_on=(ex_error.ERR_NO_RANGE_ALLOWED,)
                                 ),
-    ('move', 'move'): ex_cmd_data(
+    ('move', 'm'): ex_cmd_data(
                                 command='ex_move',
                                 invocations=(
                                    EX_POSTFIX_ADDRESS,
@@ -187,7 +192,7 @@ EX_COMMANDS = {
                                 ),
     ('substitute', 's'): ex_cmd_data(
                                 command='ex_substitute',
-                                invocations=(re.compile(r'(?P<pattern>.+)'),
+                                invocations=(r'(?P<pattern>.+)',
                                 ),
                                 error_on=()
                                 ),
@@ -195,10 +200,10 @@ EX_COMMANDS = {
                                 command='ex_double_ampersand',
                                 # We don't want to mantain flag values here, so accept anything and
                                 # let :substitute handle the values.
-                                invocations=(re.compile(r'(?P<flags>.+?)\s*(?P<count>[0-9]+)'),
-                                             re.compile(r'\s*(?P<flags>.+?)\s*'),
-                                             re.compile(r'\s*(?P<count>[0-9]+)\s*'),
-                                             re.compile(r'^$'),
+                                invocations=(r'(?P<flags>.+?)\s*(?P<count>[0-9]+)',
+                                             r'\s*(?P<flags>.+?)\s*',
+                                             r'\s*(?P<count>[0-9]+)\s*',
+                                             r'^$',
                                 ),
                                 error_on=()
                                 ),
@@ -212,28 +217,28 @@ EX_COMMANDS = {
     ('delete', 'd'): ex_cmd_data(
                                 command='ex_delete',
                                 invocations=(
-                                    re.compile(r' *(?P<register>[a-zA-Z0-9])? *(?P<count>\d+)?'),
+                                    r' *(?P<register>[a-zA-Z0-9])? *(?P<count>\d+)?',
                                 ),
                                 error_on=(ex_error.ERR_NO_BANG_ALLOWED,)
                                 ),
     ('global', 'g'): ex_cmd_data(
                                 command='ex_global',
                                 invocations=(
-                                    re.compile(r'(?P<pattern>.+)'),
+                                    r'(?P<pattern>.+)',
                                 ),
                                 error_on=()
                                 ),
     ('print', 'p'): ex_cmd_data(
                                 command='ex_print',
                                 invocations=(
-                                    re.compile(r'\s*(?P<count>\d+)?\s*(?P<flags>[l#p]+)?'),
+                                    r'\s*(?P<count>\d+)?\s*(?P<flags>[l#p]+)?',
                                 ),
                                 error_on=(ex_error.ERR_NO_BANG_ALLOWED,)
                                 ),
     ('Print', 'P'): ex_cmd_data(
                                 command='ex_print',
                                 invocations=(
-                                    re.compile(r'\s*(?P<count>\d+)?\s*(?P<flags>[l#p]+)?'),
+                                    r'\s*(?P<count>\d+)?\s*(?P<flags>[l#p]+)?',
                                 ),
                                 error_on=(ex_error.ERR_NO_BANG_ALLOWED,)
                                 ),
@@ -246,7 +251,7 @@ EX_COMMANDS = {
                                 ),
     ('edit', 'e'): ex_cmd_data(
                                 command='ex_edit',
-                                invocations=(re.compile(r"^$"),),
+                                invocations=(r"^$",),
                                 error_on=(ex_error.ERR_NO_RANGE_ALLOWED,)
                                 ),
     ('cquit', 'cq'): ex_cmd_data(
@@ -270,20 +275,20 @@ EX_COMMANDS = {
                                 ),
     ('only', 'on'): ex_cmd_data(
                                 command='ex_only',
-                                invocations=(re.compile(r'^$'),),
+                                invocations=(r'^$',),
                                 error_on=(ex_error.ERR_TRAILING_CHARS,
                                           ex_error.ERR_NO_RANGE_ALLOWED,)
                                 ),
     ('new', 'new'): ex_cmd_data(
                                 command='ex_new',
-                                invocations=(re.compile(r'^$',),
+                                invocations=(r'^$',
                                 ),
                                 error_on=(ex_error.ERR_TRAILING_CHARS,)
                                 ),
     ('yank', 'y'): ex_cmd_data(
                                 command='ex_yank',
-                                invocations=(re.compile(r'^(?P<register>\d|[a-z])$'),
-                                             re.compile(r'^(?P<register>\d|[a-z]) (?P<count>\d+)$'),
+                                invocations=(r'^(?P<register>\d|[a-z])$',
+                                             r'^(?P<register>\d|[a-z]) (?P<count>\d+)$',
                                 ),
                                 error_on=(),
                                 ),
@@ -295,15 +300,23 @@ EX_COMMANDS = {
     ('!', '!'): ex_cmd_data(
                         command='ex_shell_out',
                         invocations=(
-                                re.compile(r'(?P<shell_cmd>.+)$'),
+                                r'(?P<shell_cmd>.+)$',
                         ),
                         # FIXME: :!! is a different command to :!
                         error_on=(ex_error.ERR_NO_BANG_ALLOWED,),
                         ),
+    ('exprofile', 'exp'): ex_cmd_data(
+                                command='ex_profile',
+                                invocations=(
+                                    r'^\s*$',
+                                    r'^\s*(?P<count>\d+)(?:\s+(?P<file_name>.+?))?\s*$',
+                                ),
+                                error_on=(ex_error.ERR_NO_RANGE_ALLOWED,)
+                                ),
     ('tabedit', 'tabe'): ex_cmd_data(
                                     command='ex_tab_open',
                                     invocations=(
-                                        re.compile(r'^(?P<file_name>.+)$'),
+                                        r'^(?P<file_name>.+)$',
                                     ),
                                     error_on=(ex_error.ERR_NO_RANGE_ALLOWED,),
                                     ),
@@ -315,7 +328,7 @@ EX_COMMANDS = {
                                      invocations=(),
                                      error_on=(ex_error.ERR_NO_RANGE_ALLOWED,)
                                      ),
-    ('tabfirst', 'tabf'): ex_cmd_data(command='ex_tab_first',
+    ('tabfirst', 'tabfir'): ex_cmd_data(command='ex_tab_first',
                                      invocations=(),
                                      error_on=(ex_error.ERR_NO_RANGE_ALLOWED,)
                                      ),
@@ -332,19 +345,130 @@ EX_COMMANDS = {
 }
 
 
+class CommandTrie(object):
+    """Maps every valid spelling of a command name to its EX_COMMANDS key.
+
+    As in Vim, a command can be spelled as any prefix of its full name that
+    is at least as long as its shortest abbreviation. Each node also knows
+    the full names of the commands below it, for completions.
+    """
+    def __init__(self, commands=()):
+        self.children = {}
+        self.key = None
+        self.names = []
+        for key in sorted(commands):
+            self.add(key)
+
+    def add(self, key):
+        name, short = key
+        if not name.startswith(short):
+            raise ValueError("Bad abbreviation for :%s: %s" % key)
+        node = self
+        for i, c in enumerate(name):
+            node.names.append(name)
+            node = node.children.setdefault(c, CommandTrie())
+            if i + 1 < len(short):
+                continue
+            spelling = name[:i + 1]
+            # A command's full name beats another command's abbreviation.
+            if node.key is None or spelling == name:
+                node.key = key
+            elif node.key[0] != spelling:
+                raise ValueError("Ambiguous abbreviation: %s (:%s, :%s)" %
+                                 (spelling, node.key[0], name))
+        node.names.append(name)
+
+    def find(self, prefix):
+        """Returns the node for `prefix`, or None.
+        """
+        node = self
+        for c in prefix:
+            node = node.children.get(c)
+            if node is None:
+                return None
+        return node
+
+
+COMMAND_TRIE = CommandTrie(EX_COMMANDS)
+
+
 def find_command(cmd_name):
-    partial_matches = [name for name in EX_COMMANDS.keys()
-                                            if name[0].startswith(cmd_name)]
-    if not partial_matches: return None
-    full_match = [(ln, sh) for (ln, sh) in partial_matches
-                                                if cmd_name in (ln, sh)]
-    if full_match:
-        return full_match[0]
-    else:
-        return partial_matches[0]
+    """Returns the EX_COMMANDS key for `cmd_name`, which can be abbreviated,
+    or None if there's no such command.
+    """
+    node = COMMAND_TRIE.find(cmd_name)
+    if node is not None:
+        return node.key
+
+
+def complete_command(prefix):
+    """Returns the sorted full names of the commands starting with `prefix`.
+    """
+    node = COMMAND_TRIE.find(prefix)
+    if node is None:
+        return []
+    return sorted(node.names)
+
+
+# Compiled invocation regexes by EX_COMMANDS key.
+COMPILED_INVOCATIONS = {}
+
+
+def get_invocations(key):
+    """Returns the invocation regexes of the command `key`, compiling them
+    the first time. Most commands are never used in a session, so there's
+    no point in compiling them all at import time.
+    """
+    try:
+        return COMPILED_INVOCATIONS[key]
+    except KeyError:
+        compiled = tuple(re.compile(p) for p in EX_COMMANDS[key].invocations)
+        COMPILED_INVOCATIONS[key] = compiled
+        return compiled
+
+
+# Parsed commands by command line. Repeating a command line (@:, history,
+# :global) skips parsing altogether.
+PARSED_COMMANDS = cache.LRUCache(max_size=100)
+_NOT_PARSED = object()
 
 
 def parse_command(cmd):
+    """Returns an EX_CMD for the command line `cmd`, or None if there's no
+    such command. The result is shared between calls: its args and
+    line_range are read-only dicts and parse_errors is a tuple.
+    """
+    ex_cmd = PARSED_COMMANDS.get(cmd, _NOT_PARSED)
+    if ex_cmd is _NOT_PARSED:
+        ex_cmd = _parse_command(cmd)
+        PARSED_COMMANDS.set(cmd, ex_cmd)
+    return ex_cmd
+
+
+def command_args(ex_cmd):
+    """Returns the arguments to run the parsed `ex_cmd` with.
+    """
+    # The parsed command is cached and read-only.
+    args = dict(ex_cmd.args)
+    if ex_cmd.can_have_range:
+        args["line_range"] = dict(ex_cmd.line_range)
+    if ex_cmd.forced:
+        args['forced'] = ex_cmd.forced
+    return args
+
+
+def parse_command_line(cmd):
+    """Returns a list of EX_CMDs for the '|'-separated commands in the
+    command line `cmd`. Parsing stops at the first unknown command, which is
+    returned as None.
+    """
+    ex_cmds = [parse_command(cmd)]
+    while ex_cmds[-1] and ex_cmds[-1].next_cmd:
+        ex_cmds.append(parse_command(':' + ex_cmds[-1].next_cmd))
+    return ex_cmds
+
+
+def _parse_command(cmd):
     cmd_name = cmd.strip()
     if len(cmd_name) > 1:
         cmd_name = cmd_name[1:]
@@ -357,14 +481,14 @@ def parse_command(cmd):
     command = r_['commands'][0]['cmd']
     bang = r_['commands'][0]['forced']
     args = r_['commands'][0]['args']
-    cmd_data = find_command(command)
-    if not cmd_data:
+    cmd_key = find_command(command)
+    if not cmd_key:
         return
-    cmd_data = EX_COMMANDS[cmd_data]
+    cmd_data = EX_COMMANDS[cmd_key]
     can_have_range = ex_error.ERR_NO_RANGE_ALLOWED not in cmd_data.error_on
 
     cmd_args = {}
-    for pattern in cmd_data.invocations:
+    for pattern in get_invocations(cmd_key):
         found_args = pattern.search(args)
         if found_args:
             found_args = found_args.groupdict()
@@ -390,7 +514,8 @@ def parse_command(cmd):
     return EX_CMD(name=command,
                     command=cmd_data.command,
                     forced=bang,
-                    args=cmd_args,
-                    parse_errors=parse_errors,
-                    line_range=r_['range'],
-                    can_have_range=can_have_range,)
+                    args=cache.freeze(cmd_args),
+                    parse_errors=tuple(parse_errors),
+                    line_range=cache.freeze(r_['range']),
+                    can_have_range=can_have_range,
+                    next_cmd=parser.next_cmd,)
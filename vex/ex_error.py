@@ -16,6 +16,8 @@ ERR_UNSAVED_CHANGES = 37 # The buffer has been modified but not saved.
 ERR_ADDRESS_REQUIRED = 14 # Command needs an address.
 ERR_OTHER_BUFFER_HAS_CHANGES = 445 # :only, for example, may trigger this
 ERR_CANT_MOVE_LINES_ONTO_THEMSELVES = 134
+ERR_INVALID_ARGUMENT = 474 # Invalid argument.
+ERR_CANT_OPEN_FILE = 484 # Can't open file.
 
 
 ERR_MESSAGES = {
@@ -28,7 +30,9 @@ ERR_MESSAGES = {
     ERR_UNSAVED_CHANGES: 'There are unsaved changes.',
     ERR_ADDRESS_REQUIRED: 'Invalid address.',
     ERR_OTHER_BUFFER_HAS_CHANGES: "Other buffer contains changes.",
-    ERR_CANT_MOVE_LINES_ONTO_THEMSELVES: "Move lines into themselves."
+    ERR_CANT_MOVE_LINES_ONTO_THEMSELVES: "Move lines into themselves.",
+    ERR_INVALID_ARGUMENT: "Invalid argument.",
+    ERR_CANT_OPEN_FILE: "Can't open file.",
 }
 
 
@@ -37,11 +41,11 @@ def get_error_message(error_code):
 
 
 def display_error(error_code, arg='', log=False):
-    err_fmt = "VintageEx: E%d %s"
+    msg = "VintageEx: E%d %s" % (error_code, get_error_message(error_code))
+    # The argument may contain '%', so don't use it as a format string.
     if arg:
-        err_fmt += " (%s)" % arg
-    msg = get_error_message(error_code)
-    sublime.status_message(err_fmt % (error_code, msg))
+        msg += " (%s)" % arg
+    sublime.status_message(msg)
 
 
 def handle_not_implemented():
@@ -0,0 +1,74 @@
+"""line matching for :global
+
+Finds the lines of a block where a pattern matches by running the pattern
+over the whole block once, rather than once per line.
+"""
+
+from bisect import bisect_right
+import re
+
+from vex.ex_substitute import STRING_ANCHORS
+
+
+NEWLINE = re.compile('\n')
+
+
+def line_starts(text):
+    """Returns the offsets at which each line in `text` starts.
+    """
+    starts = [0]
+    starts.extend(m.end() for m in NEWLINE.finditer(text))
+    return starts
+
+
+def matching_lines(pattern, text, invert=False, starts=None):
+    """Yields (begin, end) offsets of the lines in `text` where `pattern`
+    matches, or, if `invert` is true, where it doesn't. The newline
+    character is not included.
+
+    `pattern` must have been compiled with `re.MULTILINE`. A line matches if
+    `pattern` matches the line on its own, as if it were searched for in
+    every line separately. `starts` can be passed in if the line starts for
+    `text` are already known.
+    """
+    if starts is None:
+        starts = line_starts(text)
+    last_line = len(starts) - 1
+
+    def bounds(i):
+        if i < last_line:
+            return starts[i], starts[i + 1] - 1
+        return starts[i], len(text)
+
+    if STRING_ANCHORS.search(pattern.pattern):
+        # \A and \Z only make sense when lines are checked one by one.
+        for i in xrange(last_line + 1):
+            begin, end = bounds(i)
+            if bool(pattern.search(text[begin:end])) != invert:
+                yield begin, end
+        return
+
+    next_line = 0
+    pos = 0
+    while pos <= len(text):
+        match = pattern.search(text, pos)
+        if not match:
+            break
+        i = bisect_right(starts, match.start()) - 1
+        begin, end = bounds(i)
+        # A match running into the next line may hide a shorter one that
+        # stays within the line, so check the line on its own.
+        matched = match.end() <= end or pattern.search(text[begin:end])
+        if invert:
+            for j in xrange(next_line, i):
+                yield bounds(j)
+            if not matched:
+                yield begin, end
+        elif matched:
+            yield begin, end
+        next_line = i + 1
+        pos = end + 1
+
+    if invert:
+        for j in xrange(next_line, last_line + 1):
+            yield bounds(j)
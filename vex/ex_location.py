@@ -1,48 +1,57 @@
 import sublime
 
+import re
+
+from vex import cache
+from vex import ex_search
+from vex import line_index
 from ex_range import calculate_relative_ref
 
+def get_line_index(view):
+    """Return the `LineIndex` for `view`'s buffer, building it if the buffer
+    has changed since it was last built.
+    """
+    read = lambda: view.substr(sublime.Region(0, view.size()))
+    return line_index.get_index(view.buffer_id(), view.change_count(), read)
+
+
 def get_line_nr(view, point):
     """Return 1-based line number for `point`.
     """
-    return view.rowcol(point)[0] + 1
+    return get_line_index(view).row(point) + 1
 
 
 # TODO: Move this to sublime_lib; make it accept a point or a region.
 def find_eol(view, point):
-    return view.line(point).end()
+    index = get_line_index(view)
+    return index.line(index.row(point))[1]
 
 
 # TODO: Move this to sublime_lib; make it accept a point or a region.
 def find_bol(view, point):
-    return view.line(point).begin()
+    index = get_line_index(view)
+    return index.line(index.row(point))[0]
 
 
 # TODO: make this return None for failures.
 def find_line(view, start=0, end=-1, target=0):
-    """Do binary search to find :target: line number.
+    """Find line number `target` between `start` and `end`.
 
     Return: If `target` is found, `Region` comprising entire line no. `target`.
             If `target`is not found, `-1`.
     """
-
+    index = get_line_index(view)
     # Don't bother if sought line is beyond buffer boundaries.
-    if  target < 0 or target > view.rowcol(view.size())[0] + 1:
+    if not 0 < target <= len(index):
         return -1
 
     if end == -1:
         end = view.size()
 
-    lo, hi = start, end
-    while lo <= hi:
-        middle = lo + (hi - lo) / 2
-        if get_line_nr(view, middle) < target:
-            lo = find_eol(view, middle) + 1
-        elif get_line_nr(view, middle) > target:
-            hi = find_bol(view, middle) - 1
-        else:
-            return view.full_line(middle)
-    return -1
+    begin, eol = index.line(target - 1)
+    if eol < start or begin > end:
+        return -1
+    return sublime.Region(*index.full_line(target - 1))
 
 
 def search_in_range(view, what, start, end, flags=0):
@@ -54,56 +63,92 @@ def search_in_range(view, what, start, end, flags=0):
 def find_last_match(view, what, start, end, flags=0):
     """Find last occurrence of `what` between `start`, `end`.
     """
-    match = view.find(what, start, flags)
-    new_match = None
-    while match:
-        new_match = view.find(what, match.end(), flags)
-        if new_match and new_match.end() <= end:
-            match = new_match
-        else:
-            return match
+    return search_backwards(view, what, start, end, flags)
+
+
+def search_backwards(view, what, start=0, end=-1, flags=0):
+    """Return the region of the last match of `what` between `start` and
+    `end`, or None if there isn't any.
+    """
+    if end == -1:
+        end = view.size()
+    try:
+        pattern = cache.compile_pattern(what, flags, cache.SUBLIME)
+    except re.error:
+        return find_last_with_view(view, what, start, end, flags)
+    match = ex_search.last_match(pattern,
+                                 lambda a, b: view.substr(sublime.Region(a, b)),
+                                 start, end)
+    if match:
+        return sublime.Region(*match)
+
+
+def find_last_with_view(view, what, start, end, flags=0):
+    """Return the region of the last match of `what` between `start` and
+    `end` as found by Sublime Text's regex engine, or None. For patterns
+    Python's engine rejects; slower, as it finds all matches in the buffer.
+    """
+    last = None
+    for match in view.find_all(what, flags):
+        if match.end() > end:
+            break
+        if match.begin() >= start:
+            last = match
+    return last
+
+
+def get_match_index(view, what, flags=0, on_ready=None):
+    """Return the `MatchIndex` of `what` in `view`, or None if it isn't
+    built yet. In that case, it's built in the background and `on_ready`
+    is called without arguments once it's available.
+    """
+    key = (view.buffer_id(), what, flags)
+    version = view.change_count()
+    cached = ex_search.MATCH_INDEXES.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    pattern = cache.compile_pattern(what, flags, cache.SUBLIME)
+    ex_search.MATCH_INDEXES.set(key, (version, None))
+
+    def store(index):
+        # A newer build may have been started while this one was running.
+        if ex_search.MATCH_INDEXES.get(key) == (version, None):
+            ex_search.MATCH_INDEXES.set(key, (version, index))
+            if on_ready:
+                on_ready()
+
+    # Hand the index back to the main thread before touching the cache.
+    done = lambda index: sublime.set_timeout(lambda: store(index), 0)
+    text = view.substr(sublime.Region(0, view.size()))
+    ex_search.build_match_index(pattern, text, done)
 
 
 def reverse_search(view, what, start=0, end=-1, flags=0):
-    """Do binary search to find `what` walking backwards in the buffer.
+    """Return the line number of the last match of `what` between `start`
+    and the end of the line containing `end`, scanning backwards in chunks.
+    If there's no match, return the current line number.
     """
     if end == -1:
         end = view.size()
-    end = find_eol(view, view.line(end).a)
-    
-    last_match = None
-
-    lo, hi = start, end
-    while True:
-        middle = (lo + hi) / 2    
-        line = view.line(middle)
-        middle, eol = find_bol(view, line.a), find_eol(view, line.a)
-
-        if search_in_range(view, what, middle, hi, flags):
-            lo = middle
-        elif search_in_range(view, what, lo, middle - 1, flags):
-            hi = middle -1
-        else:
-            return calculate_relative_ref(view, '.')
-
-        # Don't search forever the same line.
-        if last_match and line.contains(last_match):
-            match = find_last_match(view, what, lo, hi, flags=flags)
-            return view.rowcol(match.begin())[0] + 1
-        
-        last_match = sublime.Region(line.begin(), line.end())    
+    end = find_eol(view, end)
+
+    match = search_backwards(view, what, start, end, flags)
+    if not match:
+        return calculate_relative_ref(view, '.')
+    return get_line_nr(view, match.begin())
 
 
 def search(view, what, start_line=None, flags=0):
     # TODO: don't make start_line default to the first sel's begin(). It's
     # confusing. ???
     if start_line:
-        start = view.text_point(start_line, 0)
+        start = get_line_index(view).point(start_line)
     else:
         start = view.sel()[0].begin()
     reg = view.find(what, start, flags)
     if not reg is None:
-        row = (view.rowcol(reg.begin())[0] + 1)
+        row = get_line_nr(view, reg.begin())
     else:
         row = calculate_relative_ref(view, '.', start_line=start_line)
     return row
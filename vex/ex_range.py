@@ -4,6 +4,8 @@
 from collections import namedtuple
 import sublime
 
+from vex import profiling
+
 
 class VimRange(object):
     """Encapsulates calculation of view regions based on supplied raw range info.
@@ -18,13 +20,13 @@ class VimRange(object):
         Returned blocks don't end in a newline char.
         """
         regions, visual_regions = new_calculate_range(self.view, self.range_info)
+        index = ex_location.get_line_index(self.view)
         blocks = []
         for a, b in regions:
-            r = sublime.Region(self.view.text_point(a - 1, 0),
-                               self.view.line(self.view.text_point(b - 1, 0)).end())
-            if self.view.substr(r)[-1] == "\n":
-                if r.begin() != r.end():
-                    r = sublime.Region(r.begin(), r.end() - 1)
+            r = sublime.Region(index.point(a - 1),
+                               index.line(b - 1)[1])
+            if not r.empty() and self.view.substr(r.end() - 1) == "\n":
+                r = sublime.Region(r.begin(), r.end() - 1)
             blocks.append(r)
         return blocks
 
@@ -42,12 +44,13 @@ EX_RANGE = namedtuple('ex_range', 'left left_offset separator right right_offset
 
 
 def calculate_relative_ref(view, where, start_line=None):
+    index = ex_location.get_line_index(view)
     if where == '$':
-        return view.rowcol(view.size())[0] + 1
+        return len(index)
     if where == '.':
         if start_line:
-            return view.rowcol(view.text_point(start_line, 0))[0] + 1
-        return view.rowcol(view.sel()[0].begin())[0] + 1
+            return index.row(index.point(start_line)) + 1
+        return index.row(view.sel()[0].begin()) + 1
 
 
 def new_calculate_search_offsets(view, searches, start_line):
@@ -56,7 +59,8 @@ def new_calculate_search_offsets(view, searches, start_line):
         if search[0] == '/':
             last_line = ex_location.search(view, search[1], start_line=last_line)
         elif search[0] == '?':
-            end = view.line(view.text_point(start_line, 0)).end()
+            index = ex_location.get_line_index(view)
+            end = index.line(start_line)[1]
             last_line = ex_location.reverse_search(view, search[1], end=end)
         last_line += search[2]
     return last_line
@@ -75,11 +79,12 @@ def calculate_address(view, a):
 
     a, _ =  new_calculate_range(view, fake_range)[0][0] or -1
     # FIXME: 0 should be a valid address?
-    if not (0 < a <= view.rowcol(view.size())[0] + 1):
+    if not (0 < a <= len(ex_location.get_line_index(view))):
         return None
     return a - 1
 
 
+@profiling.timed('range')
 def new_calculate_range(view, r):
     """Calculates line-based ranges (begin_row, end_row) and returns
     a tuple: a list of ranges and a boolean indicating whether the ranges
@@ -90,10 +95,11 @@ def new_calculate_range(view, r):
     # with Vim to see whether '<;>' is allowed.
     # '<,>' returns all selected line blocks
     if r['left_ref'] == "'<" and r['right_ref'] == "'>":
+        index = ex_location.get_line_index(view)
         all_line_blocks = []
         for sel in view.sel():
-            start = view.rowcol(sel.begin())[0] + 1
-            end = view.rowcol(sel.end())[0] + 1
+            start = index.row(sel.begin()) + 1
+            end = index.row(sel.end()) + 1
             if view.substr(sel.end() - 1) == '\n':
                 end -= 1
             all_line_blocks.append((start, end))
@@ -103,17 +109,16 @@ def new_calculate_range(view, r):
     if r['left_ref'] and (r['left_ref'].startswith("'") or (r['right_ref'] and r['right_ref'].startswith("'"))):
         return []
 
-    # todo: don't mess up with the received ranged. Also, % has some strange
-    # behaviors that should be easy to replicate.
-    if r['left_ref'] == '%' or r['right_ref'] == '%':
-        r['left_offset'] = 1
-        r['right_ref'] = '$'
+    # todo: % has some strange behaviors that should be easy to replicate.
+    lr, loffset = r['left_ref'], r['left_offset']
+    rr = r['right_ref']
+    if lr == '%' or rr == '%':
+        loffset = 1
+        rr = '$'
 
     current_line = None
-    lr = r['left_ref']
     if lr is not None:
         current_line = calculate_relative_ref(view, lr) 
-    loffset = r['left_offset']
     if loffset:
         current_line = current_line or 0
         current_line += loffset
@@ -124,7 +129,6 @@ def new_calculate_range(view, r):
     left = current_line
 
     current_line = None
-    rr = r['right_ref']
     if rr is not None:
         current_line = calculate_relative_ref(view, rr) 
     roffset = r['right_offset']
@@ -148,4 +152,4 @@ def new_calculate_range(view, r):
     return [(left, right)], False
 
 # Avoid circular import.
-from vex import ex_location
+import ex_location
@@ -0,0 +1,86 @@
+"""backward search
+
+Finds the last match of a pattern before a point by running the pattern over
+chunks of text, starting at the point and walking toward the start of the
+buffer. Chunks start small, since matches are often close by, and double in
+size up to CHUNK_SIZE. Each chunk is read only once.
+
+Also keeps the positions of all the matches of a pattern, so that searches
+can tell which match they landed on out of how many.
+"""
+
+from bisect import bisect_right
+import threading
+
+from vex.cache import LRUCache
+
+
+FIRST_CHUNK_SIZE = 1024
+CHUNK_SIZE = 64 * 1024
+# How far a match may run past the end of its chunk and still be found.
+OVERLAP = 4 * 1024
+# Text read before each chunk so that anchors and lookbehinds still work.
+CONTEXT = 256
+
+
+def last_match(pattern, read, start, end, chunk_size=CHUNK_SIZE,
+               overlap=OVERLAP):
+    """Returns (begin, end) of the last match of `pattern` that begins at or
+    after `start` and ends at or before `end`, or None if there isn't any.
+
+    `read(a, b)` must return the text between offsets `a` and `b`, clamping
+    `b` to the size of the buffer.
+    """
+    hi = end + 1
+    size = min(FIRST_CHUNK_SIZE, chunk_size)
+    while True:
+        lo = max(start, hi - size)
+        window_begin = max(0, lo - CONTEXT)
+        window_end = min(end, hi + overlap)
+        # Read one more character, so that $ doesn't match where the window
+        # happens to end.
+        text = read(window_begin, window_end + 1)
+
+        found = None
+        for m in pattern.finditer(text, lo - window_begin):
+            if m.start() >= hi - window_begin:
+                break
+            if m.end() <= window_end - window_begin:
+                found = m
+        if found:
+            return (window_begin + found.start(), window_begin + found.end())
+        if lo <= start:
+            return None
+        hi = lo
+        size = min(size * 2, chunk_size)
+
+
+class MatchIndex(object):
+    """Offsets where the matches of a pattern in a text begin.
+    """
+    def __init__(self, pattern, text):
+        self.starts = [m.start() for m in pattern.finditer(text)]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def ordinal(self, point):
+        """Returns the 1-based number of the match beginning at `point`, or
+        of the last match before it.
+        """
+        return bisect_right(self.starts, point)
+
+
+# Maps keys chosen by the caller to (version, MatchIndex) pairs. The index is
+# None while it's being built.
+MATCH_INDEXES = LRUCache(max_size=8)
+
+
+def build_match_index(pattern, text, callback):
+    """Builds a MatchIndex in a background thread and passes it to
+    `callback`, which runs in that thread. Returns the thread.
+    """
+    thread = threading.Thread(target=lambda: callback(MatchIndex(pattern, text)))
+    thread.daemon = True
+    thread.start()
+    return thread
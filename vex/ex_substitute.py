@@ -0,0 +1,145 @@
+"""bulk substitution engine used by :substitute
+
+The engine works on plain strings so that a whole block of lines can be
+processed with a single read from the view and a handful of writes back.
+"""
+
+import re
+
+
+# Anchors that mean something different for a line than for a block of lines.
+# Patterns using them are checked line by line.
+STRING_ANCHORS = re.compile(r'(?<!\\)(?:\\\\)*\\[AZ]')
+
+# Vim's \_. matches any character, newlines included.
+ANY_CHARACTER = re.compile(r'(?<!\\)((?:\\\\)*)\\_\.')
+# Patterns that can match a newline, which opt in to substituting over whole
+# blocks instead of line by line.
+NEWLINES = re.compile(r'(?<!\\)(?:\\\\)*(?:\\n|\\_\.)|\n')
+
+
+def _line_bounds(text, point):
+    """Returns the (begin, end) offsets of the line containing `point`. The
+    newline character is not included.
+    """
+    begin = text.rfind('\n', 0, point) + 1
+    end = text.find('\n', point)
+    if end == -1:
+        end = len(text)
+    return begin, end
+
+
+def _candidate_lines(pattern, text):
+    """Yields (begin, end) offsets of every line in `text` where `pattern`
+    may match.
+    """
+    if STRING_ANCHORS.search(pattern.pattern):
+        pos = 0
+        while pos <= len(text):
+            begin, end = _line_bounds(text, pos)
+            yield begin, end
+            pos = end + 1
+        return
+
+    pos = 0
+    while pos <= len(text):
+        match = pattern.search(text, pos)
+        if not match:
+            return
+        begin, end = _line_bounds(text, match.start())
+        yield begin, end
+        pos = end + 1
+
+
+def substitute_lines(pattern, replacement, text, count=0):
+    """Substitutes `pattern` by `replacement` in every line of `text`.
+
+    Each line is passed to `pattern.subn` on its own, so anchors and `count`
+    behave exactly as they would for a single line. `pattern` must have been
+    compiled with `re.MULTILINE`, so that lines without a match can be skipped
+    with a single scan of `text`.
+
+    Returns a tuple (changes, matches, lines_changed). `changes` is a list of
+    (begin, end, new_text) in ascending order; runs of consecutive changed
+    lines are merged into one change.
+    """
+    changes = []
+    matches = 0
+    lines_changed = 0
+    for begin, end in _candidate_lines(pattern, text):
+        old_line = text[begin:end]
+        new_line, n = pattern.subn(replacement, old_line, count)
+        matches += n
+        if not n or new_line == old_line:
+            continue
+        lines_changed += 1
+        if changes and changes[-1][1] + 1 == begin:
+            # Consecutive lines: keep the newline between them.
+            changes[-1][1] = end
+            changes[-1][2].append(new_line)
+        else:
+            changes.append([begin, end, [new_line]])
+
+    return ([(b, e, '\n'.join(t)) for (b, e, t) in changes],
+            matches, lines_changed)
+
+
+def spans_lines(pattern):
+    """Returns True if the :substitute pattern `pattern` can match across
+    lines, that is, if it contains \\n or \\_.
+    """
+    return bool(NEWLINES.search(pattern))
+
+
+def translate(pattern):
+    """Rewrites the Vim-only parts of `pattern` that the re module has no
+    syntax for.
+    """
+    return ANY_CHARACTER.sub(r'\1[\\s\\S]', pattern)
+
+
+def substitute_block(pattern, replacement, text, count=0, last=None):
+    """Substitutes `pattern` by `replacement` in `text` as a whole, so that
+    matches can run across lines. As in Vim, `count` limits the matches
+    starting on each line, not in all of `text`. If `last` is given, matches
+    beginning after that offset are left alone, although earlier ones may
+    run past it.
+
+    Returns a tuple (changes, matches, lines_changed), like
+    `substitute_lines` does. Changes less than a line apart are merged.
+    """
+    changes = []
+    matches = 0
+    lines_changed = 0
+    line_end = -1
+    on_line = 0
+    line_changed = False
+    for m in pattern.finditer(text):
+        if last is not None and m.start() > last:
+            break
+        if m.start() > line_end:
+            line_end = text.find('\n', m.start())
+            if line_end == -1:
+                line_end = len(text)
+            on_line = 0
+            line_changed = False
+        if count and on_line >= count:
+            continue
+        on_line += 1
+        matches += 1
+
+        new_text = m.expand(replacement)
+        if new_text == m.group(0):
+            continue
+        if not line_changed:
+            line_changed = True
+            lines_changed += 1
+        if changes and text.count('\n', changes[-1][1], m.start()) <= 1:
+            gap = text[changes[-1][1]:m.start()]
+            changes[-1][1] = m.end()
+            changes[-1][2].extend((gap, new_text))
+        else:
+            changes.append([m.start(), m.end(), [new_text]])
+
+    return ([(b, e, ''.join(t)) for (b, e, t) in changes],
+            matches, lines_changed)
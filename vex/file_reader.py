@@ -0,0 +1,104 @@
+"""Reading files into views: :r {file}
+
+Files are read and decoded a chunk at a time, so that the only whole copy
+of their text is the one in the view. Large files are memory-mapped rather
+than read, which leaves caching their bytes to the OS.
+"""
+
+import codecs
+import mmap
+import os
+
+from vex.encoding import python_codec
+
+
+# Bytes read, and so roughly characters inserted, at a time.
+CHUNK_SIZE = 1 << 20
+# Files this size or larger are memory-mapped.
+MMAP_THRESHOLD = 4 << 20
+
+
+def parse_plusplus_args(args):
+    """Returns the ++opt=val arguments in `args` as a dict. ++opt alone
+    maps to True; ++enc is the same as ++encoding.
+    """
+    options = {}
+    for arg in args.split():
+        name, sep, value = arg.lstrip('+').partition('=')
+        if name == 'enc':
+            name = 'encoding'
+        options[name] = value if sep else True
+    return options
+
+
+def resolve_path(name, view_file_name=None):
+    """Returns the path of the file `name`, relative to the directory of the
+    view's file if it has one.
+    """
+    path = os.path.expanduser(name)
+    if not os.path.isabs(path) and view_file_name:
+        path = os.path.join(os.path.dirname(view_file_name), path)
+    return path
+
+
+def read_chunks(f, size=CHUNK_SIZE, mmap_threshold=MMAP_THRESHOLD):
+    """Yields the bytes of the open file `f`, `size` bytes at a time.
+    """
+    length = os.fstat(f.fileno()).st_size
+    if length < mmap_threshold:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for start in xrange(0, len(mapped), size):
+            yield mapped[start:start + size]
+    finally:
+        mapped.close()
+
+
+def decode_chunks(chunks, encoding):
+    """Yields the text of the byte `chunks`, decoded as `encoding`, with
+    Windows line endings turned into newlines. A '\\r' at the end of a chunk
+    is held back in case the next one starts with '\\n'.
+    """
+    # Like Vim, leave a UTF-8 byte order mark out of the text.
+    if encoding == 'utf-8':
+        encoding = 'utf-8-sig'
+    decoder = codecs.getincrementaldecoder(encoding)('replace')
+    held = u''
+    for chunk in chunks:
+        text = held + decoder.decode(chunk)
+        held = u''
+        if text.endswith(u'\r'):
+            text, held = text[:-1], u'\r'
+        if text:
+            yield text.replace(u'\r\n', u'\n')
+    text = held + decoder.decode('', True)
+    if text:
+        yield text.replace(u'\r\n', u'\n')
+
+
+def file_text(path, view_encoding, plusplus_args=''):
+    """Returns an iterator over the text of the file at `path`, in chunks,
+    decoded as the ++enc in `plusplus_args` says, or else as the view is.
+    Raises LookupError for unknown encodings and IOError if the file can't
+    be opened.
+    """
+    name = parse_plusplus_args(plusplus_args).get('encoding')
+    if name in (None, True):
+        encoding = python_codec(view_encoding)
+    else:
+        encoding = codecs.lookup(name).name
+    f = open(path, 'rb')
+    return _closing(f, decode_chunks(read_chunks(f), encoding))
+
+
+def _closing(f, chunks):
+    try:
+        for text in chunks:
+            yield text
+    finally:
+        f.close()
@@ -0,0 +1,68 @@
+"""line index
+
+Converts between points and rows by bisecting the offsets where each line
+starts. The index for a buffer is built with a single scan and reused until
+the buffer changes.
+"""
+
+from bisect import bisect_right
+
+from vex.cache import LRUCache
+from vex.ex_global import line_starts
+
+
+class LineIndex(object):
+    """Line starts of a text. Rows are 0-based, like view.rowcol's.
+    """
+    def __init__(self, text):
+        self.size = len(text)
+        self.starts = line_starts(text)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def row(self, point):
+        """Returns the row containing `point`.
+        """
+        return bisect_right(self.starts, min(max(point, 0), self.size)) - 1
+
+    def point(self, row):
+        """Returns the point where `row` starts. Like view.text_point, rows
+        past the end of the text map to its end.
+        """
+        if row < 0:
+            return 0
+        if row >= len(self.starts):
+            return self.size
+        return self.starts[row]
+
+    def line(self, row):
+        """Returns (begin, end) of `row`, without the newline character.
+        """
+        row = min(max(row, 0), len(self.starts) - 1)
+        begin = self.starts[row]
+        if row + 1 < len(self.starts):
+            return begin, self.starts[row + 1] - 1
+        return begin, self.size
+
+    def full_line(self, row):
+        """Returns (begin, end) of `row`, including the newline character.
+        """
+        begin, end = self.line(row)
+        return begin, min(end + 1, self.size)
+
+
+INDEXES = LRUCache(max_size=8)
+
+
+def get_index(key, version, read):
+    """Returns the LineIndex for the buffer identified by `key`. It's built
+    from `read()` unless an index for the same `version` of the buffer is
+    already cached.
+    """
+    cached = INDEXES.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    index = LineIndex(read())
+    INDEXES.set(key, (version, index))
+    return index
@@ -59,7 +59,7 @@ class VimParser(ParserBase):
             self.current_side = 'right'
             self.parse_range()
 
-        if self.c != EOF and not (self.c.isalpha() or self.c in '&!'):
+        if self.c != EOF and not (self.c.isalpha() or self.c in '&!|'):
             raise SyntaxError("E492 Not an editor command.")
 
         return self.result
@@ -89,7 +89,7 @@ class VimParser(ParserBase):
                 search_offests = self.match_search_based_offsets()
                 self.result[self.current_side + "_search_offsets"] = search_offests
                 self.state = VimParser.STATE_NEUTRAL
-            elif self.c not in ':,;&!' and not self.c.isalpha():
+            elif self.c not in ':,;&!|' and not self.c.isalpha():
                 raise SyntaxError("E492 Not an editor command.")
             else:
                 break
@@ -182,11 +182,23 @@ class VimParser(ParserBase):
         return rv
 
 
+# Commands that see '|' as part of their argument, as (name, abbreviation).
+BAR_IN_ARGS = (('global', 'g'), ('vglobal', 'v'), ('normal', 'norm'))
+# Commands that see '|' as part of their argument when it starts with '!'.
+BAR_IN_FILTER_ARGS = (('read', 'r'), ('write', 'w'))
+
+
+def is_abbreviation(name, full_name, shortest):
+    return len(name) >= len(shortest) and full_name.startswith(name)
+
+
 class CommandLineParser(ParserBase):
     def __init__(self, source, *args, **kwargs):
         ParserBase.__init__(self, source, *args, **kwargs)     
         self.range_parser = VimParser(source)
         self.result = dict(range=None, commands=[], errors=[])
+        # Source of the command following a '|', if any.
+        self.next_cmd = None
 
     def parse_cmd_line(self):
         try:
@@ -234,9 +246,55 @@ class CommandLineParser(ParserBase):
             self.consume()
         cmd['args'] = ''
         if not self.c == EOF:
-            cmd['args'] = self.source[self.n:]
+            cmd['args'] = self.match_args(name)
         self.result['commands'].append(cmd)
 
+    def match_args(self, name):
+        """Returns the arguments of the command `name`, which end at the
+        first unescaped '|'. The text after the '|' is kept in next_cmd.
+        """
+        args = self.source[self.n:]
+        if (name == '!' or
+            any(is_abbreviation(name, *cmd) for cmd in BAR_IN_ARGS) or
+            (args.startswith('!') and
+             any(is_abbreviation(name, *cmd) for cmd in BAR_IN_FILTER_ARGS))):
+                return args
+
+        start = 0
+        if (args and name and 'substitute'.startswith(name) and
+            not (args[0].isalnum() or args[0] in ' "|')):
+                start = skip_delimited(args, 0, 2)
+
+        buf = [args[:start]]
+        i = start
+        while i < len(args):
+            if args[i] == '\\' and args[i + 1:i + 2] == '|':
+                # An escaped bar is part of the arguments; drop the \.
+                buf.append('|')
+                i += 2
+            elif args[i] == '|':
+                self.next_cmd = args[i + 1:].lstrip(' \t:') or None
+                return ''.join(buf).rstrip(' \t')
+            else:
+                buf.append(args[i])
+                i += 1
+        return ''.join(buf)
+
+
+def skip_delimited(text, start, count):
+    """Returns the index after `count` fields delimited by text[start], like
+    the pattern and replacement in /foo/bar/. Delimiters can be escaped.
+    """
+    delimiter = text[start]
+    i = start + 1
+    while count and i < len(text):
+        if text[i] == '\\':
+            i += 1
+        elif text[i] == delimiter:
+            count -= 1
+        i += 1
+    return min(i, len(text))
+
 
 class AddressParser(ParserBase):
     STATE_NEUTRAL = 1
@@ -16,23 +16,23 @@ class GlobalLexer(Lexer):
 
     def _match_pattern(self):
         buf = []
-        while self.c != EOF and self.c != self.delimiter:
+        while True:
+            # Take everything up to the next escape or delimiter in one go.
+            buf.append(self.scan_until('\\' + self.delimiter))
+            if self.c == EOF or self.c == self.delimiter:
+                break
+            # We're at a \.
+            self.consume()
             if self.c == '\\':
+                # Store a single \, we're escaping \.
                 buf.append(self.c)
                 self.consume()
-                if self.c in '\\':
-                    # Don't store anything, we're escaping \.
-                    self.consume()
-                elif self.c == self.delimiter:
-                    # Overwrite the \ we've just stored.
-                    buf[-1] = self.delimiter
-                    self.consume()
-
-                if self.c == EOF:
-                    break
-            else:
-                buf.append(self.c)
+            elif self.c == self.delimiter:
+                # Drop the \ that escapes the delimiter.
+                buf.append(self.delimiter)
                 self.consume()
+            else:
+                buf.append('\\')
 
         return ''.join(buf)
 
@@ -50,7 +50,7 @@ class GlobalLexer(Lexer):
         return buf
 
     def _do_parse(self):
-        if not self.c in self.DELIMITER:
+        if self.c == EOF or not self.c in self.DELIMITER:
             raise SyntaxError("expected delimiter, got '%s'" % self.c)
         return self._parse_long()
 
@@ -2,6 +2,9 @@ import re
 
 EOF = -1
 
+# Compiled regexes used by Lexer.scan_until, by stop characters.
+_RUNS = {}
+
 class Lexer(object):
     def __init__(self):
         self.c = None # current character
@@ -20,6 +23,34 @@ class Lexer(object):
         else:
             self.c = self.string[self.cursor]
 
+    # Scanner mode: instead of consuming one character at a time, match a
+    # compiled regex at the cursor and jump past the whole match.
+
+    def seek(self, cursor):
+        self.cursor = cursor
+        if cursor >= len(self.string):
+            self.c = EOF
+        else:
+            self.c = self.string[cursor]
+
+    def scan(self, regex):
+        """Consumes the text matched by `regex` at the cursor and returns it.
+        `regex` must be able to match the empty string.
+        """
+        match = regex.match(self.string, self.cursor)
+        self.seek(match.end())
+        return match.group(0)
+
+    def scan_until(self, chars):
+        """Consumes characters up to the first one in `chars`, or up to EOF,
+        and returns them.
+        """
+        try:
+            regex = _RUNS[chars]
+        except KeyError:
+            regex = _RUNS[chars] = re.compile('[^%s]*' % re.escape(chars))
+        return self.scan(regex)
+
     def _do_parse(self):
         pass
 
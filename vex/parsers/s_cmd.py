@@ -1,3 +1,5 @@
+import re
+
 from vex.parsers.parsing import RegexToken
 from vex.parsers.parsing import Lexer
 from vex.parsers.parsing import EOF
@@ -5,50 +7,45 @@ from vex.parsers.parsing import EOF
 
 class SubstituteLexer(Lexer):
     DELIMITER = RegexToken(r'[^a-zA-Z0-9 ]')
-    WHITE_SPACE = ' \t'
+    WHITE_SPACE = re.compile(r'[ \t]*')
+    COUNT = re.compile(r'\d*', re.UNICODE)
+    FLAGS = re.compile(r'[giI]*')
     FLAG = 'giI'
 
     def __init__(self):
         self.delimiter = None
 
     def _match_white_space(self):
-        while self.c != EOF and self.c in self.WHITE_SPACE:
-            self.consume()
+        self.scan(self.WHITE_SPACE)
 
     def _match_count(self):
-        buf = []
-        while self.c != EOF and self.c.isdigit():
-            buf.append(self.c)
-            self.consume()
-        return ''.join(buf)
+        return self.scan(self.COUNT)
 
     def _match_flags(self):
-        buf = []
-        while self.c != EOF and self.c in self.FLAG:
-            if self.c in self.FLAG:
-                buf.append(self.c)
-            self.consume()
-        return ''.join(buf)
+        return self.scan(self.FLAGS)
 
     def _match_pattern(self):
         buf = []
-        while self.c != EOF and self.c != self.delimiter:
-            if self.c == '\\':
-                buf.append(self.c)
+        while True:
+            # Take everything up to the next escape or delimiter in one go.
+            buf.append(self.scan_until('\\' + self.delimiter))
+            if self.c == EOF or self.c == self.delimiter:
+                break
+            # We're at a \.
+            self.consume()
+            if self.c == self.delimiter:
+                # Drop the \ that escapes the delimiter.
+                buf.append(self.delimiter)
                 self.consume()
-                if self.c == self.delimiter:
-                    # Overwrite the \ we've just stored.
-                    buf[-1] = self.delimiter
-                    self.consume()
-                if self.c in '\\':
-                    buf.append(self.c) # BUGFIXED: still need to escape \ in python regex!
+                if self.c == '\\':
+                    buf.append(self.c)
                     self.consume()
-
-                if self.c == EOF:
-                    break
-            else:
-                buf.append(self.c)
+            elif self.c == '\\':
+                # Still need to escape \ in python regex!
+                buf.append('\\\\')
                 self.consume()
+            else:
+                buf.append('\\')
 
         return ''.join(buf)
 
@@ -600,6 +600,40 @@ class TestCaseCommandLineParser(unittest.TestCase):
             )
         self.assertEqual(rv, expected)
 
+    def testStopsArgsAtBar(self):
+        parser = cmd_line.CommandLineParser('foo bar | 10baz')
+        rv = parser.parse_cmd_line()
+        self.assertEqual(rv['commands'], [{"cmd":"foo", "args":"bar", "forced": False}])
+        self.assertEqual(parser.next_cmd, '10baz')
+
+    def testKeepsEscapedBarInArgs(self):
+        parser = cmd_line.CommandLineParser(r'foo a\|b')
+        rv = parser.parse_cmd_line()
+        self.assertEqual(rv['commands'][0]['args'], 'a|b')
+        self.assertEqual(parser.next_cmd, None)
+
+    def testCanParseRangeFollowedByBar(self):
+        parser = cmd_line.CommandLineParser('10|foo')
+        rv = parser.parse_cmd_line()
+        self.assertEqual(rv['commands'][0]['cmd'], ':')
+        self.assertEqual(parser.next_cmd, 'foo')
+
+    def testSubstituteSkipsBarsInPatternAndReplacement(self):
+        parser = cmd_line.CommandLineParser('s/a|b/c|d/g | foo')
+        rv = parser.parse_cmd_line()
+        self.assertEqual(rv['commands'][0]['args'], '/a|b/c|d/g')
+        self.assertEqual(parser.next_cmd, 'foo')
+
+    def testGlobalAndFiltersKeepBarsInArgs(self):
+        for source, args in (('g/a/s/b/c/ | foo', '/a/s/b/c/ | foo'),
+                             ('.!sort | uniq', 'sort | uniq'),
+                             ('r !ls | wc', '!ls | wc'),
+                             ('w !wc | foo', '!wc | foo')):
+            parser = cmd_line.CommandLineParser(source)
+            rv = parser.parse_cmd_line()
+            self.assertEqual(rv['commands'][0]['args'], args)
+            self.assertEqual(parser.next_cmd, None)
+
 
 class TestAddressParser(unittest.TestCase):
     def testCanParseSymbolAddress_1(self):
@@ -0,0 +1,170 @@
+"""per-command timing
+
+Every ex command run from the command line is timed in three phases:
+parsing its command line, calculating its ranges and running the rest of
+it. The most recent timings for each command are kept in ring buffers, so
+that :exprofile can show percentiles for them at any time.
+
+:exprofile can also capture the next few commands with cProfile and dump
+the stats to a file.
+"""
+
+import math
+import time
+
+
+PHASES = ('parse', 'range', 'run')
+# Timings kept per command and phase.
+MAX_SAMPLES = 200
+
+
+class RingBuffer(object):
+    """Keeps the last `size` values appended to it.
+    """
+    def __init__(self, size=MAX_SAMPLES):
+        self.size = size
+        self.values = []
+        self.next = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            self.values[self.next] = value
+        self.next = (self.next + 1) % self.size
+
+    def percentile(self, p):
+        """Returns the value below which `p` percent of the values fall, by
+        nearest rank.
+        """
+        values = sorted(self.values)
+        rank = int(math.ceil(p / 100.0 * len(values)))
+        return values[min(max(rank, 1), len(values)) - 1]
+
+
+# {command name: {phase: RingBuffer}}
+TIMINGS = {}
+
+
+class Invocation(object):
+    """Times spent in each phase by one run of a command.
+    """
+    def __init__(self, name, parse_time=0):
+        self.name = name
+        self.started = time.time()
+        self.times = dict((phase, 0.0) for phase in PHASES)
+        self.times['parse'] = parse_time
+        self.captured = False
+        self.previous = None
+
+    def add(self, phase, seconds):
+        self.times[phase] += seconds
+
+
+_current = None
+
+
+def start(name, parse_time=0):
+    """Starts timing a run of the command `name`. Returns an Invocation to
+    be passed to `finish`.
+    """
+    global _current
+    invocation = Invocation(name, parse_time)
+    invocation.previous = _current
+    _current = invocation
+    return invocation
+
+
+def finish(invocation):
+    """Stops timing `invocation` and records its timings. Returns the name of
+    the file written if this was the last command of a cProfile capture.
+    """
+    global _current
+    _current = invocation.previous
+    elapsed = time.time() - invocation.started
+    invocation.times['run'] = max(elapsed - invocation.times['range'], 0)
+    phases = TIMINGS.setdefault(invocation.name, {})
+    for phase in PHASES:
+        phases.setdefault(phase, RingBuffer()).append(invocation.times[phase])
+    if invocation.captured:
+        return _count_captured()
+
+
+def timed(phase):
+    """Decorator that adds the time spent in the decorated function to
+    `phase` of the command running, if any.
+    """
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            if _current is None:
+                return func(*args, **kwargs)
+            invocation = _current
+            started = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                invocation.add(phase, time.time() - started)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
+
+
+def report():
+    """Returns p50, p95 and max timings for every command and phase as lines
+    of text.
+    """
+    if not TIMINGS:
+        return ["No commands timed yet."]
+    lines = ["%-24s %-6s %5s %10s %10s %10s" % ('command', 'phase', 'runs',
+                                                'p50', 'p95', 'max')]
+    for name in sorted(TIMINGS):
+        for phase in PHASES:
+            samples = TIMINGS[name][phase]
+            lines.append("%-24s %-6s %5d %8.2fms %8.2fms %8.2fms" % (
+                            name, phase, len(samples),
+                            samples.percentile(50) * 1000,
+                            samples.percentile(95) * 1000,
+                            max(samples.values) * 1000))
+    return lines
+
+
+def reset():
+    TIMINGS.clear()
+
+
+# cProfile capture in progress: [profiler, commands left, file name].
+_capture = None
+
+
+def start_capture(count, file_name):
+    """Profiles the next `count` commands with cProfile and dumps the stats
+    to `file_name`.
+    """
+    global _capture
+    # Only needed now and then; keep it out of plugin load time.
+    import cProfile
+    _capture = [cProfile.Profile(), count, file_name]
+
+
+def call(invocation, func, *args, **kwargs):
+    """Calls `func` for `invocation`, under cProfile if a capture is in
+    progress.
+    """
+    if _capture is None:
+        return func(*args, **kwargs)
+    invocation.captured = True
+    return _capture[0].runcall(func, *args, **kwargs)
+
+
+def _count_captured():
+    global _capture
+    _capture[1] -= 1
+    if _capture[1] <= 0:
+        profiler, count, file_name = _capture
+        _capture = None
+        profiler.dump_stats(file_name)
+        return file_name
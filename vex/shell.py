@@ -1,35 +1,572 @@
-import plat
-import plat.linux
-import plat.osx
-import plat.windows
+import sublime
 
+import codecs
+import collections
+import errno
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
 
-def run_and_wait(view, cmd):
+
+def get_platform():
+    """Returns the plat module for the host platform. Platform modules are
+    only imported when a shell command first runs.
+    """
+    import plat
     if plat.HOST_PLATFORM == plat.WINDOWS:
-        plat.windows.run_and_wait(view, cmd)
+        import plat.windows
+        return plat.windows
     elif plat.HOST_PLATFORM == plat.LINUX:
-        plat.linux.run_and_wait(view, cmd)
+        import plat.linux
+        return plat.linux
     elif plat.HOST_PLATFORM == plat.OSX:
-        plat.osx.run_and_wait(view, cmd)
-    else:
-        raise NotImplementedError
+        import plat.osx
+        return plat.osx
+    raise NotImplementedError
 
 
-def filter_thru_shell(view, regions, cmd):
+def run_and_wait(view, cmd):
+    get_platform().run_and_wait(view, cmd)
+
+
+# Seconds shell commands that block the editor may run, unless the
+# vintageex_shell_timeout setting says otherwise. 0 means no limit.
+DEFAULT_TIMEOUT = 60
+# Bytes of output kept in memory, unless the vintageex_shell_max_memory
+# setting says otherwise. The rest goes to a temp file.
+DEFAULT_MAX_MEMORY = 16 * 1024 * 1024
+# Bytes of stderr kept for reporting.
+MAX_STDERR = 64 * 1024
+# Bytes read, and characters written, at a time.
+CHUNK_SIZE = 64 * 1024
+# Seconds between SIGTERM and SIGKILL when killing a command.
+KILL_GRACE = 0.5
+
+
+def get_timeout(view):
+    """Returns the timeout for commands run for `view`, or None.
+    """
+    return view.settings().get('vintageex_shell_timeout',
+                               DEFAULT_TIMEOUT) or None
+
+
+def get_max_memory(view):
+    return view.settings().get('vintageex_shell_max_memory',
+                               DEFAULT_MAX_MEMORY)
+
+
+def start_process(args, **kwargs):
+    """Starts `args` as subprocess.Popen would, in a process group of its
+    own on POSIX systems, so that kill_process gets whatever it starts too.
+    """
+    if os.name == 'posix':
+        kwargs.setdefault('preexec_fn', os.setsid)
+    return subprocess.Popen(args, **kwargs)
+
+
+def kill_process(process):
+    """Terminates `process` and its process group, then kills them if they
+    are still around after KILL_GRACE seconds. On POSIX systems, the group
+    is killed even if `process` has exited: what it left running in the
+    background may still hold its output open.
+    """
+    if os.name != 'posix':
+        if process.poll() is not None:
+            return
+        # /T takes the processes it started along.
+        if subprocess.call(['taskkill', '/F', '/T', '/PID',
+                            str(process.pid)]) != 0:
+            try:
+                process.kill()
+            except OSError:
+                pass
+        return
+
+    if not _signal_group(process, signal.SIGTERM):
+        return
+    deadline = time.time() + KILL_GRACE
+    while process.poll() is None and time.time() < deadline:
+        time.sleep(0.01)
+    # Whatever ignored SIGTERM or outlived the leader goes now. Orphans
+    # may linger as zombies, so the group can't be waited on to empty.
+    _signal_group(process, signal.SIGKILL)
+
+
+def _signal_group(process, sig):
+    """Sends `sig` to the process group of `process`. Returns False if the
+    group is gone.
+    """
     try:
-        # XXX: make this a ShellFilter class instead
-        edit = view.begin_edit()
-        if plat.HOST_PLATFORM == plat.WINDOWS:
-            filter_func = plat.windows.filter_region
-        elif plat.HOST_PLATFORM == plat.LINUX:
-            filter_func = plat.linux.filter_region
-        elif plat.HOST_PLATFORM == plat.OSX:
-            filter_func = plat.osx.filter_region
+        os.killpg(process.pid, sig)
+    except OSError, e:
+        if e.errno == errno.ESRCH:
+            return False
+        raise
+    return True
+
+
+def write_encoded(stream, text, encoding):
+    """Writes `text` to `stream` in chunks, encoding one chunk at a time,
+    and closes it. A reader going away early (head) isn't an error.
+    """
+    encoder = codecs.getincrementalencoder(encoding)('replace')
+    try:
+        try:
+            for i in xrange(0, len(text), CHUNK_SIZE):
+                chunk = text[i:i + CHUNK_SIZE]
+                if isinstance(chunk, unicode):
+                    chunk = encoder.encode(chunk)
+                stream.write(chunk)
+            stream.write(encoder.encode(u'', True))
+        except IOError, e:
+            if e.errno not in (errno.EPIPE, errno.EINVAL):
+                raise
+    finally:
+        try:
+            stream.close()
+        except IOError:
+            pass
+
+
+class Result(object):
+    """What a command run left behind: its status, the start of its stderr
+    and its output, in memory up to a point and in a temp file after it.
+    """
+    def __init__(self, returncode=None, stderr='', encoding='utf-8'):
+        self.returncode = returncode
+        self.stderr = stderr
+        self.encoding = encoding
+        self.timed_out = False
+        self.cancelled = False
+        self.output = []
+        self.output_size = 0
+        self.spill_file = None
+        self._spill = None
+
+    def add_output(self, chunk, max_memory=DEFAULT_MAX_MEMORY):
+        """Keeps the bytes in `chunk` as output, in memory while there's
+        less than `max_memory` bytes of it, in a temp file after that.
+        """
+        if (self._spill is None and
+            self.output_size + len(chunk) <= max_memory):
+                self.output.append(chunk)
+                self.output_size += len(chunk)
+                return
+        if self._spill is None:
+            fd, self.spill_file = tempfile.mkstemp(prefix='vintageex')
+            self._spill = os.fdopen(fd, 'wb')
+        self._spill.write(chunk)
+
+    def end_output(self):
+        """Tells the output is all there.
+        """
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def failed(self):
+        return bool(self.returncode or self.timed_out or self.cancelled)
+
+    def chunks(self):
+        """Yields the output as decoded text, a chunk at a time.
+        """
+        decoder = codecs.getincrementaldecoder(self.encoding)('replace')
+        for chunk in self.output:
+            yield decoder.decode(chunk)
+        if self.spill_file is not None:
+            f = open(self.spill_file, 'rb')
+            try:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield decoder.decode(chunk)
+            finally:
+                f.close()
+        yield decoder.decode('', True)
+
+    def text(self):
+        return u''.join(self.chunks())
+
+    def error_text(self):
+        return self.stderr.decode(self.encoding, 'replace')
+
+    def close(self):
+        """Removes the temp file holding the output, if any.
+        """
+        if self.spill_file is not None:
+            os.remove(self.spill_file)
+            self.spill_file = None
+
+
+class Runner(object):
+    """Runs a command to completion, feeding it text and collecting its
+    output and stderr from threads, so none of them can block the others.
+    Kills the command and all it started if it runs for longer than
+    `timeout` seconds or is cancelled from another thread.
+
+    Only `max_memory` bytes of output are held in memory; the rest is
+    written to a temp file. With capture=False, the command's output isn't
+    collected at all (terminals and such).
+    """
+    def __init__(self, args, encoding='utf-8', timeout=None,
+                 max_memory=DEFAULT_MAX_MEMORY, capture=True, **popen_args):
+        self.args = args
+        self.encoding = encoding
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.capture = capture
+        self.popen_args = popen_args
+        self.process = None
+        self.cancelled = False
+
+    def run(self, input_text=None):
+        pipe = self.capture and subprocess.PIPE or None
+        stdin = input_text is not None and subprocess.PIPE or None
+        self.process = start_process(self.args, stdin=stdin, stdout=pipe,
+                                     stderr=pipe, **self.popen_args)
+        result = Result(encoding=self.encoding)
+        threads = []
+        if input_text is not None:
+            threads.append(threading.Thread(target=write_encoded,
+                                            args=(self.process.stdin,
+                                                  input_text,
+                                                  self.encoding)))
+        if self.capture:
+            threads.append(threading.Thread(target=self._read_output,
+                                            args=(result,)))
+            threads.append(threading.Thread(target=self._read_stderr,
+                                            args=(result,)))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        deadline = self.timeout and time.time() + self.timeout
+
+        def must_stop():
+            return self.cancelled or deadline and time.time() > deadline
+
+        # Output ends when the command exits, unless something it started
+        # keeps it open; either way, wait for both.
+        stopped = False
+        for thread in threads:
+            while thread.isAlive() and not stopped:
+                thread.join(0.05)
+                stopped = must_stop()
+        delay = 0.001
+        while not stopped and self.process.poll() is None:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+            stopped = must_stop()
+        if stopped:
+            result.timed_out = not self.cancelled
+            result.cancelled = self.cancelled
+            kill_process(self.process)
+            # Something that left the process group may still hold the
+            # pipes open; don't wait for it.
+            for thread in threads:
+                thread.join(KILL_GRACE)
         else:
-            raise NotImplementedError
+            for thread in threads:
+                thread.join()
+        result.returncode = self.process.wait()
+        return result
+
+    def cancel(self):
+        """Kills the command, from any thread.
+        """
+        self.cancelled = True
+
+    def _read_output(self, result):
+        stdout = self.process.stdout
+        try:
+            while True:
+                chunk = stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                result.add_output(chunk, self.max_memory)
+        finally:
+            stdout.close()
+            result.end_output()
+
+    def _read_stderr(self, result):
+        stderr = self.process.stderr
+        kept = []
+        size = 0
+        try:
+            while True:
+                chunk = stderr.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size < MAX_STDERR:
+                    kept.append(chunk[:MAX_STDERR - size])
+                    size += len(kept[-1])
+        finally:
+            stderr.close()
+        result.stderr = ''.join(kept)
 
-        for r in reversed(regions):
-            rv = filter_func(view, view.substr(r), cmd)
-            view.replace(edit, r, rv)
+
+def describe_failure(cmd, result):
+    """Returns a line telling how running `cmd` failed, or None.
+    """
+    if result.timed_out:
+        return "VintageEx: %s timed out" % cmd
+    if result.cancelled:
+        return "VintageEx: %s cancelled" % cmd
+    if result.returncode:
+        return "VintageEx: %s exited with status %d" % (cmd, result.returncode)
+
+
+def report(window, cmd, results):
+    """Shows the stderr and exit status of the commands that failed or
+    complained among `results` in the vintageex_shell output panel.
+    """
+    lines = []
+    status = None
+    for result in results:
+        failure = describe_failure(cmd, result)
+        if not failure and not result.stderr:
+            continue
+        lines.append("$ %s" % cmd)
+        if result.stderr:
+            lines.append(result.error_text().rstrip('\n'))
+        if failure:
+            lines.append(failure)
+            status = failure
+    if not lines:
+        return
+    sublime.status_message(status or "VintageEx: %s wrote to stderr" % cmd)
+    if window is None:
+        return
+    panel = window.get_output_panel('vintageex_shell')
+    edit = panel.begin_edit()
+    try:
+        panel.erase(edit, sublime.Region(0, panel.size()))
+        panel.insert(edit, 0, '\n'.join(lines))
+    finally:
+        panel.end_edit(edit)
+    window.run_command('show_panel', {'panel': 'output.vintageex_shell'})
+
+
+# Filters run at the same time when filtering many regions, unless the
+# vintageex_filter_concurrency setting says otherwise.
+DEFAULT_FILTER_CONCURRENCY = 4
+
+
+def map_bounded(func, items, limit):
+    """Returns [func(item) for item in items], calling func from up to
+    `limit` threads at a time. Raises the first exception raised by func,
+    once all calls have finished.
+    """
+    items = list(items)
+    if limit <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)
+    errors = []
+    pending = iter(range(len(items)))
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            lock.acquire()
+            try:
+                i = next(pending, None)
+            finally:
+                lock.release()
+            if i is None or errors:
+                return
+            try:
+                results[i] = func(items[i])
+            except Exception, e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=work)
+               for i in range(min(limit, len(items)))]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def trim_last_newline(chunks):
+    """Yields the text in `chunks` but for a newline at its very end.
+    """
+    held = u''
+    for text in chunks:
+        text = held + text
+        held = u''
+        if text.endswith('\n'):
+            text, held = text[:-1], u'\n'
+        if text:
+            yield text
+
+
+def filter_thru_shell(view, regions, cmd):
+    # Fail before opening an edit if the platform isn't supported.
+    filter_func = get_platform().get_filter(view)
+    limit = view.settings().get('vintageex_filter_concurrency',
+                                DEFAULT_FILTER_CONCURRENCY)
+    # Only the filters run on other threads; the view is only used here.
+    texts = [view.substr(r) for r in regions]
+    filtered = map_bounded(lambda text: filter_func(text, cmd), texts, limit)
+
+    edit = view.begin_edit()
+    try:
+        for r, (output, result) in reversed(zip(regions, filtered)):
+            # Keep the text of filters that didn't get to finish.
+            if result.timed_out or result.cancelled:
+                continue
+            # The output goes in a chunk at a time, so that it's never
+            # held in memory decoded as a whole.
+            view.erase(edit, r)
+            point = r.begin()
+            for text in output:
+                view.insert(edit, point, text)
+                point += len(text)
     finally:
         view.end_edit(edit)
+        for output, result in filtered:
+            result.close()
+    report(view.window(), cmd, [result for (output, result) in filtered])
+
+
+class ShellReader(object):
+    """Runs `args` and reads its output line by line on a thread, handing
+    it to `on_output` as text in batches of up to `max_batch` characters,
+    every `interval` ms, through `set_timeout` (sublime.set_timeout). Once
+    all the output has been handed over, calls on_done with the Result of
+    the command, which holds its status and stderr but not its output.
+
+    The thread stops reading while `max_pending` characters are waiting to
+    be handed over, so a fast command can't fill up memory.
+    """
+    def __init__(self, args, on_output, on_done, set_timeout,
+                 encoding='utf-8', interval=50, max_batch=64 * 1024,
+                 max_pending=1024 * 1024):
+        self.args = args
+        self.on_output = on_output
+        self.on_done = on_done
+        self.set_timeout = set_timeout
+        self.encoding = encoding
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.pending = collections.deque()
+        self.pending_size = 0
+        self.lines = 0
+        self.finished = False
+        self.cancelled = False
+        self.process = None
+        self.result = Result(encoding=encoding)
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.read)
+        self.thread.daemon = True
+        self.stderr_thread = threading.Thread(target=self.read_stderr)
+        self.stderr_thread.daemon = True
+
+    def start(self):
+        self.process = start_process(self.args, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE, bufsize=1)
+        # The reading thread waits for this one when it's done.
+        self.stderr_thread.start()
+        self.thread.start()
+        self.set_timeout(self.poll, self.interval)
+
+    def read(self):
+        decoder = codecs.getincrementaldecoder(self.encoding)('replace')
+        try:
+            for line in iter(self.process.stdout.readline, ''):
+                if self.cancelled:
+                    # Whatever the command started may still be writing.
+                    break
+                self.add(decoder.decode(line))
+            self.add(decoder.decode('', True))
+        finally:
+            self.process.stdout.close()
+            self.process.wait()
+            self.stderr_thread.join()
+            self.condition.acquire()
+            self.finished = True
+            self.condition.notify()
+            self.condition.release()
+
+    def read_stderr(self):
+        kept = []
+        size = 0
+        try:
+            for line in iter(self.process.stderr.readline, ''):
+                if size < MAX_STDERR:
+                    kept.append(line[:MAX_STDERR - size])
+                    size += len(kept[-1])
+        finally:
+            self.process.stderr.close()
+        self.result.stderr = ''.join(kept)
+
+    def add(self, text):
+        self.condition.acquire()
+        try:
+            while (self.pending_size >= self.max_pending and
+                   not self.cancelled):
+                self.condition.wait()
+            if not self.cancelled and text:
+                self.pending.append(text)
+                self.pending_size += len(text)
+                self.lines += text.count('\n')
+        finally:
+            self.condition.release()
+
+    def take(self):
+        """Returns up to max_batch characters of the output read so far.
+        """
+        self.condition.acquire()
+        try:
+            batch = []
+            size = 0
+            while self.pending and size < self.max_batch:
+                text = self.pending.popleft()
+                if size + len(text) > self.max_batch:
+                    cut = self.max_batch - size
+                    self.pending.appendleft(text[cut:])
+                    text = text[:cut]
+                batch.append(text)
+                size += len(text)
+            self.pending_size -= size
+            self.condition.notify()
+            return u''.join(batch)
+        finally:
+            self.condition.release()
+
+    def poll(self):
+        finished = self.finished
+        text = self.take()
+        if text and not self.cancelled:
+            self.on_output(text)
+        # Once cancelled, don't wait for the reading thread: something the
+        # command started outside its process group may keep it blocked.
+        if (finished and not self.pending) or self.cancelled:
+            self.result.returncode = self.process.returncode
+            self.result.cancelled = self.cancelled
+            self.on_done(self.result)
+        else:
+            self.set_timeout(self.poll, self.interval)
+
+    def cancel(self):
+        """Kills the command and drops the output not handed over yet.
+        """
+        self.condition.acquire()
+        try:
+            self.cancelled = True
+            self.pending.clear()
+            self.pending_size = 0
+            self.condition.notify()
+        finally:
+            self.condition.release()
+        kill_process(self.process)
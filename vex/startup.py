@@ -0,0 +1,30 @@
+"""plugin load times
+
+Plugin modules call `start` before anything else and `record` at the very
+end, so that the cost of loading VintageEx can be checked at any time with
+the ex_show_load_times command.
+"""
+
+import time
+
+
+# (module name, seconds) for every plugin module loaded, in load order.
+LOAD_TIMES = []
+
+
+def start():
+    return time.time()
+
+
+def record(module, started):
+    LOAD_TIMES.append((module, time.time() - started))
+
+
+def report():
+    """Returns the load times as lines of text, followed by their total.
+    """
+    lines = ["%-16s %8.2fms" % (name, seconds * 1000)
+                                            for (name, seconds) in LOAD_TIMES]
+    total = sum(seconds for (name, seconds) in LOAD_TIMES)
+    lines.append("%-16s %8.2fms" % ('total', total * 1000))
+    return lines
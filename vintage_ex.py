@@ -1,12 +1,18 @@
+from vex import startup
+_load_started = startup.start()
+
 import sublime
 import sublime_plugin
 
-from vex.ex_command_parser import parse_command
-from vex.ex_command_parser import EX_COMMANDS
-from vex import ex_error
+import time
 
+from vex import api_calls
+from vex import profiling
+from vex.ex_command_parser import command_args
+from vex.ex_command_parser import parse_command_line
+from vex.ex_command_parser import complete_command
+from vex import ex_error
 
-COMPLETIONS = sorted([x[0] for x in EX_COMMANDS.keys()])
 
 EX_HISTORY_MAX_LENGTH = 20
 EX_HISTORY = {
@@ -47,20 +53,52 @@ class ViColonInput(sublime_plugin.WindowCommand):
             update_command_line_history(cmd_line, 'cmdline')
         else:
             self.non_interactive = False
-        ex_cmd = parse_command(cmd_line)
-        print ex_cmd
-
-        if ex_cmd and ex_cmd.parse_errors:
-            ex_error.display_error(ex_cmd.parse_errors[0])
+        started = time.time()
+        ex_cmds = parse_command_line(cmd_line)
+        # Commands in a chain share the time spent parsing it.
+        parse_time = (time.time() - started) / len(ex_cmds)
+
+        # Check the whole chain before running any of it.
+        for ex_cmd in ex_cmds:
+            if ex_cmd and ex_cmd.parse_errors:
+                ex_error.display_error(ex_cmd.parse_errors[0])
+                return
+            if not (ex_cmd and ex_cmd.name):
+                ex_error.display_error(ex_error.ERR_UNKNOWN_COMMAND, cmd_line)
+                return
+
+        if len(ex_cmds) == 1:
+            self.run_ex_command(ex_cmds[0], parse_time)
             return
-        if ex_cmd and ex_cmd.name:
-            if ex_cmd.can_have_range:
-                ex_cmd.args["line_range"] = ex_cmd.line_range
-            if ex_cmd.forced:
-                ex_cmd.args['forced'] = ex_cmd.forced
-            self.window.run_command(ex_cmd.command, ex_cmd.args)
-        else:
-            ex_error.display_error(ex_error.ERR_UNKNOWN_COMMAND, cmd_line)
+
+        # Run chained commands inside one edit so that they are undone in
+        # one go.
+        view = self.window.active_view()
+        edit = view.begin_edit()
+        try:
+            for ex_cmd in ex_cmds:
+                self.run_ex_command(ex_cmd, parse_time)
+        finally:
+            view.end_edit(edit)
+
+    def run_ex_command(self, ex_cmd, parse_time=0):
+        args = command_args(ex_cmd)
+        view = self.window.active_view()
+        counting = (view is not None and
+                    view.settings().get('vintageex_count_api_calls'))
+        if counting:
+            api_calls.start(ex_cmd.command)
+        invocation = profiling.start(ex_cmd.command, parse_time)
+        try:
+            profiling.call(invocation, self.window.run_command,
+                           ex_cmd.command, args)
+        finally:
+            dumped = profiling.finish(invocation)
+            if counting:
+                print '\n'.join(api_calls.finish().report())
+            if dumped:
+                sublime.status_message("VintageEx: profile written to %s" %
+                                                                    dumped)
 
 
 class ViColonRepeatLast(sublime_plugin.WindowCommand):
@@ -85,7 +123,7 @@ class ExCompletionsProvider(sublime_plugin.EventListener):
         if prefix and prefix in self.CACHED_COMPLETION_PREFIXES:
             return self.CACHED_COMPLETIONS
 
-        compls = [x for x in COMPLETIONS if x.startswith(prefix)]
+        compls = complete_command(prefix)
         self.CACHED_COMPLETION_PREFIXES = [prefix] + compls
         self.CACHED_COMPLETIONS = zip([prefix] + compls, compls + [prefix])
         return self.CACHED_COMPLETIONS
@@ -115,3 +153,16 @@ class HistoryIndexRestorer(sublime_plugin.EventListener):
         # call won't yield the desired results.
         if view.score_selector(0, 'text.excmdline') > 0:
             CycleCmdlineHistory.HISTORY_INDEX = None
+
+
+class ExShowLoadTimes(sublime_plugin.WindowCommand):
+    """Prints how long each VintageEx plugin module took to load.
+    """
+    def run(self):
+        lines = startup.report()
+        print "VintageEx load times:\n" + "\n".join(lines)
+        sublime.status_message("VintageEx: loaded in %s" %
+                                                    lines[-1].split()[-1])
+
+
+startup.record('vintage_ex', _load_started)